@@ -0,0 +1,129 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """In-memory answer cache keyed by query embedding + hash of the retrieved context.
+
+    A lookup hits when a cached entry was generated from the same context and its
+    query embedding has cosine similarity >= `threshold` with the new query.
+    Entries expire after `ttl` seconds and the least recently used entry is
+    evicted once `max_entries` is reached.
+    """
+
+    def __init__(self, threshold: Optional[float] = None, ttl: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        self.threshold = threshold if threshold is not None else float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._by_context: Dict[str, List[int]] = {}
+        self._next_id = 0
+        self._fingerprint: Optional[str] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def context_hash(context: str) -> str:
+        return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vec = np.asarray(embedding, dtype="float32").reshape(-1)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def check_fingerprint(self, fingerprint: str):
+        """Drop every entry when the vector collection has changed since the last call"""
+        with self._lock:
+            if self._fingerprint is not None and fingerprint != self._fingerprint:
+                self._clear_locked()
+                self.invalidations += 1
+            self._fingerprint = fingerprint
+
+    def get(self, embedding, context: str) -> Optional[Dict]:
+        """Return the cached result for a near-duplicate query, or None"""
+        query_vec = self._normalize(embedding)
+        ctx = self.context_hash(context)
+        now = time.time()
+
+        with self._lock:
+            best_id, best_score = None, -1.0
+            for entry_id in list(self._by_context.get(ctx, [])):
+                entry = self._entries[entry_id]
+                if now - entry['created_at'] > self.ttl:
+                    self._remove_locked(entry_id)
+                    continue
+                score = float(np.dot(entry['embedding'], query_vec))
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return dict(self._entries[best_id]['result'], cache_similarity=round(best_score, 4))
+
+    def put(self, embedding, context: str, result: Dict):
+        """Store a generated result"""
+        ctx = self.context_hash(context)
+        with self._lock:
+            while len(self._entries) >= self.max_entries > 0:
+                oldest_id = next(iter(self._entries))
+                self._remove_locked(oldest_id)
+                self.evictions += 1
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                'embedding': self._normalize(embedding),
+                'context_hash': ctx,
+                'result': result,
+                'created_at': time.time()
+            }
+            self._by_context.setdefault(ctx, []).append(entry_id)
+
+    def clear(self):
+        with self._lock:
+            self._clear_locked()
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'threshold': self.threshold,
+                'ttl': self.ttl
+            }
+
+    def _remove_locked(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        ids = self._by_context.get(entry['context_hash'], [])
+        if entry_id in ids:
+            ids.remove(entry_id)
+        if not ids:
+            self._by_context.pop(entry['context_hash'], None)
+
+    def _clear_locked(self):
+        self._entries.clear()
+        self._by_context.clear()
@@ -0,0 +1,209 @@
+import math
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+# Zero-width joiner / non-joiner: part of Sinhala conjuncts, but optional when typing
+_JOINERS = {"\u200c", "\u200d"}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into case-folded, NFC-normalized word tokens.
+
+    Unlike `\\w+`, this keeps combining marks (Unicode category M) inside the
+    word: Sinhala and Tamil vowel signs and viramas are marks, and `\\w` would
+    break every word at them. Joiners are kept while scanning, then dropped so
+    "ශ්‍රී" and "ශ්රී" produce the same token.
+    """
+    tokens, current = [], []
+    for ch in unicodedata.normalize("NFC", text or ""):
+        if unicodedata.category(ch)[0] in "LMN" or (ch in _JOINERS and current):
+            current.append(ch)
+        elif current:
+            tokens.append("".join(current))
+            current = []
+    if current:
+        tokens.append("".join(current))
+    return [
+        token for token in ("".join(c for c in t if c not in _JOINERS).casefold() for t in tokens)
+        if token
+    ]
+
+
+def _deletes(term: str, distance: int) -> Set[str]:
+    """All strings reachable from `term` by deleting up to `distance` characters"""
+    results, frontier = {term}, {term}
+    for _ in range(distance):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))}
+        results |= frontier
+    return results
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Damerau-Levenshtein (optimal string alignment) distance, capped at limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+        prev2, prev = prev, row
+    return prev[-1]
+
+
+class BM25Index:
+    """
+    In-memory BM25 index with incremental add/remove, prefix expansion and
+    typo tolerance.
+
+    Documents are lists of tokens (see tokenize) under a hashable key.
+    Re-adding a key replaces the old document. Query terms that are not in
+    the vocabulary are matched to vocabulary terms within `max_edits` edits,
+    using a symmetric-delete table (SymSpell), so no full vocabulary scan is
+    needed. The last query term can also match as a prefix, for
+    search-as-you-type. Expanded terms score lower than exact ones.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, max_edits: int = 1,
+                 prefix_weight: float = 0.8, fuzzy_weight: float = 0.6, min_fuzzy_len: int = 4):
+        self.k1 = k1
+        self.b = b
+        self.max_edits = max_edits
+        self.prefix_weight = prefix_weight
+        self.fuzzy_weight = fuzzy_weight
+        self.min_fuzzy_len = min_fuzzy_len
+
+        self.postings: Dict[str, Dict[Hashable, int]] = {}
+        self.doc_lengths: Dict[Hashable, int] = {}
+        self.doc_terms: Dict[Hashable, Dict[str, int]] = {}
+        self.total_length = 0
+        self._vocab: List[str] = []          # sorted, for prefix lookups
+        self._delete_table: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    # -------------------------------------------------------------
+    # Maintenance
+    # -------------------------------------------------------------
+    def _add_term(self, term: str):
+        i = bisect_left(self._vocab, term)
+        self._vocab.insert(i, term)
+        if len(term) >= self.min_fuzzy_len:
+            for variant in _deletes(term, self.max_edits):
+                self._delete_table.setdefault(variant, set()).add(term)
+
+    def _drop_term(self, term: str):
+        i = bisect_left(self._vocab, term)
+        if i < len(self._vocab) and self._vocab[i] == term:
+            self._vocab.pop(i)
+        if len(term) >= self.min_fuzzy_len:
+            for variant in _deletes(term, self.max_edits):
+                terms = self._delete_table.get(variant)
+                if terms is not None:
+                    terms.discard(term)
+                    if not terms:
+                        del self._delete_table[variant]
+
+    def add(self, key: Hashable, tokens: Iterable[str]):
+        self.remove(key)
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, tf in counts.items():
+            if term not in self.postings:
+                self.postings[term] = {}
+                self._add_term(term)
+            self.postings[term][key] = tf
+        length = sum(counts.values())
+        self.doc_terms[key] = counts
+        self.doc_lengths[key] = length
+        self.total_length += length
+
+    def remove(self, key: Hashable):
+        counts = self.doc_terms.pop(key, None)
+        if counts is None:
+            return
+        for term in counts:
+            docs = self.postings[term]
+            docs.pop(key, None)
+            if not docs:
+                del self.postings[term]
+                self._drop_term(term)
+        self.total_length -= self.doc_lengths.pop(key)
+
+    # -------------------------------------------------------------
+    # Query
+    # -------------------------------------------------------------
+    def _prefix_matches(self, prefix: str, limit: int = 50) -> List[str]:
+        i = bisect_left(self._vocab, prefix)
+        matches = []
+        while i < len(self._vocab) and self._vocab[i].startswith(prefix) and len(matches) < limit:
+            if self._vocab[i] != prefix:
+                matches.append(self._vocab[i])
+            i += 1
+        return matches
+
+    def _fuzzy_matches(self, term: str) -> List[str]:
+        if len(term) < self.min_fuzzy_len:
+            return []
+        candidates: Set[str] = set()
+        for variant in _deletes(term, self.max_edits):
+            candidates |= self._delete_table.get(variant, set())
+        return [c for c in candidates if c != term and edit_distance(term, c, self.max_edits) <= self.max_edits]
+
+    def expand(self, terms: List[str], prefix: bool = True, fuzzy: bool = True) -> Dict[str, float]:
+        """Vocabulary terms to score for a query, with their weights"""
+        weighted: Dict[str, float] = {}
+
+        def put(term: str, weight: float):
+            weighted[term] = max(weighted.get(term, 0.0), weight)
+
+        for i, term in enumerate(terms):
+            if term in self.postings:
+                put(term, 1.0)
+            elif fuzzy:
+                for match in self._fuzzy_matches(term):
+                    put(match, self.fuzzy_weight)
+            if prefix and i == len(terms) - 1:
+                for match in self._prefix_matches(term):
+                    put(match, self.prefix_weight)
+        return weighted
+
+    def idf(self, term: str) -> float:
+        n = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.doc_lengths) - n + 0.5) / (n + 0.5))
+
+    def search(self, query, k: int = 10, prefix: bool = True, fuzzy: bool = True,
+               keys: Optional[Set[Hashable]] = None) -> List[Tuple[Hashable, float]]:
+        """Top-k (key, score) for a query string or token list, best first"""
+        terms = tokenize(query) if isinstance(query, str) else list(query)
+        if not terms or not self.doc_lengths:
+            return []
+
+        avgdl = self.total_length / len(self.doc_lengths)
+        scores: Dict[Hashable, float] = {}
+        for term, weight in self.expand(terms, prefix, fuzzy).items():
+            idf = self.idf(term) * weight
+            for key, tf in self.postings[term].items():
+                if keys is not None and key not in keys:
+                    continue
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_lengths[key] / avgdl)
+                scores[key] = scores.get(key, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+        return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+    def stats(self) -> Dict:
+        return {
+            'documents': len(self.doc_lengths),
+            'terms': len(self.postings),
+            'avg_length': round(self.total_length / len(self.doc_lengths), 2) if self.doc_lengths else 0.0
+        }
@@ -1,113 +1,136 @@
 import chromadb
 from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from typing import Iterator, List, Dict, Optional, Tuple
 import os
+import numpy as np
+from ai.embeddings import EmbeddingService, get_embedding_service
+from ai.store_base import BaseVectorStore
 
-class ChromaVectorStore:
+class SharedEmbeddingFunction(EmbeddingFunction):
+    """Chroma embedding function backed by the process-wide EmbeddingService"""
+    
+    def __init__(self, service: Optional[EmbeddingService] = None):
+        self.service = service or get_embedding_service()
+    
+    def __call__(self, input: Documents) -> Embeddings:
+        return self.service.encode(list(input)).tolist()
+    
+    @staticmethod
+    def name() -> str:
+        return "citizen_portal_shared_minilm"
+
+class ChromaVectorStore(BaseVectorStore):
     """Free vector database using ChromaDB (no API key needed)"""
     
-    def __init__(self, persist_directory: str = "./chroma_db"):
+    backend = "chroma"
+    
+    def __init__(self, persist_directory: str = "./chroma_db",
+                 embedding_service: Optional[EmbeddingService] = None):
+        # Free embedding model, shared with the generator and the other stores
+        super().__init__(embedding_service, manifest_dir=os.path.join(persist_directory, "manifests"))
+        self.embedding_function = SharedEmbeddingFunction(self.embedding_service)
+        
         # Initialize ChromaDB
         self.client = chromadb.PersistentClient(path=persist_directory)
         
         # Create or get collection
-        self.collection = self.client.get_or_create_collection(
-            name="citizen_portal_docs",
-            metadata={"hnsw:space": "cosine"}
-        )
-        
-        # Free embedding model
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.collection = self._get_collection()
         
         print(f"✓ ChromaDB initialized at {persist_directory}")
     
-    def add_documents(self, documents: List[Dict]):
-        """Add documents to vector store"""
-        
-        texts = []
-        metadatas = []
-        ids = []
-        
-        for i, doc in enumerate(documents):
-            texts.append(doc['text'])
-            metadatas.append({
-                'source': doc.get('source', ''),
-                'chunk_id': str(doc.get('chunk_id', 0)),
-                'title': doc.get('title', '')
-            })
-            ids.append(f"doc_{i}_{hash(doc['text']) % 10000}")
-        
-        # Add to ChromaDB
-        self.collection.add(
+    def _get_collection(self):
+        try:
+            return self.client.get_or_create_collection(
+                name="citizen_portal_docs",
+                metadata={"hnsw:space": "cosine"},
+                embedding_function=self.embedding_function
+            )
+        except ValueError as e:
+            # Collections persisted with Chroma's default function keep that config;
+            # we always pass explicit embeddings, so opening it without one is equivalent.
+            print(f"⚠️ Using stored embedding config for collection: {e}")
+            return self.client.get_or_create_collection(
+                name="citizen_portal_docs",
+                metadata={"hnsw:space": "cosine"}
+            )
+    
+    # -------------------------------------------------------------
+    # BaseVectorStore hooks
+    # -------------------------------------------------------------
+    def _upsert(self, ids: List[str], texts: List[str], vectors: np.ndarray, metadatas: List[Dict]):
+        self.collection.upsert(
             documents=texts,
+            embeddings=vectors.tolist(),
             metadatas=metadatas,
             ids=ids
         )
-        
-        print(f"✓ Added {len(documents)} documents")
-        return len(documents)
     
-    def search(self, query: str, n_results: int = 5) -> List[Dict]:
-        """Search for similar documents"""
-        
-        # Query ChromaDB
+    def _delete(self, ids: List[str]):
+        for i in range(0, len(ids), 500):
+            self.collection.delete(ids=ids[i:i + 500])
+    
+    def _existing_ids(self, ids: List[str]) -> set:
+        found = set()
+        for i in range(0, len(ids), 500):
+            found.update(self.collection.get(ids=ids[i:i + 500], include=[])['ids'])
+        return found
+    
+    def _ids_for_source(self, source: str) -> List[str]:
+        return self.collection.get(where={'source': source}, include=[])['ids']
+    
+    def _query(self, vectors: np.ndarray, n_results: int) -> List[List[Dict]]:
         results = self.collection.query(
-            query_texts=[query],
+            query_embeddings=vectors.tolist(),
             n_results=n_results,
             include=['documents', 'metadatas', 'distances']
         )
         
-        # Format results
-        docs = []
-
-        # Ensure results exist and have expected keys
-        if not results:
-            return docs
-
-        documents = results.get('documents')
-        metadatas = results.get('metadatas')
-        distances = results.get('distances')
-
-        # Ensure the lists are valid and non-empty
-        if not documents or not documents[0]:
-            return docs
-
-        if not metadatas or not metadatas[0]:
-            metadatas = [[]]  # fallback
-
-        if not distances or not distances[0]:
-            distances = [[None] * len(documents[0])]
-
-        for i in range(len(documents[0])):
-            doc_text = documents[0][i]
-
-            meta = metadatas[0][i] if i < len(metadatas[0]) else {}
-            distance = distances[0][i] if i < len(distances[0]) else None
-
-            docs.append({
-                'text': doc_text,
-                'source': meta.get('source', ''),
-                'title': meta.get('title', ''),
-                'score': 1 - distance if distance is not None else None,
-                'distance': distance
-            })
-
-        return docs
-
+        # Chroma leaves out (or returns None for) lists it has nothing for
+        ids = results.get('ids') or []
+        documents = results.get('documents') or []
+        metadatas = results.get('metadatas') or []
+        distances = results.get('distances') or []
+        
+        batches = []
+        for q in range(len(vectors)):
+            texts = documents[q] if q < len(documents) and documents[q] else []
+            docs = []
+            for i, text in enumerate(texts):
+                meta = metadatas[q][i] if q < len(metadatas) and metadatas[q] and i < len(metadatas[q]) else {}
+                distance = distances[q][i] if q < len(distances) and distances[q] and i < len(distances[q]) else None
+                doc_id = ids[q][i] if q < len(ids) and i < len(ids[q]) else None
+                docs.append(self._result(doc_id, text, meta, 1 - distance if distance is not None else None))
+            batches.append(docs)
+        return batches
+    
+    def all_ids(self) -> List[str]:
+        return self.collection.get(include=[])['ids']
+    
+    def iter_documents(self, ids: Optional[List[str]] = None,
+                       batch_size: int = 500) -> Iterator[Tuple[str, str, Dict]]:
+        """Yield (id, text, metadata) for the given chunk IDs, or for every chunk"""
+        if ids is None:
+            ids = self.all_ids()
+        for i in range(0, len(ids), batch_size):
+            batch = self.collection.get(ids=ids[i:i + batch_size], include=['documents', 'metadatas'])
+            for doc_id, text, meta in zip(batch['ids'], batch['documents'], batch['metadatas']):
+                yield doc_id, text, meta or {}
+    
+    def count(self) -> int:
+        return self.collection.count()
     
     def delete_all(self):
         """Clear all documents"""
         self.client.delete_collection("citizen_portal_docs")
-        self.collection = self.client.create_collection("citizen_portal_docs")
+        self.collection = self._get_collection()
+        for manifest in self.list_manifests():
+            os.remove(self._manifest_path(manifest['source']))
+        self._changed()
     
     def get_stats(self) -> Dict:
         """Get collection stats"""
-        count = self.collection.count()
-        return {
-            'total_documents': count,
-            'collection_name': self.collection.name
-        }
+        return {**super().get_stats(), 'collection_name': self.collection.name}
 
 # Example usage
 if __name__ == "__main__":
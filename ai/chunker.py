@@ -0,0 +1,215 @@
+import re
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# all-MiniLM-L6-v2 truncates input at 256 word pieces including [CLS]/[SEP]
+DEFAULT_MAX_TOKENS = 240
+
+_MD_HEADING = re.compile(r"^\s{0,3}#{1,6}\s+(.*)$")
+_LIST_ITEM = re.compile(r"^\s*(?:[-*•▪●]|\d{1,3}[.)]|[a-zA-Z][.)])\s+")
+_SENTENCE_END = re.compile(r"(?<=[.!?।])\s+")
+
+
+class StructuredChunker:
+    """
+    Split documents into chunks that follow their structure and fit the
+    embedding model's token window.
+
+    Text is parsed into headings, paragraphs and list items. Blocks are
+    packed into chunks of at most `max_tokens` tokens (measured with the
+    embedding model's tokenizer when given, otherwise estimated). A chunk
+    never spans two sections, and every chunk is prefixed with its section
+    heading. Blocks larger than the budget are split at sentence and then word
+    boundaries. The last `overlap_tokens` worth of whole blocks from a chunk is
+    repeated at the start of the next chunk in the same section.
+    """
+
+    def __init__(self, max_tokens: int = DEFAULT_MAX_TOKENS, overlap_tokens: int = 32,
+                 tokenizer=None):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.tokenizer = tokenizer
+        self._count: Callable[[str], int] = self._count_with_tokenizer if tokenizer is not None else self.estimate_tokens
+
+    @classmethod
+    def for_embedding_model(cls, **kwargs) -> "StructuredChunker":
+        """Chunker that measures tokens with the shared embedding model's tokenizer"""
+        from ai.embeddings import get_embedding_service
+        return cls(tokenizer=get_embedding_service().tokenizer, **kwargs)
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Word-piece estimate when no tokenizer is available (errs on the high side)"""
+        return max(len(text.split()) * 4 // 3, len(text) // 4) + 1
+
+    def _count_with_tokenizer(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    # -------------------------------------------------------------
+    # Structure
+    # -------------------------------------------------------------
+    @staticmethod
+    def _is_heading(line: str) -> Optional[str]:
+        match = _MD_HEADING.match(line)
+        if match:
+            return match.group(1).strip()
+        stripped = line.strip()
+        if len(stripped) > 80 or _LIST_ITEM.match(stripped):
+            return None
+        # "Required Documents:" / "FEES" style section titles
+        if stripped.endswith(":") and len(stripped.split()) <= 8:
+            return stripped[:-1].strip()
+        letters = [c for c in stripped if c.isalpha()]
+        if len(letters) >= 4 and stripped.isupper() and len(stripped.split()) <= 8:
+            return stripped
+        return None
+
+    def blocks(self, text: str) -> Iterator[Tuple[str, str]]:
+        """Yield (kind, text) with kind in {'heading', 'paragraph', 'item'}"""
+        paragraph: List[str] = []
+
+        def flush():
+            if paragraph:
+                block = " ".join(paragraph)
+                paragraph.clear()
+                return block
+            return None
+
+        for raw in text.splitlines():
+            line = raw.strip()
+            if not line:
+                block = flush()
+                if block:
+                    yield 'paragraph', block
+                continue
+
+            heading = self._is_heading(line)
+            if heading is not None:
+                block = flush()
+                if block:
+                    yield 'paragraph', block
+                yield 'heading', heading
+            elif _LIST_ITEM.match(line):
+                block = flush()
+                if block:
+                    yield 'paragraph', block
+                yield 'item', line
+            else:
+                paragraph.append(line)
+
+        block = flush()
+        if block:
+            yield 'paragraph', block
+
+    # -------------------------------------------------------------
+    # Packing
+    # -------------------------------------------------------------
+    def _split_oversized(self, block: str, budget: int) -> Iterator[str]:
+        """Split a block that exceeds the budget at sentence, then word, boundaries"""
+        pieces: List[str] = []
+        for sentence in _SENTENCE_END.split(block):
+            if self._count(sentence) <= budget:
+                pieces.append(sentence)
+                continue
+            words, current = sentence.split(), []
+            for word in words:
+                if current and self._count(" ".join(current + [word])) > budget:
+                    pieces.append(" ".join(current))
+                    current = []
+                current.append(word)
+            if current:
+                pieces.append(" ".join(current))
+
+        current, used = [], 0
+        for piece in pieces:
+            tokens = self._count(piece)
+            if current and used + tokens > budget:
+                yield " ".join(current)
+                current, used = [], 0
+            current.append(piece)
+            used += tokens
+        if current:
+            yield " ".join(current)
+
+    def _fit_prefix(self, prefix: str) -> str:
+        """Shorten a 'title / heading' prefix to at most half the budget (plus its ':')"""
+        limit = self.max_tokens // 2 - 1
+        if not prefix or self._count(prefix) <= limit:
+            return prefix
+        # Keep the innermost heading, then cut words from the end
+        innermost = prefix.split(" / ")[-1]
+        if self._count(innermost) <= limit:
+            return innermost
+        words = innermost.split()
+        while len(words) > 1 and self._count(" ".join(words) + " …") > limit:
+            words.pop()
+        return " ".join(words) + " …"
+
+    def chunk(self, text: str, title: Optional[str] = None) -> Iterator[Dict]:
+        """Yield {'text', 'heading', 'tokens'} chunks in document order.
+
+        `title` (e.g. the page title) is prepended to every chunk's heading line
+        so small sections keep their document context once embedded. The
+        prefix counts against max_tokens; one longer than half the budget is
+        shortened.
+        """
+        heading: Optional[str] = None
+        prefix, prefix_cost = "", 0
+        body: List[Tuple[str, int]] = []
+        used = 0
+
+        def set_heading(value: Optional[str]):
+            nonlocal heading, prefix, prefix_cost
+            heading = value
+            prefix = self._fit_prefix(" / ".join(part for part in (title, heading) if part))
+            prefix_cost = self._count(prefix) + 1 if prefix else 0
+
+        def emit() -> Dict:
+            content = "\n".join(block for block, _ in body)
+            full = f"{prefix}:\n{content}" if prefix else content
+            return {'text': full, 'heading': heading or '', 'tokens': prefix_cost + used}
+
+        def overlap_tail() -> List[Tuple[str, int]]:
+            tail, size = [], 0
+            for block, tokens in reversed(body):
+                if size + tokens > self.overlap_tokens:
+                    break
+                tail.insert(0, (block, tokens))
+                size += tokens
+            return tail
+
+        set_heading(None)
+        for kind, block in self.blocks(text):
+            if kind == 'heading':
+                if body:
+                    yield emit()
+                    set_heading(block)
+                elif heading:
+                    # Nested heading with no text in between: keep the parent for context
+                    set_heading(f"{heading.split(' / ')[-1]} / {block}")
+                else:
+                    set_heading(block)
+                body, used = [], 0
+                continue
+
+            # The prefix is repeated on every chunk, so it comes out of the budget
+            budget = self.max_tokens - prefix_cost
+            tokens = self._count(block)
+            parts = [(block, tokens)] if tokens <= budget else [
+                (part, self._count(part)) for part in self._split_oversized(block, budget)
+            ]
+
+            for part, part_tokens in parts:
+                if body and used + part_tokens > budget:
+                    yield emit()
+                    body = overlap_tail()
+                    used = sum(t for _, t in body)
+                    if used + part_tokens > budget:
+                        body, used = [], 0
+                body.append((part, part_tokens))
+                used += part_tokens
+
+        if body:
+            yield emit()
+
+    def chunk_texts(self, text: str, title: Optional[str] = None) -> List[str]:
+        return [chunk['text'] for chunk in self.chunk(text, title)]
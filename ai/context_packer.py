@@ -0,0 +1,211 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ai.bm25 import tokenize
+from ai.chunker import StructuredChunker
+
+# Input-token budget for the retrieved context in a RAG prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# Chunks scoring below this are never sent (0 disables the absolute floor)
+CONTEXT_MIN_SCORE = float(os.getenv("CONTEXT_MIN_SCORE", "0"))
+# ...nor chunks scoring below this fraction of the best chunk's score
+CONTEXT_RELATIVE_FLOOR = float(os.getenv("CONTEXT_RELATIVE_FLOOR", "0.5"))
+# "estimate" (local, no network) or "gemini" (count_tokens API, cached per chunk)
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "estimate")
+
+# Lines shorter than this (headings, "Fees:") are kept even when repeated
+_MIN_DEDUPE_WORDS = 4
+# Shortest word run treated as overlap between two single-line chunks
+_MIN_OVERLAP_WORDS = 8
+
+
+def _boundary_overlap(prev: List[str], words: List[str]) -> Tuple[int, int]:
+    """
+    (head, tail): how many leading words of `words` repeat the end of `prev`,
+    and how many trailing words repeat its start (fixed-window chunk overlap)
+    """
+    head = tail = 0
+    first = words[0]
+    for i, word in enumerate(prev):
+        k = len(prev) - i
+        if word == first and k >= _MIN_OVERLAP_WORDS and k < len(words) and prev[i:] == words[:k]:
+            head = k
+            break
+    start = prev[0]
+    for j in range(head, len(words)):
+        k = len(words) - j
+        if words[j] == start and k >= _MIN_OVERLAP_WORDS and k < len(prev) and words[j:] == prev[:k]:
+            tail = k
+            break
+    return head, tail
+
+
+class ContextPacker:
+    """
+    Choose what retrieved text goes into the prompt, within a token budget.
+
+    Chunks are taken in relevance order (the order retrieval or the
+    re-ranker returned them). Chunks below the score floors are dropped.
+    Text already packed is not sent twice: whole lines repeated by the
+    chunker's overlap are removed, as are word runs shared at the boundary
+    of fixed-window chunks from the same source. A chunk that has nothing
+    new left is skipped. Chunks that do not fit the remaining budget are
+    skipped, and smaller ones after them may still be packed. The most
+    relevant chunk is always kept, so the prompt is never empty.
+
+    Token counts come from `count_tokens` (e.g. the Gemini tokenizer),
+    cached per chunk and scaled by how much of the chunk survived
+    deduplication, or from StructuredChunker.estimate_tokens.
+    """
+
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET, min_score: float = CONTEXT_MIN_SCORE,
+                 relative_floor: float = CONTEXT_RELATIVE_FLOOR,
+                 count_tokens: Optional[Callable[[str], int]] = None, cache_size: int = 10000):
+        self.token_budget = token_budget
+        self.min_score = min_score
+        self.relative_floor = relative_floor
+        self.count_tokens = count_tokens
+        self.cache_size = cache_size
+        self._counts: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.packed = 0
+        self.dropped = {'score': 0, 'duplicate': 0, 'budget': 0}
+        self.tokens_saved = 0
+
+    # -------------------------------------------------------------
+    # Token counting
+    # -------------------------------------------------------------
+    def _tokens(self, doc: Dict) -> int:
+        """Tokens in the full chunk text"""
+        if self.count_tokens is None:
+            return StructuredChunker.estimate_tokens(doc['text'])
+        key = doc.get('id') or hashlib.sha1(doc['text'].encode("utf-8")).hexdigest()
+        with self._lock:
+            if key in self._counts:
+                self._counts.move_to_end(key)
+                return self._counts[key]
+        try:
+            count = int(self.count_tokens(doc['text']))
+        except Exception as e:
+            print(f"⚠️ Token count failed, using the local estimate: {e}")
+            return StructuredChunker.estimate_tokens(doc['text'])
+        with self._lock:
+            self._counts[key] = count
+            if len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return count
+
+    # -------------------------------------------------------------
+    # Deduplication
+    # -------------------------------------------------------------
+    @staticmethod
+    def _new_text(doc: Dict, seen_lines: set, packed_words: Dict[str, List[List[str]]]) -> str:
+        """The part of the chunk not already packed ('' when nothing new is left)"""
+        lines, repeated, novel = [], False, False
+        for line in doc['text'].split("\n"):
+            key = " ".join(tokenize(line))
+            if len(key.split()) < _MIN_DEDUPE_WORDS:
+                lines.append(line)
+            elif key in seen_lines:
+                repeated = True
+            else:
+                lines.append(line)
+                novel = True
+        if repeated and not novel:
+            return ""
+
+        text = "\n".join(lines)
+        if "\n" not in text.strip():
+            # Single-line chunks come from fixed word windows that overlap at their edges
+            words = text.split()
+            for prev in packed_words.get(doc.get('source', ''), []):
+                if not words:
+                    break
+                head, tail = _boundary_overlap(prev, words)
+                words = words[head:len(words) - tail]
+            text = " ".join(words)
+        return text
+
+    # -------------------------------------------------------------
+    # Packing
+    # -------------------------------------------------------------
+    @staticmethod
+    def _relative_key(docs: List[Dict]) -> Optional[str]:
+        """
+        Score the relative floor compares: the cross-encoder score when every
+        chunk was re-ranked, else the raw similarity score. Fused (RRF) and
+        BM25 scores are rank- or corpus-relative, and a hit found by only one
+        retriever scores about half the best, so they get no relative floor.
+        """
+        if all('rerank_score' in doc for doc in docs):
+            return 'rerank_score'
+        if any('rrf_score' in doc or 'bm25_score' in doc for doc in docs):
+            return None
+        return 'score'
+
+    def pack(self, docs: List[Dict], header: Callable[[int, Dict], str],
+             timings: Optional[Dict] = None) -> Tuple[List[Dict], str]:
+        """
+        (docs used, context string). `header(i, doc)` gives the source line
+        printed above the i-th packed chunk.
+        """
+        if not docs:
+            return [], ""
+        score_key = self._relative_key(docs)
+        scores = [doc[score_key] for doc in docs if score_key and doc.get(score_key) is not None]
+        relative = max(scores) * self.relative_floor if scores and max(scores) > 0 else None
+
+        used, parts, total = [], [], 0
+        seen_lines: set = set()
+        packed_words: Dict[str, List[List[str]]] = {}
+        for doc in docs:
+            first = not used
+            if not first and (
+                    (doc.get('score') is not None and doc['score'] < self.min_score)
+                    or (relative is not None and doc.get(score_key) is not None and doc[score_key] < relative)):
+                self.dropped['score'] += 1
+                continue
+
+            text = self._new_text(doc, seen_lines, packed_words)
+            if not text.strip():
+                self.dropped['duplicate'] += 1
+                continue
+
+            full_tokens = self._tokens(doc)
+            tokens = max(1, round(full_tokens * len(text) / max(len(doc['text']), 1)))
+            head = header(len(used) + 1, doc)
+            cost = tokens + StructuredChunker.estimate_tokens(head)
+            if not first and total + cost > self.token_budget:
+                self.dropped['budget'] += 1
+                continue
+
+            used.append(doc)
+            parts.append(f"{head}\n{text}")
+            total += cost
+            self.tokens_saved += full_tokens - tokens
+            for line in text.split("\n"):
+                key = " ".join(tokenize(line))
+                if len(key.split()) >= _MIN_DEDUPE_WORDS:
+                    seen_lines.add(key)
+            packed_words.setdefault(doc.get('source', ''), []).append(text.split())
+
+        self.packed += len(used)
+        if timings is not None:
+            timings['context_tokens'] = total
+            timings['context_chunks'] = len(used)
+        return used, "\n\n".join(parts)
+
+    def stats(self) -> Dict:
+        return {
+            'token_budget': self.token_budget,
+            'min_score': self.min_score,
+            'relative_floor': self.relative_floor,
+            'tokenizer': 'gemini' if self.count_tokens is not None else 'estimate',
+            'packed': self.packed,
+            'dropped': dict(self.dropped),
+            'tokens_saved_by_dedupe': self.tokens_saved
+        }
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+
+class EmbeddingCache:
+    """Content-addressed, append-only on-disk cache of embedding vectors.
+
+    Layout under `directory` (one set of files per model):
+      <model>.f32   - raw float32 rows, memory-mapped for reads
+      <model>.keys  - 16-byte keys, row i of .keys belongs to row i of .f32
+      <model>.json  - {"model": ..., "dimension": ...}
+
+    Keys are sha256(model name + normalized text) truncated to 16 bytes, so
+    unchanged text never hits the model twice, across runs and processes.
+    Appends take an advisory file lock so ingestion scripts and the web app
+    can share one cache directory.
+    """
+
+    KEY_BYTES = 16
+
+    def __init__(self, directory: str, model_name: str):
+        self.directory = directory
+        self.model_name = model_name
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.vectors_path = os.path.join(directory, f"{slug}.f32")
+        self.keys_path = os.path.join(directory, f"{slug}.keys")
+        self.meta_path = os.path.join(directory, f"{slug}.json")
+
+        self.dimension: Optional[int] = None
+        self._index: Dict[bytes, int] = {}
+        self._rows = 0
+        # Size of the keys file covered by self._index; a larger file means other processes appended
+        self._keys_size = 0
+        self._mmap: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._refresh()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def key(self, text: str) -> bytes:
+        payload = f"{self.model_name}\0{self.normalize(text)}".encode("utf-8")
+        return hashlib.sha256(payload).digest()[:self.KEY_BYTES]
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached vector per text, or None where the text has not been embedded before"""
+        keys = [self.key(t) for t in texts]
+        with self._lock:
+            self._refresh()
+            matrix = self._matrix()
+            out: List[Optional[np.ndarray]] = []
+            for k in keys:
+                row = self._index.get(k)
+                if row is None or matrix is None:
+                    out.append(None)
+                    self.misses += 1
+                else:
+                    out.append(np.array(matrix[row]))
+                    self.hits += 1
+            return out
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """Append vectors for texts that are not cached yet"""
+        vectors = np.asarray(vectors, dtype="float32")
+        if len(texts) == 0:
+            return
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = int(vectors.shape[1])
+                with open(self.meta_path, "w") as f:
+                    json.dump({"model": self.model_name, "dimension": self.dimension}, f)
+
+            with open(self.keys_path, "ab") as keys_file, open(self.vectors_path, "ab") as vec_file:
+                if fcntl is not None:
+                    fcntl.flock(keys_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    # Another process may have appended since we last looked; drop any
+                    # half-written tail so row i of both files stays aligned
+                    self._catch_up()
+                    vec_file.truncate(self._rows * self.dimension * 4)
+                    keys_file.truncate(self._rows * self.KEY_BYTES)
+
+                    new_keys, new_rows, seen = [], [], set()
+                    for text, vector in zip(texts, vectors):
+                        k = self.key(text)
+                        if k in self._index or k in seen:
+                            continue
+                        seen.add(k)
+                        new_keys.append(k)
+                        new_rows.append(vector)
+                    if not new_keys:
+                        return
+
+                    # Vectors first: a crash in between leaves an orphan row, never a dangling key
+                    vec_file.write(np.vstack(new_rows).astype("float32").tobytes())
+                    vec_file.flush()
+                    keys_file.write(b"".join(new_keys))
+                    keys_file.flush()
+
+                    for k in new_keys:
+                        self._index[k] = self._rows
+                        self._rows += 1
+                    self._keys_size = self._rows * self.KEY_BYTES
+                    self._mmap = None
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(keys_file.fileno(), fcntl.LOCK_UN)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'entries': self._rows,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'path': self.vectors_path
+        }
+
+    def _refresh(self):
+        """Catch up with other processes' appends; a single stat when nothing changed"""
+        try:
+            size = os.stat(self.keys_path).st_size
+        except FileNotFoundError:
+            return
+        if size == self._keys_size:
+            return
+        if self.dimension is None:
+            if not os.path.exists(self.meta_path):
+                return
+            with open(self.meta_path, "r") as f:
+                self.dimension = int(json.load(f)["dimension"])
+        self._catch_up()
+
+    def _catch_up(self):
+        """Index rows appended to the files after our last read"""
+        if self.dimension is None or not os.path.exists(self.keys_path) or not os.path.exists(self.vectors_path):
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._rows * self.KEY_BYTES)
+            data = f.read()
+        vector_rows = os.path.getsize(self.vectors_path) // (self.dimension * 4)
+        available = min(self._rows + len(data) // self.KEY_BYTES, vector_rows)
+        for row in range(self._rows, available):
+            offset = (row - self._rows) * self.KEY_BYTES
+            self._index[data[offset:offset + self.KEY_BYTES]] = row
+        if available != self._rows:
+            self._rows = available
+            self._mmap = None
+        self._keys_size = available * self.KEY_BYTES
+
+    def _matrix(self) -> Optional[np.memmap]:
+        if self._rows == 0 or self.dimension is None:
+            return None
+        if self._mmap is None:
+            self._mmap = np.memmap(self.vectors_path, dtype="float32", mode="r",
+                                   shape=(self._rows, self.dimension))
+        return self._mmap
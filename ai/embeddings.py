@@ -0,0 +1,243 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from ai.embedding_cache import EmbeddingCache
+
+DEFAULT_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# Query vectors kept in memory (queries are never written to the on-disk cache)
+EMBED_QUERY_CACHE = int(os.getenv("EMBED_QUERY_CACHE", "2048"))
+
+
+class EmbeddingBatcher:
+    """Micro-batching queue for single-text encode requests.
+
+    Concurrent callers submit one text each. A worker thread takes the first
+    pending request, waits up to `max_wait_ms` for more (or until
+    `max_batch_size` are queued), and runs them through `encode_fn` as one
+    batch. Each caller gets its vector back through a Future. A larger wait
+    raises throughput under load at the cost of added latency when idle.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray],
+                 max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        return self.submit(text).result(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait_ms / 1000.0
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                vectors = self.encode_fn([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def stats(self) -> Dict:
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+            'pending': self._queue.qsize(),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait_ms
+        }
+
+
+class EmbeddingService:
+    """Process-wide wrapper around one SentenceTransformer model.
+
+    The model is loaded lazily on first use, and all encode calls are
+    serialized through one lock so concurrent Flask threads can share it
+    safely. Single-text lookups (encode_one) go through an EmbeddingBatcher
+    unless EMBED_MICROBATCH=0, and every text is looked up in the on-disk
+    EmbeddingCache (EMBED_CACHE_DIR) before the model runs, unless
+    EMBED_CACHE=0. Only ingestion (encode with persist=True) appends to the
+    disk cache; query traffic (encode_one, persist=False) is kept in a
+    bounded in-memory LRU instead. Use get_embedding_service() instead of
+    constructing this directly.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, batch_size: int = 64,
+                 microbatch: Optional[bool] = None, cache: Optional[bool] = None,
+                 cache_dir: Optional[str] = None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._encode_lock = threading.Lock()
+
+        if cache is None:
+            cache = os.getenv("EMBED_CACHE", "1") != "0"
+        self.cache: Optional[EmbeddingCache] = None
+        if cache:
+            self.cache = EmbeddingCache(cache_dir or os.getenv("EMBED_CACHE_DIR", "./embedding_cache"), model_name)
+
+        self.query_cache_size = EMBED_QUERY_CACHE
+        self._queries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._queries_lock = threading.Lock()
+
+        if microbatch is None:
+            microbatch = os.getenv("EMBED_MICROBATCH", "1") != "0"
+        self.batcher: Optional[EmbeddingBatcher] = None
+        if microbatch:
+            self.batcher = EmbeddingBatcher(
+                lambda texts: self.encode(texts, persist=False),
+                max_batch_size=int(os.getenv("EMBED_BATCH_MAX", "32")),
+                max_wait_ms=float(os.getenv("EMBED_BATCH_WAIT_MS", "2"))
+            )
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    print(f"⏳ Loading embedding model '{self.model_name}'... (this may take a moment)")
+                    self._model = SentenceTransformer(self.model_name)
+                    print("✅ Embeddings model initialized!")
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False, persist: bool = True) -> np.ndarray:
+        """
+        Embed a list of texts in batched forward passes; returns a float32 (n, dim) array.
+        persist=False (queries) reads the disk cache but keeps new vectors in memory only.
+        """
+        if not texts:
+            return np.zeros((0, self.dimension), dtype="float32")
+        vectors: List[Optional[np.ndarray]] = (
+            self.cache.get_many(texts) if self.cache is not None else [None] * len(texts)
+        )
+        if not persist:
+            self._recent_queries(texts, vectors)
+
+        # Only run the model on texts we have never embedded before
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            fresh = self._encode_model(missing_texts, show_progress_bar)
+            if not persist:
+                self._remember_queries(missing_texts, fresh)
+            elif self.cache is not None:
+                self.cache.put_many(missing_texts, fresh)
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+        return np.vstack(vectors).astype("float32", copy=False)
+
+    def _recent_queries(self, texts: List[str], vectors: List[Optional[np.ndarray]]):
+        """Fill disk-cache misses from the in-memory query LRU"""
+        with self._queries_lock:
+            for i, text in enumerate(texts):
+                if vectors[i] is None and text in self._queries:
+                    self._queries.move_to_end(text)
+                    vectors[i] = self._queries[text]
+
+    def _remember_queries(self, texts: List[str], vectors: np.ndarray):
+        if self.query_cache_size <= 0:
+            return
+        with self._queries_lock:
+            for text, vector in zip(texts, vectors):
+                self._queries[text] = vector
+                self._queries.move_to_end(text)
+            while len(self._queries) > self.query_cache_size:
+                self._queries.popitem(last=False)
+
+    def _encode_model(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        model = self.model
+        with self._encode_lock:
+            embeddings = model.encode(
+                list(texts),
+                batch_size=self.batch_size,
+                show_progress_bar=show_progress_bar
+            )
+        return np.asarray(embeddings, dtype="float32")
+
+    def encode_one(self, text: str) -> np.ndarray:
+        """Embed a single text (micro-batched with concurrent callers); returns a float32 (dim,) array"""
+        if self.batcher is not None:
+            return self.batcher.encode(text)
+        return self.encode([text], persist=False)[0]
+
+    def stats(self) -> Dict:
+        return {
+            'model': self.model_name,
+            'loaded': self._model is not None,
+            'cache': self.cache.stats() if self.cache is not None else None,
+            'query_cache': {'size': len(self._queries), 'max_size': self.query_cache_size},
+            'microbatch': self.batcher.stats() if self.batcher is not None else None
+        }
+
+
+_services: Dict[str, EmbeddingService] = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(model_name: Optional[str] = None) -> EmbeddingService:
+    """Return the shared EmbeddingService for `model_name` (one per process)"""
+    name = model_name or DEFAULT_MODEL
+    service = _services.get(name)
+    if service is None:
+        with _services_lock:
+            service = _services.get(name)
+            if service is None:
+                service = EmbeddingService(name)
+                _services[name] = service
+    return service
+
@@ -184,13 +184,14 @@
 
 import google.generativeai as genai
 import os
-from typing import List, Dict, Optional, Any
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Optional, Any, Iterator
+from ai.embeddings import EmbeddingService, get_embedding_service
 
 class GeminiComplete:
     """Complete Gemini API implementation with better error handling"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None,
+                 embedding_service: Optional[EmbeddingService] = None):
         # 1. Get API key safely
         api_key = api_key or os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
         
@@ -209,30 +210,25 @@ class GeminiComplete:
             print(f"❌ Gemini Connection Error: {e}")
             raise e
         
-        # 3. Initialize Embedding Model (REQUIRED for Pinecone)
-        print("⏳ Loading embedding model... (this may take a moment)")
-        try:
-            self.embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-            print("✅ Embeddings model initialized!")
-        except Exception as e:
-            print(f"❌ Embedding Model Failed: {e}")
-            self.embedding_model = None
+        # 3. Shared embedding model (REQUIRED for Pinecone), loaded lazily on first use
+        self.embedding_service = embedding_service or get_embedding_service()
 
     # --- RESTORED FUNCTION (Critical for RAG) ---
     def generate_embeddings(self, text: str) -> List[float]:
         """Convert text to numbers for Pinecone search"""
-        if not self.embedding_model:
-            raise ValueError("Embedding model is not loaded.")
-        
-        embedding = self.embedding_model.encode(text)
+        embedding = self.embedding_service.encode_one(text)
         return embedding.tolist()
     # --------------------------------------------
     
-    def generate_answer(self, query: str, context: str) -> Dict:
-        """Generate answer with a smarter prompt to handle greetings"""
+    def count_tokens(self, text: str) -> int:
+        """Tokens Gemini would bill for `text` (one API call)"""
+        return self.model.count_tokens(text).total_tokens
+    
+    def build_prompt(self, query: str, context: str) -> str:
+        """RAG prompt with a smarter preamble to handle greetings"""
         
         # IMPROVED PROMPT: Handles "Hello" without failing
-        prompt = f"""You are a helpful assistant for a citizen services portal in Sri Lanka.
+        return f"""You are a helpful assistant for a citizen services portal in Sri Lanka.
 
 Context information:
 {context}
@@ -244,6 +240,10 @@ Instructions:
 2. If the user asks a specific question, answer it using ONLY the Context information provided above.
 3. If the answer is not in the context, say "I don't have that specific information in my database, but I can help with Passports, IDs, and Tax information."
 """
+    
+    def generate_answer(self, query: str, context: str) -> Dict:
+        """Generate answer with a smarter prompt to handle greetings"""
+        prompt = self.build_prompt(query, context)
         
         try:
             response = self.model.generate_content(prompt)
@@ -252,15 +252,28 @@ Instructions:
             print(f"❌ Generation Error: {e}")
             return {'answer': f"I encountered an error: {str(e)}", 'success': False}
     
+    def generate_answer_stream(self, query: str, context: str) -> Iterator[str]:
+        """Same as generate_answer, but yields text pieces as Gemini emits them (raises on error)"""
+        prompt = self.build_prompt(query, context)
+        
+        for chunk in self.model.generate_content(prompt, stream=True):
+            text = getattr(chunk, 'text', '')
+            if text:
+                yield text
+    
+    def _to_gemini_history(self, history: Optional[List[Dict]]) -> List[Dict]:
+        chat_history = []
+        if history:
+            for msg in history:
+                role = 'model' if msg.get('role') == 'assistant' else 'user'
+                chat_history.append({'role': role, 'parts': [msg.get('content', '')]})
+        return chat_history
+    
     def chat(self, message: str, history: Optional[List[Dict]] = None) -> Dict:
         """Interactive chat with conversation history"""
         try:
             # 1. Prepare history for Gemini
-            chat_history = []
-            if history:
-                for msg in history:
-                    role = 'model' if msg.get('role') == 'assistant' else 'user'
-                    chat_history.append({'role': role, 'parts': [msg.get('content', '')]})
+            chat_history = self._to_gemini_history(history)
 
             # 2. Start Chat
             chat = self.model.start_chat(history=chat_history)
@@ -284,6 +297,15 @@ Instructions:
                 'history': history or [],
                 'success': False
             }
+    
+    def chat_stream(self, message: str, history: Optional[List[Dict]] = None) -> Iterator[str]:
+        """Streaming variant of chat: yields text pieces of the reply (raises on error)"""
+        chat = self.model.start_chat(history=self._to_gemini_history(history))
+        
+        for chunk in chat.send_message(message, stream=True):
+            text = getattr(chunk, 'text', '')
+            if text:
+                yield text
 
 # --- TEST BLOCK ---
 if __name__ == "__main__":
@@ -1,87 +1,298 @@
 from ai.gemini_complete import GeminiComplete
-from ai.chroma_store import ChromaVectorStore
-from typing import Dict, List, Optional
+from ai.store_base import BaseVectorStore, make_vector_store
+from ai.answer_cache import SemanticAnswerCache
+from ai.hybrid_retriever import HybridRetriever
+from ai.reranker import RERANK, RERANK_CANDIDATES, CrossEncoderReranker
+from ai.context_packer import CONTEXT_TOKENIZER, ContextPacker
+from typing import Dict, List, Optional, Iterator
 import json
+import time
 
 class GeminiRAGSystem:
-    """Complete RAG system using Gemini + ChromaDB (100% FREE)"""
+    """Complete RAG system using Gemini + a pluggable vector store (ChromaDB by default, 100% FREE)"""
     
-    def __init__(self):
+    def __init__(self, gemini: Optional[GeminiComplete] = None,
+                 vector_store: Optional[BaseVectorStore] = None,
+                 answer_cache: Optional[SemanticAnswerCache] = None,
+                 retriever: Optional[HybridRetriever] = None,
+                 reranker: Optional[CrossEncoderReranker] = None,
+                 packer: Optional[ContextPacker] = None):
         print("🚀 Initializing Gemini RAG System...")
-        self.gemini = GeminiComplete()
-        self.vector_store = ChromaVectorStore()
+        self.gemini = gemini or GeminiComplete()
+        # Backend chosen by VECTOR_STORE (chroma, faiss, pinecone, pinecone-local)
+        self.vector_store = vector_store or make_vector_store()
+        self.answer_cache = answer_cache or SemanticAnswerCache()
+        # BM25 + dense with rank fusion (RETRIEVAL_MODE=dense for the vector store alone)
+        self.retriever = retriever or HybridRetriever(self.vector_store)
+        # Optional cross-encoder pass over a wider candidate pool (RERANK=1)
+        self.reranker = reranker or (CrossEncoderReranker() if RERANK else None)
+        # Dedupes overlapping chunks and fits the context into CONTEXT_TOKEN_BUDGET
+        self.packer = packer or ContextPacker(
+            count_tokens=self.gemini.count_tokens if CONTEXT_TOKENIZER == "gemini" else None
+        )
         print("✓ System ready!")
     
+    def warmup(self):
+        """Run one throwaway search so the first real query doesn't pay for lazy model loading"""
+        start = time.perf_counter()
+        try:
+            self.retriever.refresh()
+            self.retriever.search("warmup", n_results=1)
+            if self.reranker:
+                self.reranker.warmup()
+            print(f"✓ Retriever warm ({(time.perf_counter() - start) * 1000:.0f} ms)")
+        except Exception as e:
+            print(f"⚠️ Retriever warmup failed: {e}")
+    
     def add_documents(self, documents: List[Dict]) -> int:
         """Add documents to knowledge base"""
-        return self.vector_store.add_documents(documents)
+        count = self.vector_store.add_documents(documents)
+        self.answer_cache.clear()
+        return count
+    
+    def sync_documents(self, documents: List[Dict], group: str = "default", prune: bool = False) -> Dict:
+        """Incrementally sync documents (see BaseVectorStore.sync_documents)"""
+        summary = self.vector_store.sync_documents(documents, group=group, prune=prune)
+        if summary['added'] or summary['deleted']:
+            self.answer_cache.clear()
+        return summary
     
     def search_only(self, query: str, n_results: int = 5) -> List[Dict]:
         """Just search without answer generation"""
-        return self.vector_store.search(query, n_results)
+        return self.retriever.search(query, n_results)
+    
+    def _retrieve(self, query: str, n_results: int, timings: Dict):
+        """Search the vector store (re-ranking a wider pool when enabled) and pack the prompt context"""
+        start = time.perf_counter()
+        if self.reranker:
+            candidates = self.retriever.search(query, max(n_results, RERANK_CANDIDATES), timings=timings)
+            docs = self.reranker.rerank(query, candidates, n_results, timings=timings)
+        else:
+            docs = self.retriever.search(query, n_results, timings=timings)
+        docs, context = self.packer.pack(docs, lambda i, doc: f"[Source {i}: {self._cite(doc)}]", timings)
+        timings['retrieve_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        return docs, context
+    
+    @staticmethod
+    def _cite(doc: Dict) -> str:
+        return f"{doc['source']} (page {doc['page']})" if doc.get('page') else doc['source']
+    
+    def _no_docs_response(self, query: str, timings: Dict) -> Dict:
+        return {
+            'query': query,
+            'answer': "I don't have information about that in my knowledge base. Please try rephrasing your question or contact support.",
+            'sources': [],
+            'chunks': [],
+            'confidence': 'low',
+            'retrieved_docs': 0,
+            'success': True,
+            'timings': timings
+        }
+    
+    def _error_response(self, query: str, error: str, timings: Dict) -> Dict:
+        return {
+            'query': query,
+            'answer': "I encountered an error generating the answer. Please try again.",
+            'sources': [],
+            'chunks': [],
+            'confidence': 'low',
+            'success': False,
+            'error': error,
+            'timings': timings
+        }
+    
+    def _format_response(self, query: str, answer: str, docs: List[Dict], timings: Dict) -> Dict:
+        return {
+            'query': query,
+            'answer': answer,
+            'sources': [
+                {
+                    'url': doc['source'],
+                    'title': doc.get('title', 'Document'),
+                    'page': doc.get('page'),
+                    'relevance_score': doc['score']
+                }
+                for doc in docs
+            ],
+            'chunks': [
+                {
+                    'text': doc['text'],
+                    'source': doc['source'],
+                    'title': doc.get('title', ''),
+                    'page': doc.get('page'),
+                    'score': doc['score']
+                }
+                for doc in docs
+            ],
+            'confidence': 'high' if len(docs) >= 3 else 'medium',
+            'retrieved_docs': len(docs),
+            'success': True,
+            'timings': timings,
+            'cached': False,
+            'model': 'gemini-2.5-flash'
+        }
+    
+    def _cache_get(self, query: str, context: str, timings: Dict):
+        """Return (query_embedding, cached_response or None)"""
+        cache_start = time.perf_counter()
+        query_embedding = self._cache_lookup_embedding(query)
+        if query_embedding is None:
+            return None, None
+        cached = self.answer_cache.get(query_embedding, context)
+        timings['cache_ms'] = round((time.perf_counter() - cache_start) * 1000, 2)
+        return query_embedding, cached
+    
+    def _cache_put(self, query_embedding, context: str, response: Dict):
+        if query_embedding is not None:
+            self.answer_cache.put(query_embedding, context, {
+                k: v for k, v in response.items() if k not in ('query', 'timings', 'cached')
+            })
     
     def answer_query(self, query: str, n_results: int = 5) -> Dict:
         """
         Complete RAG pipeline:
         1. Retrieve relevant documents
-        2. Generate answer with Gemini
-        3. Return answer with sources
+        2. Generate answer with Gemini (or reuse the cached answer of a near-duplicate query)
+        3. Return answer with sources, retrieved chunks and per-stage timings (ms)
         """
+        timings = {}
+        start = time.perf_counter()
         
-        # Step 1: Retrieve relevant documents
-        docs = self.vector_store.search(query, n_results)
-        
+        # Step 1: Retrieve relevant documents and prepare context with sources
+        docs, context = self._retrieve(query, n_results, timings)
         if not docs:
-            return {
-                'query': query,
-                'answer': "I don't have information about that in my knowledge base. Please try rephrasing your question or contact support.",
-                'sources': [],
-                'confidence': 'low',
-                'retrieved_docs': 0
-            }
+            timings['total_ms'] = timings['retrieve_ms']
+            return self._no_docs_response(query, timings)
         
-        # Step 2: Prepare context with sources
-        context = "\n\n".join([
-            f"[Source {i+1}: {doc['source']}]\n{doc['text']}"
-            for i, doc in enumerate(docs)
-        ])
+        # Step 2: Serve near-duplicate questions over the same context from the answer cache
+        query_embedding, cached = self._cache_get(query, context, timings)
+        if cached is not None:
+            timings['total_ms'] = round((time.perf_counter() - start) * 1000, 2)
+            cached.update({'query': query, 'timings': timings, 'cached': True})
+            return cached
         
         # Step 3: Generate answer with Gemini
+        gen_start = time.perf_counter()
         result = self.gemini.generate_answer(query, context)
+        timings['generate_ms'] = round((time.perf_counter() - gen_start) * 1000, 2)
+        timings['total_ms'] = round((time.perf_counter() - start) * 1000, 2)
         
         if not result['success']:
-            return {
-                'query': query,
-                'answer': "I encountered an error generating the answer. Please try again.",
-                'sources': [],
-                'confidence': 'low',
-                'error': result.get('error', 'Unknown error')
-            }
+            return self._error_response(query, result.get('error', result.get('answer', 'Unknown error')), timings)
         
         # Step 4: Format response
-        return {
-            'query': query,
-            'answer': result['answer'],
-            'sources': [
-                {
-                    'url': doc['source'],
-                    'title': doc.get('title', 'Document'),
-                    'relevance_score': doc['score']
-                }
-                for doc in docs
-            ],
-            'confidence': 'high' if len(docs) >= 3 else 'medium',
-            'retrieved_docs': len(docs),
-            'model': 'gemini-pro'
-        }
+        response = self._format_response(query, result['answer'], docs, timings)
+        self._cache_put(query_embedding, context, response)
+        return response
+    
+    def answer_query_stream(self, query: str, n_results: int = 5) -> Iterator[Dict]:
+        """
+        Streaming RAG pipeline. Yields {'type': 'token', 'text': ...} events while
+        Gemini generates, then one {'type': 'done', ...} event carrying the same
+        fields as answer_query (sources, chunks, timings) minus the full answer text.
+        Any failure (retrieval, packing or generation) ends the stream with an
+        {'type': 'error'} event followed by 'done'.
+        """
+        timings = {}
+        start = time.perf_counter()
+        streamed = False
+        try:
+            for event in self._answer_events(query, n_results, timings, start):
+                streamed = streamed or event['type'] == 'token'
+                yield event
+        except Exception as e:
+            print(f"❌ Streaming answer error: {e}")
+            timings['total_ms'] = round((time.perf_counter() - start) * 1000, 2)
+            response = self._error_response(query, str(e), timings)
+            answer = response.pop('answer')
+            if not streamed:
+                yield {'type': 'token', 'text': answer}
+            yield {'type': 'error', 'error': str(e)}
+            yield dict(response, type='done')
+    
+    def _answer_events(self, query: str, n_results: int, timings: Dict, start: float) -> Iterator[Dict]:
+        docs, context = self._retrieve(query, n_results, timings)
+        if not docs:
+            timings['total_ms'] = timings['retrieve_ms']
+            response = self._no_docs_response(query, timings)
+            yield {'type': 'token', 'text': response.pop('answer')}
+            yield dict(response, type='done')
+            return
+        
+        query_embedding, cached = self._cache_get(query, context, timings)
+        if cached is not None:
+            timings['total_ms'] = round((time.perf_counter() - start) * 1000, 2)
+            cached.update({'query': query, 'timings': timings, 'cached': True})
+            yield {'type': 'token', 'text': cached.pop('answer')}
+            yield dict(cached, type='done')
+            return
+        
+        gen_start = time.perf_counter()
+        parts = []
+        try:
+            for text in self.gemini.generate_answer_stream(query, context):
+                if not parts:
+                    timings['first_token_ms'] = round((time.perf_counter() - start) * 1000, 2)
+                parts.append(text)
+                yield {'type': 'token', 'text': text}
+        finally:
+            timings['generate_ms'] = round((time.perf_counter() - gen_start) * 1000, 2)
+        timings['total_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        
+        response = self._format_response(query, "".join(parts), docs, timings)
+        self._cache_put(query_embedding, context, response)
+        response.pop('answer')
+        yield dict(response, type='done')
+    
+    def _cache_lookup_embedding(self, query: str):
+        """Embed the query for the answer cache; None disables caching for this call"""
+        try:
+            self.answer_cache.check_fingerprint(self.vector_store.fingerprint())
+            return self.gemini.generate_embeddings(query)
+        except Exception as e:
+            print(f"⚠️ Answer cache unavailable: {e}")
+            return None
+    
+    def get_cache_stats(self) -> Dict:
+        """Answer cache hit/miss counters"""
+        return self.answer_cache.stats()
     
     def chat(self, message: str, history: Optional[List[Dict]] = None) -> Dict:
         """Chat with conversation history"""
         return self.gemini.chat(message, history)
     
+    def chat_stream(self, message: str, history: Optional[List[Dict]] = None) -> Iterator[Dict]:
+        """Streaming chat: token events, then a 'done' event with the updated history and timings"""
+        timings = {}
+        start = time.perf_counter()
+        parts = []
+        try:
+            for text in self.gemini.chat_stream(message, history):
+                if not parts:
+                    timings['first_token_ms'] = round((time.perf_counter() - start) * 1000, 2)
+                parts.append(text)
+                yield {'type': 'token', 'text': text}
+        except Exception as e:
+            print(f"❌ Streaming chat error: {e}")
+            timings['total_ms'] = round((time.perf_counter() - start) * 1000, 2)
+            yield {'type': 'error', 'error': str(e)}
+            yield {'type': 'done', 'success': False, 'error': str(e), 'history': history or [], 'timings': timings}
+            return
+        timings['total_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        
+        new_history = history or []
+        new_history.append({'role': 'user', 'content': message})
+        new_history.append({'role': 'assistant', 'content': "".join(parts)})
+        yield {'type': 'done', 'success': True, 'history': new_history, 'timings': timings}
+    
     def get_stats(self) -> Dict:
         """Get system statistics"""
-        return self.vector_store.get_stats()
+        return {
+            **self.vector_store.get_stats(),
+            'retrieval': self.retriever.stats(),
+            'reranker': self.reranker.stats() if self.reranker else None,
+            'context': self.packer.stats()
+        }
 
 # Example usage and testing
 if __name__ == "__main__":
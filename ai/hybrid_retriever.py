@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from ai.bm25 import BM25Index, tokenize
+
+# "hybrid" (BM25 + dense, fused), "dense" or "sparse"
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# Candidates taken from each side before fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+# Reciprocal rank fusion constant (60 in the original RRF paper)
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Seconds between background ID-set checks against the store when no change was seen
+HYBRID_RECHECK_S = float(os.getenv("HYBRID_RECHECK_S", "30"))
+
+
+class HybridRetriever:
+    """
+    Sparse + dense retrieval over the chunks in a vector store (BaseVectorStore).
+
+    A BM25 index over the same chunks catches exact tokens that dense
+    embeddings blur: form names ("Form A"), fee amounts, hotline numbers
+    (1962) and licence classes (B1, C1). The dense search runs on a worker
+    thread while BM25 is scored on the caller's thread. The two rankings
+    are merged with reciprocal rank fusion, sum(1 / (RRF_K + rank)), which
+    needs no score calibration between the sides.
+
+    The BM25 index holds chunk IDs and postings only; the text and
+    metadata of the BM25 hits are read back from the store per query. It is
+    kept in line with the store by a background thread: woken as soon as a
+    search sees the store's fingerprint change, and otherwise every
+    `recheck_s` seconds, it diffs the store's ID set against the index
+    (for backends whose fingerprint misses writes from other processes).
+    Chunk IDs are content hashes, so only added and deleted IDs need work.
+    Until the first pass finishes, sparse search returns nothing and hybrid
+    search is dense only, so start-up does not wait for it.
+    """
+
+    def __init__(self, vector_store, mode: str = RETRIEVAL_MODE,
+                 candidates: int = HYBRID_CANDIDATES, rrf_k: int = RRF_K,
+                 recheck_s: float = HYBRID_RECHECK_S):
+        self.vector_store = vector_store
+        self.mode = mode
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.recheck_s = recheck_s
+        self.bm25 = BM25Index()
+        self._ids: set = set()
+        self._fingerprint: Optional[str] = None
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dense-search")
+
+    # -------------------------------------------------------------
+    # Sparse index maintenance
+    # -------------------------------------------------------------
+    def refresh(self):
+        """Schedule a background sync when the store has changed (never blocks)"""
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="bm25-sync", daemon=True)
+                    self._worker.start()
+        if self.vector_store.fingerprint() != self._fingerprint:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"⚠️ BM25 sync failed: {e}")
+            self._wake.wait(self.recheck_s)
+            self._wake.clear()
+
+    def sync(self):
+        """Bring the BM25 index in line with the vector store's ID set"""
+        with self._sync_lock:
+            start = time.perf_counter()
+            fingerprint = self.vector_store.fingerprint()
+            ids = set(self.vector_store.all_ids())
+            with self._lock:
+                stale = [doc_id for doc_id in self._ids if doc_id not in ids]
+                for doc_id in stale:
+                    self.bm25.remove(doc_id)
+                self._ids.difference_update(stale)
+                new = [doc_id for doc_id in ids if doc_id not in self._ids]
+
+            batch = []
+            for doc_id, text, meta in self.vector_store.iter_documents(new):
+                batch.append((doc_id, tokenize(f"{meta.get('title', '')}\n{text}")))
+                if len(batch) >= 500:
+                    self._add(batch)
+                    batch = []
+            self._add(batch)
+            self._fingerprint = fingerprint
+            if new or stale:
+                print(f"✓ BM25 index: +{len(new)} -{len(stale)} chunks "
+                      f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+
+    def _add(self, batch):
+        # The lock is taken per batch, so searches run while a large store is indexed
+        with self._lock:
+            for doc_id, tokens in batch:
+                self.bm25.add(doc_id, tokens)
+                self._ids.add(doc_id)
+
+    # -------------------------------------------------------------
+    # Search
+    # -------------------------------------------------------------
+    def sparse_search(self, query: str, n_results: int) -> List[Dict]:
+        self.refresh()
+        with self._lock:
+            hits = self.bm25.search(query, k=n_results, prefix=False)
+        found = {doc_id: (text, meta) for doc_id, text, meta in
+                 self.vector_store.iter_documents([doc_id for doc_id, _ in hits])}
+        results = []
+        # Chunks deleted since the last sync are skipped
+        for doc_id, score in hits:
+            if doc_id in found:
+                text, meta = found[doc_id]
+                results.append({
+                    'id': doc_id,
+                    'text': text,
+                    'source': meta.get('source', ''),
+                    'title': meta.get('title', ''),
+                    'page': meta.get('page'),
+                    'score': score,
+                    'bm25_score': score
+                })
+        return results
+
+    def dense_search(self, query: str, n_results: int) -> List[Dict]:
+        return [dict(doc, dense_score=doc.get('score')) for doc in self.vector_store.search(query, n_results)]
+
+    def fuse(self, rankings: List[List[Dict]], n_results: int) -> List[Dict]:
+        """Reciprocal rank fusion; `score` is rescaled so a doc ranked first on every side gets 1.0"""
+        fused: Dict[str, Dict] = {}
+        for ranking in rankings:
+            for rank, doc in enumerate(ranking, start=1):
+                key = doc.get('id') or doc['text']
+                entry = fused.setdefault(key, dict(doc, rrf_score=0.0))
+                entry.update({k: v for k, v in doc.items() if k.endswith('_score')})
+                entry['rrf_score'] += 1.0 / (self.rrf_k + rank)
+
+        best_possible = len(rankings) / (self.rrf_k + 1)
+        results = sorted(fused.values(), key=lambda d: d['rrf_score'], reverse=True)[:n_results]
+        for doc in results:
+            doc['score'] = round(doc['rrf_score'] / best_possible, 4)
+        return results
+
+    def search(self, query: str, n_results: int = 5, mode: Optional[str] = None,
+               timings: Optional[Dict] = None) -> List[Dict]:
+        mode = mode or self.mode
+        if mode == "dense":
+            return self.dense_search(query, n_results)
+        if mode == "sparse":
+            return self.sparse_search(query, n_results)
+
+        pool_size = max(self.candidates, n_results)
+        start = time.perf_counter()
+        dense_future = self._pool.submit(self.dense_search, query, pool_size)
+        sparse = self.sparse_search(query, pool_size)
+        sparse_ms = (time.perf_counter() - start) * 1000
+        dense = dense_future.result()
+        if timings is not None:
+            timings['sparse_ms'] = round(sparse_ms, 2)
+            timings['dense_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        return self.fuse([dense, sparse], n_results)
+
+    def stats(self) -> Dict:
+        return {'mode': self.mode, 'candidates': self.candidates, 'rrf_k': self.rrf_k,
+                'synced': self._fingerprint is not None, **self.bm25.stats()}
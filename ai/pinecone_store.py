@@ -1,14 +1,112 @@
-from pinecone import Pinecone, ServerlessSpec
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Iterator, List, Dict, Any, Optional, Tuple
 
-class PineconeStore:
-    def __init__(self, api_key: str, index_name: str):
+import numpy as np
+
+from ai.embeddings import EmbeddingService, get_embedding_service
+from ai.store_base import BaseVectorStore
+
+
+class LocalPineconeIndex:
+    """
+    In-process stand-in for a Pinecone index (cosine metric), covering the
+    calls PineconeStore makes: upsert, query, fetch, delete, list and
+    describe_index_stats. Used for offline runs and the store conformance
+    checks; search is exact brute force over a numpy matrix.
+    """
+
+    def __init__(self, dimension: Optional[int] = None):
+        self.dimension = dimension
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._metadata: Dict[str, Dict] = {}
+        self._vectors = np.zeros((0, dimension or 0), dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors: List[Tuple[str, List[float], Dict]]):
+        with self._lock:
+            for doc_id, values, metadata in vectors:
+                vector = np.asarray(values, dtype=np.float32)
+                vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+                if self._vectors.shape[1] != len(vector):
+                    if self._ids:
+                        raise ValueError(f"Vector dimension {len(vector)} does not match the index ({self._vectors.shape[1]})")
+                    self._vectors = np.zeros((0, len(vector)), dtype=np.float32)
+                if doc_id in self._rows:
+                    self._vectors[self._rows[doc_id]] = vector
+                else:
+                    self._rows[doc_id] = len(self._ids)
+                    self._ids.append(doc_id)
+                    self._vectors = np.vstack([self._vectors, vector[None, :]])
+                self._metadata[doc_id] = dict(metadata or {})
+        return {'upserted_count': len(vectors)}
+
+    def delete(self, ids: List[str]):
+        drop = set(ids)
+        with self._lock:
+            keep = [i for i, doc_id in enumerate(self._ids) if doc_id not in drop]
+            self._vectors = self._vectors[keep]
+            self._ids = [self._ids[i] for i in keep]
+            self._rows = {doc_id: i for i, doc_id in enumerate(self._ids)}
+            for doc_id in ids:
+                self._metadata.pop(doc_id, None)
+
+    def query(self, vector: List[float], top_k: int, include_metadata: bool = False):
+        with self._lock:
+            if not self._ids:
+                return SimpleNamespace(matches=[])
+            query = np.asarray(vector, dtype=np.float32)
+            scores = self._vectors @ (query / max(float(np.linalg.norm(query)), 1e-12))
+            top = np.argsort(-scores)[:top_k]
+            return SimpleNamespace(matches=[
+                SimpleNamespace(id=self._ids[i], score=float(scores[i]),
+                                metadata=dict(self._metadata[self._ids[i]]) if include_metadata else None)
+                for i in top
+            ])
+
+    def fetch(self, ids: List[str]):
+        with self._lock:
+            return SimpleNamespace(vectors={
+                doc_id: SimpleNamespace(id=doc_id, values=self._vectors[self._rows[doc_id]].tolist(),
+                                        metadata=dict(self._metadata[doc_id]))
+                for doc_id in ids if doc_id in self._rows
+            })
+
+    def list(self, limit: int = 100) -> Iterator[List[str]]:
+        with self._lock:
+            ids = list(self._ids)
+        for i in range(0, len(ids), limit):
+            yield ids[i:i + limit]
+
+    def describe_index_stats(self):
+        return SimpleNamespace(total_vector_count=len(self._ids), dimension=self._vectors.shape[1])
+
+
+class PineconeStore(BaseVectorStore):
+    """Pinecone serverless index (or a LocalPineconeIndex passed as `index`)"""
+
+    backend = "pinecone"
+
+    def __init__(self, api_key: Optional[str] = None, index_name: Optional[str] = None,
+                 embedding_service: Optional[EmbeddingService] = None, index: Any = None,
+                 manifest_dir: Optional[str] = None, dimension: int = 384):
         """Initialize Pinecone client and connect to / create index."""
-        
-        self.pc = Pinecone(api_key=api_key)
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        super().__init__(embedding_service or get_embedding_service(), manifest_dir=manifest_dir)
         self.index_name = index_name
+        # Pinecone queries one vector per request; search_many runs them concurrently
+        self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="pinecone-query")
+
+        if index is not None:
+            self.index = index
+            self.backend = "pinecone-local" if isinstance(index, LocalPineconeIndex) else "pinecone"
+            return
+
+        from pinecone import Pinecone, ServerlessSpec
+        if not api_key or not index_name:
+            raise ValueError("❌ PINECONE_API_KEY and PINECONE_INDEX are required for the Pinecone store")
+        self.pc = Pinecone(api_key=api_key)
 
         # Check existing indexes
         existing_indexes = self.pc.list_indexes().names()
@@ -18,7 +116,7 @@ class PineconeStore:
 
             self.pc.create_index(
                 name=index_name,
-                dimension=384,
+                dimension=dimension,
                 metric="cosine",
                 spec=ServerlessSpec(
                     cloud="aws",
@@ -30,48 +128,65 @@ class PineconeStore:
         self.index = self.pc.Index(index_name)
         print(f"[INFO] Connected to index '{index_name}'.")
 
-    def upsert_documents(self, documents: List[Dict]):
-        """Embed and upload documents to Pinecone."""
-        
-        texts = [doc["text"] for doc in documents]
-        embeddings = self.model.encode(texts, show_progress_bar=True)
-
-        vectors = [
-            (
-                f"doc_{i}",
-                embedding.tolist(),
-                {"text": doc["text"], "source": doc["source"]}
-            )
-            for i, (embedding, doc) in enumerate(zip(embeddings, documents))
+    # -------------------------------------------------------------
+    # BaseVectorStore hooks
+    # -------------------------------------------------------------
+    def _upsert(self, ids: List[str], texts: List[str], vectors: np.ndarray, metadatas: List[Dict]):
+        records = [
+            (doc_id, vector.tolist(), {**meta, 'text': text})
+            for doc_id, text, vector, meta in zip(ids, texts, vectors, metadatas)
         ]
 
         # Upsert in batches
         batch_size = 100
-        for i in range(0, len(vectors), batch_size):
-            batch = vectors[i:i + batch_size]
-            self.index.upsert(vectors=batch)
+        for i in range(0, len(records), batch_size):
+            self.index.upsert(vectors=records[i:i + batch_size])
 
-        print(f"[INFO] Upserted {len(documents)} documents.")
+    def _delete(self, ids: List[str]):
+        for i in range(0, len(ids), 1000):
+            self.index.delete(ids=ids[i:i + 1000])
 
-    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
-        """Search Pinecone index with a text query."""
-        
-        query_embedding = self.model.encode([query])[0]
+    def _fetch(self, ids: List[str]) -> Dict[str, Any]:
+        found = {}
+        for i in range(0, len(ids), 100):
+            found.update(self.index.fetch(ids=ids[i:i + 100]).vectors)
+        return found
 
-        results = self.index.query(
-            vector=query_embedding.tolist(),
-            top_k=k,
-            include_metadata=True
-        )
+    def _existing_ids(self, ids: List[str]) -> set:
+        return set(self._fetch(ids))
 
+    def _query_one(self, vector: np.ndarray, n_results: int) -> List[Dict]:
+        results = self.index.query(vector=vector.tolist(), top_k=n_results, include_metadata=True)
         # Access matches - cast to dict if needed to avoid type warnings
         matches = getattr(results, 'matches', [])
-        
         return [
-            {
-                "text": match.metadata.get("text"),
-                "source": match.metadata.get("source"),
-                "score": match.score
-            }
+            self._result(match.id, (match.metadata or {}).get('text', ''), match.metadata, match.score)
             for match in matches
-        ]
\ No newline at end of file
+        ]
+
+    def _query(self, vectors: np.ndarray, n_results: int) -> List[List[Dict]]:
+        if len(vectors) == 1:
+            return [self._query_one(vectors[0], n_results)]
+        return list(self._pool.map(lambda vector: self._query_one(vector, n_results), vectors))
+
+    def all_ids(self) -> List[str]:
+        return [doc_id for page in self.index.list() for doc_id in page]
+
+    def iter_documents(self, ids: Optional[List[str]] = None,
+                       batch_size: int = 100) -> Iterator[Tuple[str, str, Dict]]:
+        """Yield (id, text, metadata) for the given chunk IDs, or for every chunk"""
+        if ids is None:
+            ids = self.all_ids()
+        for i in range(0, len(ids), batch_size):
+            for doc_id, record in self._fetch(ids[i:i + batch_size]).items():
+                meta = dict(record.metadata or {})
+                yield doc_id, meta.pop('text', ''), meta
+
+    def count(self) -> int:
+        return int(self.index.describe_index_stats().total_vector_count)
+
+    def upsert_documents(self, documents: List[Dict]) -> int:
+        """Embed and upload documents to Pinecone."""
+        count = self.upsert(documents)
+        print(f"[INFO] Upserted {count} documents.")
+        return count
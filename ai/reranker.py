@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional
+
+import numpy as np
+
+RERANK = os.getenv("RERANK", "0") != "0"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Chunks retrieved for the re-ranker to choose from
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+# Longest the request waits for the re-ranker before falling back to retrieval order
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "256"))
+
+
+class CrossEncoderReranker:
+    """
+    Re-score retrieved chunks with a small cross-encoder and keep the best k.
+
+    All (query, chunk) pairs are scored in one batched forward pass on a
+    single worker thread. The request waits at most `budget_ms`; if the
+    scores are not ready by then (slow hardware, or other requests queued on
+    the model), the candidates are returned in retrieval order and the
+    late result is discarded. Re-ranking is also skipped up front when the
+    recent average for this many pairs already exceeds the budget, or when a
+    batch is already waiting for the model, so timeouts cannot pile up work.
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL, budget_ms: float = RERANK_BUDGET_MS,
+                 max_length: int = RERANK_MAX_LENGTH):
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.max_length = max_length
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+        # Exponential moving average of milliseconds per scored pair
+        self._ms_per_pair: Optional[float] = None
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+
+        self.runs = 0
+        self.skipped = 0
+        self.timeouts = 0
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    print(f"⏳ Loading re-ranker '{self.model_name}'...")
+                    self._model = CrossEncoder(self.model_name, max_length=self.max_length)
+                    print("✅ Re-ranker initialized!")
+        return self._model
+
+    def warmup(self):
+        self._score("warmup", ["warmup"])
+
+    def _score(self, query: str, texts: List[str]) -> np.ndarray:
+        start = time.perf_counter()
+        scores = np.asarray(self.model.predict([(query, text) for text in texts],
+                                               batch_size=max(len(texts), 1),
+                                               show_progress_bar=False), dtype=np.float32)
+        per_pair = (time.perf_counter() - start) * 1000 / max(len(texts), 1)
+        self._ms_per_pair = per_pair if self._ms_per_pair is None else 0.8 * self._ms_per_pair + 0.2 * per_pair
+        return scores
+
+    def _finished(self, _future):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    def rerank(self, query: str, docs: List[Dict], k: int, budget_ms: Optional[float] = None,
+               timings: Optional[Dict] = None) -> List[Dict]:
+        """Best `k` of `docs` by cross-encoder score (adds 'rerank_score'), or the first `k` on timeout"""
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        if len(docs) <= 1:
+            return docs[:k]
+
+        with self._in_flight_lock:
+            over_budget = self._ms_per_pair is not None and self._ms_per_pair * len(docs) > budget_ms
+            if over_budget or self._in_flight >= 2:
+                self.skipped += 1
+                if over_budget:
+                    # Shrink the estimate so re-ranking is retried once the model is less busy
+                    self._ms_per_pair *= 0.9
+                if timings is not None:
+                    timings['rerank'] = 'skipped'
+                return docs[:k]
+            self._in_flight += 1
+
+        start = time.perf_counter()
+        future = self._pool.submit(self._score, query, [doc['text'] for doc in docs])
+        future.add_done_callback(self._finished)
+        try:
+            scores = future.result(timeout=budget_ms / 1000.0)
+        except FutureTimeout:
+            self.timeouts += 1
+            if timings is not None:
+                timings['rerank'] = 'timeout'
+            return docs[:k]
+
+        self.runs += 1
+        ranked = sorted(
+            (dict(doc, rerank_score=float(score)) for doc, score in zip(docs, scores)),
+            key=lambda d: d['rerank_score'], reverse=True
+        )
+        if timings is not None:
+            timings['rerank'] = 'ok'
+            timings['rerank_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        return ranked[:k]
+
+    def stats(self) -> Dict:
+        return {
+            'model': self.model_name,
+            'loaded': self._model is not None,
+            'budget_ms': self.budget_ms,
+            'ms_per_pair': round(self._ms_per_pair, 3) if self._ms_per_pair is not None else None,
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'timeouts': self.timeouts
+        }
@@ -0,0 +1,427 @@
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ai.embeddings import EmbeddingService, get_embedding_service
+
+# "chroma", "faiss", "pinecone" or "pinecone-local" (in-process stand-in, no API key)
+VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma")
+
+
+class BaseVectorStore:
+    """
+    Contract shared by every vector store backend.
+
+    Documents are dicts with 'text' and optional 'source', 'title', 'page'
+    and 'chunk_id'. Their ID is a hash of source + text (document_id), so
+    re-adding a chunk is a no-op and a changed chunk gets a new ID.
+
+    Writes: add (skips IDs already indexed), upsert (re-embeds and
+    overwrites), delete, and per-source sync with manifests. Reads: search
+    and search_many, which embed all queries in one batch. Both return
+    dicts with id, text, source, title, page, score (cosine similarity,
+    higher is better) and distance (1 - score). Also all_ids,
+    iter_documents, count and fingerprint.
+
+    A backend implements _upsert, _delete, _existing_ids, _query, all_ids,
+    iter_documents and count, and may override the rest for speed.
+    Documents are embedded with the shared EmbeddingService.
+    """
+
+    backend = "base"
+
+    def __init__(self, embedding_service: Optional[EmbeddingService] = None,
+                 manifest_dir: Optional[str] = None):
+        self.embedding_service = embedding_service or get_embedding_service()
+        # Per-source manifests make sync_source cheap; without them sources are found by scanning
+        self.manifest_dir = manifest_dir
+        # Bumped on every write so caches built on top of search results can invalidate
+        self.version = 0
+        # Rewritten on every write, so other processes sharing the store see the change too
+        self.version_path = os.path.join(manifest_dir, "VERSION") if manifest_dir else None
+        # Inside batch_writes() persisting is deferred until the outermost block ends
+        self._batch_depth = 0
+        self._dirty = False
+
+    # -------------------------------------------------------------
+    # Backend hooks
+    # -------------------------------------------------------------
+    def _upsert(self, ids: List[str], texts: List[str], vectors: np.ndarray, metadatas: List[Dict]):
+        raise NotImplementedError
+
+    def _delete(self, ids: List[str]):
+        raise NotImplementedError
+
+    def _existing_ids(self, ids: List[str]) -> set:
+        raise NotImplementedError
+
+    def _query(self, vectors: np.ndarray, n_results: int) -> List[List[Dict]]:
+        """One result list per query vector, built with _result"""
+        raise NotImplementedError
+
+    def all_ids(self) -> List[str]:
+        raise NotImplementedError
+
+    def iter_documents(self, ids: Optional[List[str]] = None,
+                       batch_size: int = 500) -> Iterator[Tuple[str, str, Dict]]:
+        """Yield (id, text, metadata) for the given chunk IDs, or for every chunk"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def persist(self):
+        """Called after every write (once per batch_writes block); backends that keep state in memory save it here"""
+
+    # -------------------------------------------------------------
+    # Documents
+    # -------------------------------------------------------------
+    @staticmethod
+    def document_id(doc: Dict) -> str:
+        """Deterministic chunk ID derived from the source URL and the chunk text"""
+        text = " ".join(doc['text'].split())
+        payload = f"{doc.get('source', '')}\0{text}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()[:32]
+
+    def _prepare(self, documents: List[Dict]) -> Dict[str, Dict]:
+        """Map stable ID -> document, dropping duplicate chunks"""
+        prepared = {}
+        for doc in documents:
+            prepared.setdefault(self.document_id(doc), doc)
+        return prepared
+
+    @staticmethod
+    def _metadata(doc: Dict) -> Dict:
+        metadata = {
+            'source': doc.get('source', ''),
+            'chunk_id': str(doc.get('chunk_id', 0)),
+            'title': doc.get('title', '')
+        }
+        if doc.get('page') is not None:
+            metadata['page'] = int(doc['page'])
+        return metadata
+
+    @staticmethod
+    def _result(doc_id: str, text: str, meta: Optional[Dict], score: Optional[float]) -> Dict:
+        meta = meta or {}
+        return {
+            'id': doc_id,
+            'text': text,
+            'source': meta.get('source', ''),
+            'title': meta.get('title', ''),
+            'page': meta.get('page'),
+            'score': score,
+            'distance': 1 - score if score is not None else None
+        }
+
+    def _write(self, prepared: Dict[str, Dict]):
+        ids = list(prepared)
+        texts = [prepared[i]['text'] for i in ids]
+        vectors = np.asarray(self.embedding_service.encode(texts), dtype=np.float32)
+        self._upsert(ids, texts, vectors, [self._metadata(prepared[i]) for i in ids])
+
+    def _changed(self):
+        self.version += 1
+        if self._batch_depth:
+            self._dirty = True
+            return
+        self.persist()
+        self._bump_stored_version()
+
+    @contextmanager
+    def batch_writes(self):
+        """Group several writes so the store is persisted once, when the outermost block exits"""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth and self._dirty:
+                self._dirty = False
+                self.persist()
+                self._bump_stored_version()
+
+    def _stored_version(self) -> Optional[str]:
+        """Write token shared by every process using this store (None when the backend has none)"""
+        if not self.version_path:
+            return None
+        try:
+            with open(self.version_path, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return ""
+
+    def _bump_stored_version(self):
+        if not self.version_path:
+            return
+        os.makedirs(os.path.dirname(self.version_path), exist_ok=True)
+        tmp = f"{self.version_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(uuid.uuid4().hex)
+        os.replace(tmp, self.version_path)
+
+    # -------------------------------------------------------------
+    # Writes
+    # -------------------------------------------------------------
+    def add(self, documents: List[Dict]) -> int:
+        """Add documents; chunks that are already indexed are skipped. Returns the number added"""
+        prepared = self._prepare(documents)
+        existing = self._existing_ids(list(prepared))
+        new = {i: doc for i, doc in prepared.items() if i not in existing}
+        if new:
+            self._write(new)
+            self._changed()
+        print(f"✓ Added {len(new)} documents ({len(prepared) - len(new)} already indexed)")
+        return len(new)
+
+    def add_documents(self, documents: List[Dict]) -> int:
+        return self.add(documents)
+
+    def upsert(self, documents: List[Dict]) -> int:
+        """Embed and write every document, replacing stored text and metadata. Returns the number written"""
+        prepared = self._prepare(documents)
+        if prepared:
+            self._write(prepared)
+            self._changed()
+        return len(prepared)
+
+    def delete(self, ids: List[str]) -> int:
+        """Delete chunks by ID; unknown IDs are ignored. Returns the number deleted"""
+        found = sorted(self._existing_ids(list(ids)))
+        if found:
+            self._delete(found)
+            self._changed()
+        return len(found)
+
+    def delete_all(self):
+        """Clear all documents"""
+        ids = self.all_ids()
+        if ids:
+            self._delete(ids)
+        for manifest in self.list_manifests():
+            os.remove(self._manifest_path(manifest['source']))
+        self._changed()
+
+    # -------------------------------------------------------------
+    # Reads
+    # -------------------------------------------------------------
+    def search(self, query: str, n_results: int = 5) -> List[Dict]:
+        """Search for similar documents"""
+        vector = np.asarray(self.embedding_service.encode_one(query), dtype=np.float32)
+        return self._query(vector.reshape(1, -1), n_results)[0]
+
+    def search_many(self, queries: List[str], n_results: int = 5) -> List[List[Dict]]:
+        """search() for several queries, embedded in one batch"""
+        if not queries:
+            return []
+        vectors = np.asarray(self.embedding_service.encode(list(queries), persist=False), dtype=np.float32)
+        return self._query(vectors, n_results)
+
+    def fingerprint(self) -> str:
+        """
+        Cheap token that changes whenever the store changes. Writes from other
+        processes are seen through the stored write token; a backend without
+        one only reflects this process's writes and the chunk count.
+        """
+        return f"{self._stored_version()}:{self.version}:{self.count()}"
+
+    def get_stats(self) -> Dict:
+        return {'backend': self.backend, 'total_documents': self.count()}
+
+    # -------------------------------------------------------------
+    # Incremental ingestion with per-source manifests
+    # -------------------------------------------------------------
+    def _manifest_path(self, source: str) -> str:
+        name = hashlib.sha1(source.encode("utf-8")).hexdigest()
+        return os.path.join(self.manifest_dir, f"{name}.json")
+
+    def _load_manifest(self, source: str) -> Optional[Dict]:
+        if not self.manifest_dir:
+            return None
+        path = self._manifest_path(source)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_manifest(self, source: str, group: str, ids: List[str]):
+        if not self.manifest_dir:
+            return
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        path = self._manifest_path(source)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                'source': source,
+                'group': group,
+                'ids': sorted(ids),
+                'updated_at': datetime.utcnow().isoformat()
+            }, f)
+        os.replace(tmp, path)
+
+    def list_manifests(self, group: Optional[str] = None) -> List[Dict]:
+        """Indexed sources (optionally only those written by one ingestion group)"""
+        if not self.manifest_dir or not os.path.isdir(self.manifest_dir):
+            return []
+        manifests = []
+        for name in os.listdir(self.manifest_dir):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(self.manifest_dir, name), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if group is None or manifest.get('group') == group:
+                manifests.append(manifest)
+        return manifests
+
+    def _ids_for_source(self, source: str) -> List[str]:
+        """IDs indexed for a source when it has no manifest (full scan unless overridden)"""
+        return [doc_id for doc_id, _, meta in self.iter_documents() if meta.get('source', '') == source]
+
+    def sync_source(self, source: str, documents: List[Dict], group: str = "default") -> Dict:
+        """
+        Make the index hold exactly `documents` for `source`:
+        new or changed chunks are embedded and upserted, unchanged chunks are
+        skipped and chunks no longer present are deleted.
+        """
+        prepared = self._prepare(documents)
+        manifest = self._load_manifest(source)
+
+        if manifest is not None:
+            indexed = set(manifest['ids'])
+        else:
+            # No manifest yet (first sync, or data indexed before manifests existed)
+            indexed = set(self._ids_for_source(source))
+
+        new = {i: doc for i, doc in prepared.items() if i not in indexed}
+        stale = sorted(indexed - set(prepared))
+
+        if new:
+            self._write(new)
+        if stale:
+            self._delete(stale)
+        if new or stale:
+            self._changed()
+        self._save_manifest(source, group, list(prepared))
+
+        return {'added': len(new), 'unchanged': len(prepared) - len(new), 'deleted': len(stale)}
+
+    def remove_source(self, source: str) -> int:
+        """Delete every chunk of a source and its manifest"""
+        manifest = self._load_manifest(source)
+        ids = manifest['ids'] if manifest is not None else self._ids_for_source(source)
+        if ids:
+            self._delete(ids)
+            self._changed()
+        if manifest is not None:
+            os.remove(self._manifest_path(source))
+        return len(ids)
+
+    def sync_documents(self, documents: List[Dict], group: str = "default", prune: bool = False) -> Dict:
+        """
+        Incrementally sync a batch of chunks grouped by their 'source'.
+        With prune=True, sources previously synced by the same `group` that are
+        missing from this batch are removed from the index (needs manifests).
+        """
+        by_source: Dict[str, List[Dict]] = {}
+        for doc in documents:
+            by_source.setdefault(doc.get('source', ''), []).append(doc)
+
+        summary = {'sources': len(by_source), 'added': 0, 'unchanged': 0, 'deleted': 0, 'removed_sources': 0}
+        if prune and not self.manifest_dir:
+            print(f"⚠️ prune=True ignored: the {self.backend} store has no manifest_dir to find synced sources")
+        with self.batch_writes():
+            for source, docs in by_source.items():
+                result = self.sync_source(source, docs, group=group)
+                for key in ('added', 'unchanged', 'deleted'):
+                    summary[key] += result[key]
+
+            if prune:
+                for manifest in self.list_manifests(group):
+                    if manifest['source'] not in by_source:
+                        summary['deleted'] += self.remove_source(manifest['source'])
+                        summary['removed_sources'] += 1
+
+        print(f"✓ Synced {summary['sources']} sources: +{summary['added']} new, "
+              f"{summary['unchanged']} unchanged, -{summary['deleted']} removed")
+        return summary
+
+
+class AsyncVectorStore:
+    """
+    asyncio front for any BaseVectorStore.
+
+    Every call runs the blocking store method on a thread pool, so an event
+    loop can issue many searches at once without stalling. Attributes that
+    are not wrapped (fingerprint, all_ids, ...) pass through to the store.
+    """
+
+    def __init__(self, store: BaseVectorStore, max_workers: int = 8):
+        self.store = store
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{store.backend}-async")
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, partial(fn, *args, **kwargs))
+
+    async def add(self, documents: List[Dict]) -> int:
+        return await self._run(self.store.add, documents)
+
+    async def upsert(self, documents: List[Dict]) -> int:
+        return await self._run(self.store.upsert, documents)
+
+    async def delete(self, ids: List[str]) -> int:
+        return await self._run(self.store.delete, ids)
+
+    async def search(self, query: str, n_results: int = 5) -> List[Dict]:
+        return await self._run(self.store.search, query, n_results)
+
+    async def search_many(self, queries: List[str], n_results: int = 5) -> List[List[Dict]]:
+        return await self._run(self.store.search_many, queries, n_results)
+
+    async def sync_documents(self, documents: List[Dict], group: str = "default", prune: bool = False) -> Dict:
+        return await self._run(self.store.sync_documents, documents, group, prune)
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+def make_vector_store(backend: Optional[str] = None,
+                      embedding_service: Optional[EmbeddingService] = None) -> BaseVectorStore:
+    """
+    Build the store selected by VECTOR_STORE (or `backend`):
+      chroma          CHROMA_DIR (./chroma_db)
+      faiss           FAISS_INDEX_PATH (data/faiss_index.bin), FAISS_DOCS_PATH (data/documents.sqlite),
+                      manifests in data/faiss_manifests
+      pinecone        PINECONE_API_KEY, PINECONE_INDEX (citizen-portal),
+                      PINECONE_MANIFEST_DIR (data/pinecone_manifests)
+      pinecone-local  in-memory Pinecone stand-in, for offline runs (no manifests)
+    """
+    backend = (backend or VECTOR_STORE).lower()
+    if backend == "chroma":
+        from ai.chroma_store import ChromaVectorStore
+        return ChromaVectorStore(persist_directory=os.getenv("CHROMA_DIR", "./chroma_db"),
+                                 embedding_service=embedding_service)
+    if backend == "faiss":
+        from ai.vector_store import VectorStore
+        return VectorStore(embedding_service=embedding_service,
+                           index_path=os.getenv("FAISS_INDEX_PATH", "data/faiss_index.bin"),
+                           docs_path=os.getenv("FAISS_DOCS_PATH", "data/documents.sqlite"))
+    if backend == "pinecone":
+        from ai.pinecone_store import PineconeStore
+        return PineconeStore(api_key=os.getenv("PINECONE_API_KEY"),
+                             index_name=os.getenv("PINECONE_INDEX", "citizen-portal"),
+                             embedding_service=embedding_service,
+                             manifest_dir=os.getenv("PINECONE_MANIFEST_DIR", "data/pinecone_manifests"))
+    if backend == "pinecone-local":
+        from ai.pinecone_store import LocalPineconeIndex, PineconeStore
+        return PineconeStore(index=LocalPineconeIndex(), embedding_service=embedding_service)
+    raise ValueError(f"Unknown VECTOR_STORE '{backend}' (expected chroma, faiss, pinecone or pinecone-local)")
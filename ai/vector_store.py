@@ -1,78 +1,641 @@
-from sentence_transformers import SentenceTransformer
 import faiss  # type: ignore
 import numpy as np
+import hashlib
 import json
+import math
 import pickle
-from typing import List, Dict, Tuple, Any
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple, Any
 import os
+from ai.embeddings import EmbeddingService, get_embedding_service
+from ai.store_base import BaseVectorStore
 
+# "flat" (exact), "hnsw" (graph), "ivf" (inverted lists) or "ivfpq" (inverted lists + product quantization)
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_EF_CONSTRUCTION = int(os.getenv("FAISS_EF_CONSTRUCTION", "200"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+# Inverted lists for IVF indexes; 0 picks 4 * sqrt(N) when the index is trained
+FAISS_NLIST = int(os.getenv("FAISS_NLIST", "0"))
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+# Sub-quantizers for IVF-PQ (8 bits each): 384 dims / 48 = 8 dims per byte
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "48"))
+# IVF indexes need this many vectors to train; smaller stores stay on the flat index
+FAISS_TRAIN_MIN = int(os.getenv("FAISS_TRAIN_MIN", "10000"))
+# Most chunks k-means is trained on when an IVF index is rebuilt
+FAISS_TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", "150000"))
+# Open saved indexes memory-mapped (pages shared with the OS cache); "0" reads them into memory
+FAISS_MMAP = os.getenv("FAISS_MMAP", "1") != "0"
 
-class VectorStore:
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
+INDEX_TYPES = ("flat", "hnsw", "ivf", "ivfpq")
+
+
+def index_kind(index) -> str:
+    """Which of INDEX_TYPES a (possibly ID-mapped) FAISS index is"""
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else faiss.downcast_index(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def new_faiss_index(index_type: str, train_vectors: np.ndarray, total: Optional[int] = None,
+                    hnsw_m: int = FAISS_HNSW_M, ef_construction: int = FAISS_EF_CONSTRUCTION,
+                    nlist: int = FAISS_NLIST, pq_m: int = FAISS_PQ_M):
+    """
+    Empty inner-product index of `index_type` for vectors like
+    `train_vectors` (unit length, so scores are cosine similarities). IVF
+    types are trained on `train_vectors`, with nlist sized for `total`.
+    """
+    dimension = train_vectors.shape[1]
+    if index_type == "flat":
+        return faiss.IndexIDMap(faiss.IndexFlatIP(dimension))
+    if index_type == "hnsw":
+        graph = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        graph.hnsw.efConstruction = ef_construction
+        return faiss.IndexIDMap(graph)
+    if index_type in ("ivf", "ivfpq"):
+        # ~39 training points per centroid keeps k-means stable
+        nlist = nlist or int(4 * math.sqrt(total or len(train_vectors)))
+        nlist = max(1, min(nlist, len(train_vectors) // 39))
+        quantizer = faiss.IndexFlatIP(dimension)
+        if index_type == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, 8, faiss.METRIC_INNER_PRODUCT)
+        index.train(train_vectors)  # type: ignore
+        return index
+    raise ValueError(f"Unknown FAISS index type '{index_type}' (expected one of {', '.join(INDEX_TYPES)})")
+
+
+def build_faiss_index(index_type: str, vectors: np.ndarray, keys: np.ndarray, **kwargs):
+    """new_faiss_index trained on `vectors` and holding them under int64 `keys`"""
+    index = new_faiss_index(index_type, vectors, len(vectors), **kwargs)
+    if len(vectors):
+        index.add_with_ids(vectors, keys)  # type: ignore
+    return index
+
+
+def set_search_params(index, ef_search: Optional[int] = None, nprobe: Optional[int] = None):
+    """Apply efSearch (HNSW) / nprobe (IVF); parameters the index doesn't have are ignored"""
+    kind = index_kind(index)
+    params = faiss.ParameterSpace()
+    if kind == "hnsw" and ef_search:
+        params.set_index_parameter(index, "efSearch", ef_search)
+    if kind in ("ivf", "ivfpq") and nprobe:
+        params.set_index_parameter(index, "nprobe", nprobe)
+
+
+def index_labels(index) -> List[int]:
+    """The IDs stored in an index: its ID map, its IVF inverted lists, or row numbers"""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.vector_to_array(index.id_map).tolist()
+    inner = faiss.downcast_index(index)
+    if isinstance(inner, faiss.IndexIVF):
+        invlists = inner.invlists
+        labels: List[int] = []
+        for i in range(inner.nlist):
+            size = invlists.list_size(i)
+            if size:
+                labels.extend(faiss.rev_swig_ptr(invlists.get_ids(i), size).tolist())
+        return labels
+    return list(range(index.ntotal))
+
+
+def normalized(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.array(vectors, dtype=np.float32, order="C", copy=True)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def read_index(path: str, mmap: bool = FAISS_MMAP) -> Tuple[Any, bool]:
+    """(index, memory-mapped?); falls back to reading into memory when mmap fails"""
+    if mmap:
+        # MMAP_IFC maps every index type without copying; older FAISS can only map IVF lists
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", 0) or faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        try:
+            return faiss.read_index(path, flags), True
+        except RuntimeError as e:
+            print(f"⚠️ Could not memory-map {path}, reading it into memory: {e}")
+    return faiss.read_index(path), False
+
+
+class ChunkTable:
+    """
+    Chunk text and metadata in SQLite, keyed by FAISS ID and read per hit.
+    Nothing is loaded up front, so opening a store costs the same at any
+    corpus size. `path=None` keeps the table in memory. The connection is
+    shared across threads; callers serialize access.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        if path:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                key INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, text TEXT NOT NULL,
+                source TEXT, title TEXT, page INTEGER, chunk_id TEXT
+            );
+            CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source);
+            CREATE TABLE IF NOT EXISTS tombstones (key INTEGER PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO meta VALUES ('version', 0);
+            -- Row count kept by triggers, in the writing transaction, so count() needs no table scan
+            INSERT OR IGNORE INTO meta VALUES ('rows', (SELECT COUNT(*) FROM chunks));
+            CREATE TRIGGER IF NOT EXISTS chunks_counted_insert AFTER INSERT ON chunks
+                BEGIN UPDATE meta SET value = value + 1 WHERE name = 'rows'; END;
+            CREATE TRIGGER IF NOT EXISTS chunks_counted_delete AFTER DELETE ON chunks
+                BEGIN UPDATE meta SET value = value - 1 WHERE name = 'rows'; END;
+        """)
+
+    @staticmethod
+    def _doc(row) -> Dict:
+        doc = {'id': row[1], 'text': row[2], 'source': row[3] or '', 'title': row[4] or '', 'chunk_id': row[6]}
+        if row[5] is not None:
+            doc['page'] = row[5]
+        return doc
+
+    @staticmethod
+    def _batches(keys: List[int], size: int = 500) -> Iterator[Tuple[List[int], str]]:
+        """Key batches with their "?, ?, ..." placeholders (SQLite caps bound variables)"""
+        for i in range(0, len(keys), size):
+            batch = keys[i:i + size]
+            yield batch, ",".join("?" * len(batch))
+
+    def put(self, rows: List[Tuple[int, str, str, Dict]]):
+        """Insert or replace (key, id, text, metadata) rows"""
+        with self.conn:
+            # An upsert rather than INSERT OR REPLACE: REPLACE's implicit delete skips the count trigger
+            self.conn.executemany(
+                "INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                "id = excluded.id, text = excluded.text, source = excluded.source, title = excluded.title, "
+                "page = excluded.page, chunk_id = excluded.chunk_id",
+                [(key, doc_id, text, meta.get('source', ''), meta.get('title', ''), meta.get('page'),
+                  meta.get('chunk_id')) for key, doc_id, text, meta in rows]
+            )
+
+    def delete(self, keys: List[int]) -> List[int]:
+        """Delete rows; returns the keys that existed"""
+        found = sorted(self.existing(keys))
+        with self.conn:
+            for batch, marks in self._batches(found):
+                self.conn.execute(f"DELETE FROM chunks WHERE key IN ({marks})", batch)
+        return found
+
+    def get(self, keys: Iterable[int]) -> Dict[int, Dict]:
+        docs = {}
+        for batch, marks in self._batches(list(keys)):
+            for row in self.conn.execute(f"SELECT * FROM chunks WHERE key IN ({marks})", batch):
+                docs[row[0]] = self._doc(row)
+        return docs
+
+    def existing(self, keys: Iterable[int]) -> set:
+        found = set()
+        for batch, marks in self._batches(list(keys)):
+            found.update(row[0] for row in self.conn.execute(f"SELECT key FROM chunks WHERE key IN ({marks})", batch))
+        return found
+
+    def keys(self) -> List[int]:
+        return [row[0] for row in self.conn.execute("SELECT key FROM chunks ORDER BY key")]
+
+    def ids(self, source: Optional[str] = None) -> List[str]:
+        if source is None:
+            return [row[0] for row in self.conn.execute("SELECT id FROM chunks")]
+        return [row[0] for row in self.conn.execute("SELECT id FROM chunks WHERE source = ?", (source,))]
+
+    def scan(self, after: int = -1, limit: int = 1000) -> List[Tuple[int, Dict]]:
+        """Up to `limit` (key, doc) rows with key > after, in key order"""
+        return [(row[0], self._doc(row)) for row in self.conn.execute(
+            "SELECT * FROM chunks WHERE key > ? ORDER BY key LIMIT ?", (after, limit))]
+
+    def sample_texts(self, n: int) -> List[str]:
+        return [row[0] for row in self.conn.execute("SELECT text FROM chunks ORDER BY RANDOM() LIMIT ?", (n,))]
+
+    def count(self) -> int:
+        """Row count shared by every connection to the file (kept in meta by triggers)"""
+        return self.conn.execute("SELECT value FROM meta WHERE name = 'rows'").fetchone()[0]
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM chunks")
+            self.conn.execute("DELETE FROM tombstones")
+
+    def tombstones(self) -> set:
+        return {row[0] for row in self.conn.execute("SELECT key FROM tombstones")}
+
+    def set_tombstones(self, keys: Iterable[int], replace: bool = False):
+        with self.conn:
+            if replace:
+                self.conn.execute("DELETE FROM tombstones")
+            self.conn.executemany("INSERT OR IGNORE INTO tombstones VALUES (?)", [(key,) for key in keys])
+
+    def version(self) -> int:
+        """Write counter shared by every connection to the file"""
+        return self.conn.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()[0]
+
+    def bump_version(self):
+        with self.conn:
+            self.conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'version'")
+
+    def backup(self, path: str):
+        """Copy the table to another SQLite file"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        target = sqlite3.connect(path)
+        try:
+            self.conn.backup(target)
+        finally:
+            target.close()
+
+
+class VectorStore(BaseVectorStore):
+    """
+    FAISS vector store with cosine similarity (inner product over unit
+    vectors) and a selectable index type:
+
+      flat   exact search, O(N) per query; best below ~100k chunks
+      hnsw   graph search tuned by efSearch; fast and accurate, more memory
+      ivf    k-means inverted lists tuned by nprobe; needs training
+      ivfpq  ivf with product-quantized vectors (FAISS_PQ_M bytes each)
+
+    Vectors are keyed by a 60-bit hash of the chunk ID, so chunks can be
+    deleted in place. HNSW cannot remove vectors, so deleted chunks are
+    hidden and the graph is rebuilt once they pass a fifth of the index.
+    IVF types stay on a flat index until FAISS_TRAIN_MIN chunks exist.
+    rebuild() re-embeds the live chunks (from the embedding cache) and
+    retrains.
+
+    Chunk text and metadata live in a SQLite ChunkTable at `docs_path` and
+    only the hits of a query are read. A saved index is memory-mapped on
+    load and copied into memory on the first write. With `index_path` set,
+    the index is saved after every write (once per batch_writes block), and
+    per-source manifests are kept in faiss_manifests beside it. An index
+    file saved by another process is reopened on the next search or write.
+    """
+
+    backend = "faiss"
+
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2',
+                 embedding_service: Optional[EmbeddingService] = None,
+                 index_path: Optional[str] = None, docs_path: Optional[str] = None,
+                 index_type: str = FAISS_INDEX_TYPE, ef_search: int = FAISS_EF_SEARCH,
+                 nprobe: int = FAISS_NPROBE, train_min: int = FAISS_TRAIN_MIN, mmap: bool = FAISS_MMAP):
         """Initialize model and index settings"""
-        self.model = SentenceTransformer(model_name)
-        self.dimension = 384  # Embedding size for MiniLM
+        # Per-source manifests live beside the index (data/faiss_manifests for the default path)
+        manifest_dir = os.path.join(os.path.dirname(index_path) or ".", "faiss_manifests") if index_path else None
+        super().__init__(embedding_service or get_embedding_service(model_name), manifest_dir=manifest_dir)
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type '{index_type}' (expected one of {', '.join(INDEX_TYPES)})")
+        self.index_type = index_type
+        self.ef_search = ef_search
+        self.nprobe = nprobe
+        self.train_min = train_min
+        self.mmap = mmap
         self.index: Any = None
-        self.documents: List[Dict] = []
+        # True while self.index is a read-only mapping of index_path
+        self._mapped = False
+        self.index_path = index_path
+        # (inode, mtime, size) of index_path as last read or written here
+        self._index_stamp: Optional[Tuple[int, int, int]] = None
+        self._lock = threading.RLock()
+        # One rebuild at a time; it runs mostly outside _lock
+        self._rebuild_lock = threading.Lock()
+
+        # Older saves pickled the documents; they are imported into the table once
+        legacy_docs = None
+        if docs_path:
+            stem, ext = os.path.splitext(docs_path)
+            legacy_docs = docs_path if ext == ".pkl" else stem + ".pkl"
+            docs_path = stem + ".sqlite" if ext == ".pkl" else docs_path
+        self.docs_path = docs_path
+        migrate = bool(docs_path and not os.path.exists(docs_path) and os.path.exists(legacy_docs))
+        self.documents = ChunkTable(docs_path)
+        # Keys still in an HNSW graph whose chunks were deleted
+        self._tombstones: set = self.documents.tombstones()
+
+        if index_path and docs_path and os.path.exists(index_path):
+            self.load(index_path, legacy_docs if migrate else docs_path)
+        elif self.documents.count():
+            print(f"⚠️ {index_path} is missing: rebuilding it from {docs_path}")
+            self.rebuild()
+            self.persist()
+
+    @staticmethod
+    def _faiss_id(doc_id: str) -> int:
+        return int(hashlib.sha1(doc_id.encode("utf-8")).hexdigest()[:15], 16)
+
+    def _target_kind(self, count: int) -> str:
+        if self.index_type in ("ivf", "ivfpq") and count < self.train_min:
+            return "flat"
+        if self.index_type == "ivfpq" and count < 256:
+            # 8-bit PQ codebooks need at least 256 training vectors
+            return "flat"
+        return self.index_type
+
+    def _writable(self):
+        """Replace a memory-mapped (read-only) index with an in-memory copy before changing it"""
+        if self._mapped:
+            self.index = faiss.read_index(self.index_path)
+            set_search_params(self.index, self.ef_search, self.nprobe)
+            self._mapped = False
+
+    @staticmethod
+    def _file_stamp(path: str) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _reload_if_replaced(self):
+        """
+        Reopen index_path when another process has saved over it (caller holds
+        the lock). The chunk table is shared through SQLite; this keeps the
+        vectors in step with it. Skipped while a batch of writes is unsaved.
+        """
+        if not self.index_path or self._dirty:
+            return
+        stamp = self._file_stamp(self.index_path)
+        if stamp == self._index_stamp:
+            return
+        self._index_stamp = stamp
+        if stamp is None:
+            if self.index is not None and not self.documents.count():
+                self.index, self._mapped, self._tombstones = None, False, set()
+            return
+        self.index, self._mapped = read_index(self.index_path, self.mmap)
+        set_search_params(self.index, self.ef_search, self.nprobe)
+        self._tombstones = self.documents.tombstones() if index_kind(self.index) == "hnsw" else set()
+
+    def _set_tombstones(self, keys: set):
+        self._tombstones = keys
+        self.documents.set_tombstones(keys, replace=True)
+
+    def rebuild(self, batch_size: int = 4096):
+        """
+        Re-embed every live chunk and build the configured index type from
+        scratch. IVF types are retrained on up to FAISS_TRAIN_SAMPLE random
+        chunks; texts are streamed from the table in batches. The new index is
+        built from a snapshot of the keys without holding the store lock, so
+        searches keep running on the old one; chunks written or deleted in the
+        meantime are applied to it before it is swapped in.
+        """
+        with self._rebuild_lock:
+            start = time.perf_counter()
+            with self._lock:
+                keys = self.documents.keys()
+                kind = self._target_kind(len(keys))
+                train = self.documents.sample_texts(FAISS_TRAIN_SAMPLE) if kind in ("ivf", "ivfpq") else None
+            total = len(keys)
+
+            index = new_faiss_index(kind, normalized(self.embedding_service.encode(train)), total) if train else None
+            built: set = set()
+            for i in range(0, total, batch_size):
+                with self._lock:
+                    docs = self.documents.get(keys[i:i + batch_size])
+                # Chunks deleted since the snapshot are gone from `docs`
+                batch = [key for key in keys[i:i + batch_size] if key in docs]
+                if not batch:
+                    continue
+                vectors = normalized(self.embedding_service.encode([docs[key]['text'] for key in batch]))
+                if index is None:
+                    index = new_faiss_index(kind, vectors, total)
+                index.add_with_ids(vectors, np.array(batch, dtype=np.int64))  # type: ignore
+                built.update(batch)
+
+            with self._lock:
+                live = set(self.documents.keys())
+                added = sorted(live - built)
+                if added:
+                    # Written during the build: few, and their embeddings are cached
+                    docs = self.documents.get(added)
+                    vectors = normalized(self.embedding_service.encode([docs[key]['text'] for key in added]))
+                    if index is None:
+                        index = new_faiss_index(self._target_kind(len(live)), vectors, len(live))
+                    index.add_with_ids(vectors, np.array(added, dtype=np.int64))  # type: ignore
+                removed = built - live
+                tombstones: set = set()
+                if not live:
+                    index = None
+                elif removed and index_kind(index) == "hnsw":
+                    tombstones = removed
+                elif removed:
+                    index.remove_ids(np.array(sorted(removed), dtype=np.int64))
+                if index is not None:
+                    set_search_params(index, self.ef_search, self.nprobe)
+                self.index, self._mapped = index, False
+                self._set_tombstones(tombstones)
+            if total >= 1000:
+                print(f"[✔] FAISS {kind} index built over {total} vectors in {time.perf_counter() - start:.1f}s")
+
+    def set_search_params(self, ef_search: Optional[int] = None, nprobe: Optional[int] = None):
+        """Trade recall for latency at query time (see scripts/bench_faiss.py)"""
+        with self._lock:
+            self.ef_search = ef_search or self.ef_search
+            self.nprobe = nprobe or self.nprobe
+            if self.index is not None:
+                set_search_params(self.index, self.ef_search, self.nprobe)
 
     # -------------------------------------------------------------
     # Generate embeddings
     # -------------------------------------------------------------
     def create_embeddings(self, texts: List[str]) -> np.ndarray:
         """Generate embeddings for a list of sentences."""
-        embeddings = self.model.encode(texts, show_progress_bar=True)
-        embeddings = np.array(embeddings).astype('float32')
-        return embeddings
+        return self.embedding_service.encode(texts, show_progress_bar=True)
 
     # -------------------------------------------------------------
-    # Build FAISS index
+    # BaseVectorStore hooks
     # -------------------------------------------------------------
-    def build_index(self, documents: List[Dict]):
-        """
-        Build a FAISS vector index using a list of documents.
-        Each document must contain a "text" field.
-        """
-        self.documents = documents
-        texts = [doc["text"] for doc in documents]
+    def _upsert(self, ids: List[str], texts: List[str], vectors: np.ndarray, metadatas: List[Dict]):
+        keys = [self._faiss_id(i) for i in ids]
+        with self._lock:
+            self._reload_if_replaced()
+            # The ID hashes the text, so an indexed key already has the right vector
+            indexed = self.documents.existing(keys) | (self._tombstones & set(keys))
+            fresh = [row for row, key in enumerate(keys) if key not in indexed]
+            self.documents.put(list(zip(keys, ids, texts, metadatas)))
+            if self._tombstones & set(keys):
+                self._set_tombstones(self._tombstones - set(keys))
+
+            if fresh:
+                vectors = normalized(vectors[fresh])
+                if self.index is None:
+                    self.index = new_faiss_index(self._target_kind(len(fresh)), vectors, len(fresh))
+                    set_search_params(self.index, self.ef_search, self.nprobe)
+                self._writable()
+                self.index.add_with_ids(vectors, np.array([keys[r] for r in fresh], dtype=np.int64))  # type: ignore
+
+            count = self.documents.count()
+            retrain = self.index is None or index_kind(self.index) != self._target_kind(count)
+        if retrain:
+            # Enough chunks to train the configured IVF index
+            self.rebuild()
+
+    def _delete(self, ids: List[str]):
+        with self._lock:
+            self._reload_if_replaced()
+            keys = self.documents.delete([self._faiss_id(i) for i in ids])
+            if self.index is None or not keys:
+                return
+            if index_kind(self.index) == "hnsw":
+                self._tombstones |= set(keys)
+                self.documents.set_tombstones(keys)
+                compact = len(self._tombstones) > 0.2 * self.index.ntotal
+            else:
+                self._writable()
+                self.index.remove_ids(np.array(keys, dtype=np.int64))
+                compact = False
+        if compact:
+            self.rebuild()
+
+    def _existing_ids(self, ids: List[str]) -> set:
+        keys = {self._faiss_id(i): i for i in ids}
+        with self._lock:
+            return {keys[key] for key in self.documents.existing(keys)}
+
+    def _ids_for_source(self, source: str) -> List[str]:
+        with self._lock:
+            return self.documents.ids(source)
+
+    def _query(self, vectors: np.ndarray, n_results: int) -> List[List[Dict]]:
+        with self._lock:
+            self._reload_if_replaced()
+            if self.index is None or self.index.ntotal == 0:
+                return [[] for _ in range(len(vectors))]
+            # Deleted HNSW entries still come back from the graph; ask for extra to cover them,
+            # and widen the search until every query has n_results live hits (or the index is exhausted)
+            fetch = n_results * 2 if self._tombstones else n_results
+            while True:
+                k = min(fetch, self.index.ntotal)
+                scores, indices = self.index.search(normalized(vectors), k)  # type: ignore
+                # One table lookup for every hit in the batch
+                hits = self.documents.get({key for key in indices.ravel().tolist() if key >= 0})
+                live = min(sum(key in hits for key in row) for row in indices.tolist())
+                if live >= n_results or k == self.index.ntotal or not self._tombstones:
+                    break
+                fetch *= 2
 
-        # Generate embeddings
-        embeddings = self.create_embeddings(texts)
+        batches = []
+        for row_ids, row_scores in zip(indices, scores):
+            docs = []
+            for key, score in zip(row_ids.tolist(), row_scores.tolist()):
+                doc = hits.get(key)
+                if doc is not None and len(docs) < n_results:
+                    docs.append(self._result(doc['id'], doc['text'], doc, score))
+            batches.append(docs)
+        return batches
 
-        # Create FAISS L2 index
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.index.add(embeddings)  # type: ignore
+    def all_ids(self) -> List[str]:
+        with self._lock:
+            return self.documents.ids()
 
-        print(f"[✔] FAISS Index built with {self.index.ntotal} vectors")
+    def iter_documents(self, ids: Optional[List[str]] = None,
+                       batch_size: int = 500) -> Iterator[Tuple[str, str, Dict]]:
+        """Yield (id, text, metadata) for the given chunk IDs, or for every chunk"""
+        def batches() -> Iterator[List[Dict]]:
+            # The lock is held per batch only, never while the caller consumes it
+            if ids is not None:
+                for i in range(0, len(ids), batch_size):
+                    with self._lock:
+                        yield list(self.documents.get(self._faiss_id(d) for d in ids[i:i + batch_size]).values())
+                return
+            after = -1
+            while True:
+                with self._lock:
+                    rows = self.documents.scan(after, batch_size)
+                if not rows:
+                    return
+                after = rows[-1][0]
+                yield [doc for _, doc in rows]
+
+        for docs in batches():
+            for doc in docs:
+                yield doc['id'], doc['text'], {k: v for k, v in doc.items() if k not in ('id', 'text')}
+
+    def count(self) -> int:
+        return self.documents.count()
+
+    def persist(self):
+        if not self.index_path or self._mapped:
+            return
+        if self.index is not None:
+            self._write_index(self.index_path)
+        elif os.path.exists(self.index_path):
+            os.remove(self.index_path)
+            self._index_stamp = None
+
+    def _stored_version(self) -> Optional[str]:
+        with self._lock:
+            return str(self.documents.version())
+
+    def fingerprint(self) -> str:
+        """The shared write counter alone: every write from any process bumps it, so no count is needed"""
+        return f"{self._stored_version()}:{self.version}"
+
+    def _bump_stored_version(self):
+        with self._lock:
+            self.documents.bump_version()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                **super().get_stats(),
+                'index_type': self.index_type,
+                'active_index': index_kind(self.index) if self.index is not None else None,
+                'vectors': self.index.ntotal if self.index is not None else 0,
+                'tombstones': len(self._tombstones),
+                'memory_mapped': self._mapped,
+                'ef_search': self.ef_search,
+                'nprobe': self.nprobe
+            }
 
     # -------------------------------------------------------------
-    # Search FAISS index
+    # Build FAISS index
     # -------------------------------------------------------------
-    def search(self, query: str, k: int = 5) -> List[Tuple[Dict, float]]:
+    def build_index(self, documents: List[Dict]):
         """
-        Search for similar documents using FAISS.
-        Returns a list of (document, distance).
+        Build a FAISS vector index using a list of documents.
+        Each document must contain a "text" field.
         """
-        query_embedding = self.create_embeddings([query])
-        distances, indices = self.index.search(query_embedding, k)  # type: ignore
+        with self._lock:
+            self.index, self._mapped = None, False
+            self.documents.clear()
+            self._tombstones = set()
+        self.add(documents)
 
-        results = []
-        for idx, dist in zip(indices[0], distances[0]):
-            if idx < len(self.documents):
-                results.append((self.documents[idx], float(dist)))
-
-        return results
+        print(f"[✔] FAISS Index built with {self.index.ntotal if self.index is not None else 0} vectors")
 
     # -------------------------------------------------------------
     # Save FAISS index + documents
     # -------------------------------------------------------------
+    def _write_index(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Write beside the target and rename, so a reader (or a mapping) never sees a partial file
+        faiss.write_index(self.index, f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        if path == self.index_path:
+            self._index_stamp = self._file_stamp(path)
+
     def save(self, index_path: str = "data/faiss_index.bin",
-             docs_path: str = "data/documents.pkl"):
+             docs_path: str = "data/documents.sqlite"):
         """Save index + docs to disk."""
-        os.makedirs(os.path.dirname(index_path), exist_ok=True)
-
-        faiss.write_index(self.index, index_path)
-        with open(docs_path, "wb") as f:
-            pickle.dump(self.documents, f)
+        with self._lock:
+            if not self._mapped:
+                self._write_index(index_path)
+            elif os.path.abspath(index_path) != os.path.abspath(self.index_path):
+                shutil.copyfile(self.index_path, index_path)
+            if os.path.abspath(docs_path) != os.path.abspath(self.documents.path or ""):
+                self.documents.backup(docs_path)
 
         print(f"[✔] Index saved to {index_path}")
         print(f"[✔] Documents saved to {docs_path}")
@@ -80,12 +643,71 @@ class VectorStore:
     # -------------------------------------------------------------
     # Load FAISS index + documents
     # -------------------------------------------------------------
-    def load(self, index_path: str = "data/faiss_index.bin",
-             docs_path: str = "data/documents.pkl"):
-        """Load index + docs from disk."""
-        self.index = faiss.read_index(index_path)
+    def _import_pickle(self, index, docs_path: str):
+        """
+        Move pickled documents (a list, or a dict keyed by FAISS ID) into the
+        table. L2 indexes from before cosine scoring are rebuilt from their
+        reconstructed vectors, normalized.
+        """
         with open(docs_path, "rb") as f:
-            self.documents = pickle.load(f)
+            documents = pickle.load(f)
+
+        if isinstance(documents, list):
+            # Row numbers were the IDs
+            unique: Dict[int, int] = {}
+            for row, doc in enumerate(documents):
+                unique.setdefault(self._faiss_id(self.document_id(doc)), row)
+            rows, keys = list(unique.values()), list(unique)
+            self.documents.put([(key, self.document_id(documents[row]), documents[row]['text'],
+                                 self._metadata(documents[row])) for key, row in unique.items()])
+        else:
+            # Flat and HNSW saves wrap an ID map; IVF types keep their IDs in the inverted lists
+            labels = index_labels(index)
+            rows = [row for row, key in enumerate(labels) if key in documents]
+            keys = [labels[row] for row in rows]
+            self.documents.put([(key, doc['id'], doc['text'], doc) for key, doc in documents.items()])
+            extra = set(labels) - set(documents)
+            if index_kind(index) == "hnsw":
+                self.documents.set_tombstones(extra, replace=True)
+            elif extra:
+                index.remove_ids(np.array(sorted(extra), dtype=np.int64))
+
+        if isinstance(documents, list) or index.metric_type == faiss.METRIC_L2:
+            inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+            vectors = inner.reconstruct_n(0, index.ntotal) if index.ntotal else np.zeros((0, index.d), np.float32)
+            index = build_faiss_index(self._target_kind(len(keys)), normalized(vectors[rows]),
+                                      np.array(keys, dtype=np.int64))
+        print(f"[✔] Imported {len(keys)} pickled documents into {self.documents.path or 'memory'}")
+        return index
+
+    def load(self, index_path: str = "data/faiss_index.bin",
+             docs_path: str = "data/documents.sqlite"):
+        """Open a saved index (memory-mapped when possible) and its document table."""
+        with self._lock:
+            if docs_path.endswith(".pkl"):
+                self.documents.clear()
+                index, mapped = self._import_pickle(faiss.read_index(index_path), docs_path), False
+            else:
+                if os.path.abspath(docs_path) != os.path.abspath(self.documents.path or ""):
+                    self.documents = ChunkTable(docs_path)
+                index, mapped = read_index(index_path, self.mmap)
+            self.index, self._mapped, self.index_path = index, mapped, index_path
+            self._index_stamp = self._file_stamp(index_path)
+            set_search_params(index, self.ef_search, self.nprobe)
+            self._tombstones = self.documents.tombstones() if index_kind(index) == "hnsw" else set()
+            if docs_path.endswith(".pkl"):
+                self.persist()
+            live = index.ntotal - len(self._tombstones)
+        self.version += 1
+
+        if live != self.documents.count():
+            print(f"⚠️ FAISS index has {live} live vectors, {self.documents.count()} chunks are stored: rebuilding")
+            self.rebuild()
+            self.persist()
+        elif index_kind(index) != self._target_kind(self.documents.count()):
+            print(f"⚠️ Saved FAISS index is '{index_kind(index)}', configured '{self.index_type}': rebuilding")
+            self.rebuild()
+            self.persist()
 
         print("[✔] Vector store loaded successfully")
 
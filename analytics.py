@@ -0,0 +1,449 @@
+# analytics.py
+# Engagement analytics for the admin dashboard, computed inside MongoDB.
+
+import base64
+import csv
+import json
+from datetime import datetime, timedelta
+from io import StringIO
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import unquote
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import OperationFailure
+
+AGE_LABELS = ["<18", "18-25", "26-40", "41-60", "60+"]
+# $bucket lower bounds for every label except the last, which is the default bucket
+AGE_BOUNDARIES = [float("-inf"), 18, 26, 41, 61]
+
+
+def ensure_engagement_indexes(eng_col):
+    """Indexes backing date-range queries and keyset pagination, optionally per service or source"""
+    eng_col.create_index([("timestamp", ASCENDING), ("_id", ASCENDING)], name="timestamp_1__id_1")
+    eng_col.create_index([("service", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)],
+                         name="service_1_timestamp_1__id_1")
+    eng_col.create_index([("source", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)],
+                         name="source_1_timestamp_1__id_1")
+    # The earlier insight indexes are prefixes of the ones above
+    for name in ("timestamp_1", "service_1_timestamp_1"):
+        try:
+            eng_col.drop_index(name)
+        except OperationFailure:
+            pass
+
+
+def parse_date(value: Optional[str]) -> Optional[datetime]:
+    """Parse ISO dates ('2025-01-31' or '2025-01-31T10:00:00[Z]') as naive UTC; raises ValueError"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.replace(tzinfo=None) - (parsed.utcoffset() or timedelta(0))
+    return parsed
+
+
+def parse_filters(args) -> Dict[str, Any]:
+    """
+    Insight filters from request args: from / to (ISO dates; a plain 'to' date
+    includes that whole day, a datetime 'to' is exclusive) and service.
+    Returns {'start', 'end', 'service'}. Raises ValueError on malformed dates.
+    """
+    start = parse_date(args.get("from"))
+    end = parse_date(args.get("to"))
+    if end and len(args.get("to")) == 10:
+        end += timedelta(days=1)
+    return {"start": start, "end": end, "service": args.get("service") or None}
+
+
+def match_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Mongo filter on the raw engagements for parsed insight filters"""
+    match: Dict[str, Any] = {}
+    if filters.get("start") or filters.get("end"):
+        match["timestamp"] = {}
+        if filters.get("start"):
+            match["timestamp"]["$gte"] = filters["start"]
+        if filters.get("end"):
+            match["timestamp"]["$lt"] = filters["end"]
+    if filters.get("service"):
+        match["service"] = filters["service"]
+    return match
+
+
+def build_match(args) -> Dict[str, Any]:
+    """Mongo filter straight from request args (see parse_filters)"""
+    return match_filters(parse_filters(args))
+
+
+def _label(field: str, fallback: str) -> Dict:
+    """'$field' unless missing/null/empty, else `fallback`"""
+    return {"$cond": [{"$gt": [{"$ifNull": [f"${field}", ""]}, ""]}, f"${field}", fallback]}
+
+
+def insights_pipeline(match: Dict[str, Any]) -> List[Dict]:
+    """One pass over the matching engagements producing age, service and question counts"""
+    pipeline: List[Dict] = []
+    if match:
+        pipeline.append({"$match": match})
+    pipeline += [
+        {"$project": {"_id": 0, "age": 1, "service": 1, "question_clicked": 1}},
+        {"$facet": {
+            "age_groups": [
+                {"$match": {"age": {"$type": "number", "$ne": 0}}},
+                {"$bucket": {
+                    "groupBy": "$age",
+                    "boundaries": AGE_BOUNDARIES,
+                    "default": AGE_LABELS[-1],
+                    "output": {"count": {"$sum": 1}}
+                }}
+            ],
+            "services": [
+                {"$group": {"_id": _label("service", "Unknown"), "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}}
+            ],
+            "questions": [
+                {"$group": {"_id": _label("question_clicked", "Direct Chat"), "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}}
+            ]
+        }}
+    ]
+    return pipeline
+
+
+def empty_insights() -> Dict[str, Dict[str, int]]:
+    return {"age_groups": {label: 0 for label in AGE_LABELS}, "services": {}, "questions": {}}
+
+
+def compute_insights(eng_col, match: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    result = next(eng_col.aggregate(insights_pipeline(match), allowDiskUse=True), None) or {}
+
+    insights = empty_insights()
+    age_groups = insights["age_groups"]
+    for bucket in result.get("age_groups", []):
+        if bucket["_id"] == AGE_LABELS[-1]:
+            age_groups[AGE_LABELS[-1]] += bucket["count"]
+        else:
+            age_groups[AGE_LABELS[AGE_BOUNDARIES.index(bucket["_id"])]] += bucket["count"]
+
+    insights["services"] = {row["_id"]: row["count"] for row in result.get("services", [])}
+    insights["questions"] = {row["_id"]: row["count"] for row in result.get("questions", [])}
+    return insights
+
+
+# -------------------------------------------------------------
+# Rollups: hourly and daily counters maintained at write time
+# -------------------------------------------------------------
+# One document per (granularity, period start, service):
+#   {granularity: "hour"|"day", period, service, count,
+#    ages: {"<18": n, ...}, questions: {<escaped question>: n}}
+ROLLUP_GRANULARITIES = ("hour", "day")
+ROLLUP_META_ID = "meta"
+# Distinct questions one rollup document may hold; later ones are counted under ROLLUP_OTHER_QUESTIONS
+ROLLUP_MAX_QUESTIONS = 500
+ROLLUP_OTHER_QUESTIONS = "Other questions"
+# Longest free-text label (question, service, source) stored with an engagement
+MAX_LABEL_CHARS = 200
+
+
+def clean_label(value, limit: int = MAX_LABEL_CHARS) -> Optional[str]:
+    """Client-supplied label as a capped string (None when missing or blank)"""
+    if value is None:
+        return None
+    text = (value if isinstance(value, str) else str(value)).strip()[:limit]
+    return text or None
+
+
+def ensure_rollup_indexes(rollup_col):
+    rollup_col.create_index(
+        [("granularity", ASCENDING), ("period", ASCENDING), ("service", ASCENDING)],
+        name="granularity_1_period_1_service_1", unique=True
+    )
+
+
+def age_label(age) -> Optional[str]:
+    """Age bucket for one engagement, matching the $bucket stage above (None when unknown)"""
+    if isinstance(age, bool) or not isinstance(age, (int, float)) or not age:
+        return None
+    for label, upper in zip(AGE_LABELS, AGE_BOUNDARIES[1:]):
+        if age < upper:
+            return label
+    return AGE_LABELS[-1]
+
+
+def escape_key(key: str) -> str:
+    """Make a question usable as a field name ('.' and '$' are not allowed in paths)"""
+    return key.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def unescape_key(key: str) -> str:
+    return unquote(key)
+
+
+def period_start(ts: datetime, granularity: str) -> datetime:
+    if granularity == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_increments(age, question, count: int = 1) -> Dict[str, int]:
+    """$inc document for `count` engagements with this age and question"""
+    inc = {"count": count, f"questions.{escape_key(clean_label(question) or 'Direct Chat')}": count}
+    label = age_label(age)
+    if label:
+        inc[f"ages.{label}"] = count
+    return inc
+
+
+def _cap_questions(inc: Dict[str, int], present: set):
+    """Fold questions that would take a rollup past ROLLUP_MAX_QUESTIONS keys into the overflow key"""
+    other = f"questions.{escape_key(ROLLUP_OTHER_QUESTIONS)}"
+    room = ROLLUP_MAX_QUESTIONS - len(present - {escape_key(ROLLUP_OTHER_QUESTIONS)})
+    for field in [f for f in inc if f.startswith("questions.") and f != other]:
+        if field[len("questions."):] in present:
+            continue
+        if room > 0:
+            room -= 1
+        else:
+            inc[other] = inc.get(other, 0) + inc.pop(field)
+
+
+def cap_question_counts(questions: Dict[str, int]) -> Dict[str, int]:
+    """Keep the ROLLUP_MAX_QUESTIONS most frequent (escaped) questions, summing the rest into the overflow key"""
+    other = escape_key(ROLLUP_OTHER_QUESTIONS)
+    ranked = sorted(((k, n) for k, n in questions.items() if k != other), key=lambda kv: -kv[1])
+    capped = dict(ranked[:ROLLUP_MAX_QUESTIONS])
+    overflow = sum(n for _, n in ranked[ROLLUP_MAX_QUESTIONS:]) + questions.get(other, 0)
+    if overflow:
+        capped[other] = overflow
+    return capped
+
+
+def rollup_updates(engagements: Iterable[Dict],
+                   question_keys: Optional[Dict[Tuple[str, datetime, Optional[str]], set]] = None) -> List[UpdateOne]:
+    """
+    $inc upserts for the hourly and daily rollups of these engagements.
+    `question_keys` maps (granularity, period, service) to the question keys
+    the stored rollup already has, so new questions past the cap are folded.
+    """
+    merged: Dict[Tuple[str, datetime, Optional[str]], Dict[str, int]] = {}
+    for doc in engagements:
+        inc = rollup_increments(doc.get("age"), doc.get("question_clicked"))
+        for granularity in ROLLUP_GRANULARITIES:
+            key = (granularity, period_start(doc["timestamp"], granularity), doc.get("service"))
+            target = merged.setdefault(key, {})
+            for field, n in inc.items():
+                target[field] = target.get(field, 0) + n
+    if question_keys is not None:
+        for key, inc in merged.items():
+            _cap_questions(inc, question_keys.get(key, set()))
+    return [
+        UpdateOne({"granularity": g, "period": period, "service": service}, {"$inc": inc}, upsert=True)
+        for (g, period, service), inc in merged.items()
+    ]
+
+
+def record_engagements(rollup_col, engagements: Iterable[Dict]):
+    """Fold freshly inserted engagements into the rollups"""
+    engagements = list(engagements)
+    targets = {(g, period_start(doc["timestamp"], g), doc.get("service"))
+               for doc in engagements for g in ROLLUP_GRANULARITIES}
+    question_keys: Dict[Tuple[str, datetime, Optional[str]], set] = {}
+    if targets:
+        query = {"$or": [{"granularity": g, "period": p, "service": s} for g, p, s in targets]}
+        for doc in rollup_col.find(query, {"granularity": 1, "period": 1, "service": 1, "questions": 1}):
+            key = (doc["granularity"], doc["period"], doc.get("service"))
+            question_keys[key] = set(doc.get("questions") or {})
+    # Concurrent writers can each add up to the remaining room, so the cap is approximate
+    updates = rollup_updates(engagements, question_keys)
+    if updates:
+        rollup_col.bulk_write(updates, ordered=False)
+
+
+def rollups_ready(rollup_col) -> bool:
+    """Rollups only cover history once scripts/backfill_rollups.py has run"""
+    return rollup_col.find_one({"_id": ROLLUP_META_ID}) is not None
+
+
+def mark_rollups_ready(rollup_col, **info):
+    rollup_col.update_one({"_id": ROLLUP_META_ID},
+                          {"$set": {"backfilled_at": datetime.utcnow(), **info}}, upsert=True)
+
+
+def _hour_aligned(ts: Optional[datetime]) -> bool:
+    return ts is None or ts == period_start(ts, "hour")
+
+
+def _rollup_ranges(start: Optional[datetime], end: Optional[datetime]) -> List[Tuple[str, Optional[datetime], Optional[datetime]]]:
+    """Cover [start, end) with whole days plus the leftover hours at either edge"""
+    first_day = start if start is None or start == period_start(start, "day") \
+        else period_start(start, "day") + timedelta(days=1)
+    last_day = None if end is None else period_start(end, "day")
+    if first_day is not None and last_day is not None and first_day >= last_day:
+        return [("hour", start, end)]
+
+    ranges = [("day", first_day, last_day)]
+    if start is not None and start < first_day:
+        ranges.append(("hour", start, first_day))
+    if end is not None and last_day < end:
+        ranges.append(("hour", last_day, end))
+    return ranges
+
+
+def rollup_insights(rollup_col, filters: Dict[str, Any]) -> Optional[Dict[str, Dict[str, int]]]:
+    """
+    Insights summed from the rollups, or None when they can't answer exactly
+    (bounds not on the hour, or no backfill has been run yet).
+    """
+    if not (_hour_aligned(filters.get("start")) and _hour_aligned(filters.get("end"))):
+        return None
+    if not rollups_ready(rollup_col):
+        return None
+
+    insights = empty_insights()
+    services: Dict[str, int] = {}
+    questions: Dict[str, int] = {}
+    for granularity, start, end in _rollup_ranges(filters.get("start"), filters.get("end")):
+        query: Dict[str, Any] = {"granularity": granularity}
+        if start or end:
+            query["period"] = {}
+            if start:
+                query["period"]["$gte"] = start
+            if end:
+                query["period"]["$lt"] = end
+        if filters.get("service"):
+            query["service"] = filters["service"]
+
+        for doc in rollup_col.find(query, {"_id": 0, "service": 1, "count": 1, "ages": 1, "questions": 1}):
+            service = doc.get("service") or "Unknown"
+            services[service] = services.get(service, 0) + doc.get("count", 0)
+            for label, n in (doc.get("ages") or {}).items():
+                insights["age_groups"][label] += n
+            for key, n in (doc.get("questions") or {}).items():
+                question = unescape_key(key)
+                questions[question] = questions.get(question, 0) + n
+
+    insights["services"] = dict(sorted(services.items(), key=lambda kv: -kv[1]))
+    insights["questions"] = dict(sorted(questions.items(), key=lambda kv: -kv[1]))
+    return insights
+
+
+def get_insights(eng_col, rollup_col, filters: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    """Read the rollups when they can answer the query, else aggregate the raw events"""
+    if rollup_col is not None:
+        insights = rollup_insights(rollup_col, filters)
+        if insights is not None:
+            return insights
+    return compute_insights(eng_col, match_filters(filters))
+
+
+# -------------------------------------------------------------
+# Export
+# -------------------------------------------------------------
+EXPORT_FIELDS = ["timestamp", "user_id", "age", "job", "desires", "question_clicked", "service", "source"]
+EXPORT_BATCH_SIZE = 1000
+# Rows are grouped into chunks of roughly this many bytes before being sent
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def _export_row(doc: Dict) -> Dict[str, Any]:
+    row = {field: doc.get(field) for field in EXPORT_FIELDS}
+    if isinstance(row["timestamp"], datetime):
+        row["timestamp"] = row["timestamp"].isoformat()
+    return row
+
+
+def export_engagements(eng_col, filters: Dict[str, Any], fmt: str = "csv",
+                       batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """
+    Stream matching engagements, oldest first, as CSV or NDJSON text chunks.
+    Only one cursor batch and one output chunk are held in memory at a time.
+    """
+    cursor = eng_col.find(
+        match_filters(filters),
+        {"_id": 0, **{field: 1 for field in EXPORT_FIELDS}}
+    ).sort("timestamp", ASCENDING).batch_size(batch_size)
+
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    if fmt == "csv":
+        writer.writeheader()
+
+    try:
+        for doc in cursor:
+            row = _export_row(doc)
+            if fmt == "csv":
+                row["desires"] = "; ".join(str(d) for d in row["desires"] or [])
+                writer.writerow(row)
+            else:
+                buffer.write(json.dumps(row, default=str, ensure_ascii=False) + "\n")
+
+            if buffer.tell() >= EXPORT_CHUNK_BYTES:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        cursor.close()
+
+
+# -------------------------------------------------------------
+# Listing: newest first, keyset-paginated on (timestamp, _id)
+# -------------------------------------------------------------
+LIST_FIELDS = ["user_id", "age", "job", "desires", "question_clicked", "service", "source"]
+LIST_MAX_LIMIT = 500
+
+
+def encode_cursor(timestamp: datetime, oid: ObjectId) -> str:
+    raw = json.dumps({"t": timestamp.isoformat(), "id": str(oid)})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Inverse of encode_cursor; raises ValueError for anything it didn't produce"""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(raw["t"]), ObjectId(raw["id"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def list_engagements(eng_col, filters: Dict[str, Any], cursor: Optional[str] = None,
+                     limit: int = 100, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    One page of engagements, newest first: {'items': [...], 'next_cursor': str|None}.
+
+    Pages continue from the (timestamp, _id) of the previous page's last row
+    instead of skipping, so every page is a bounded index range scan. `_id`
+    and `timestamp` are converted to strings by the server.
+    """
+    match = match_filters(filters)
+    match["timestamp"] = {**match.get("timestamp", {}), "$type": "date"}
+    if filters.get("source"):
+        match["source"] = filters["source"]
+    if cursor:
+        timestamp, oid = decode_cursor(cursor)
+        match = {"$and": [match, {"$or": [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": oid}}
+        ]}]}
+
+    limit = max(1, min(limit, LIST_MAX_LIMIT))
+    projection: Dict[str, Any] = {field: 1 for field in (fields or LIST_FIELDS) if field in LIST_FIELDS}
+    projection["_id"] = {"$toString": "$_id"}
+    projection["timestamp"] = {"$dateToString": {"date": "$timestamp", "format": "%Y-%m-%dT%H:%M:%S.%L"}}
+
+    items = list(eng_col.aggregate([
+        {"$match": match},
+        {"$sort": {"timestamp": DESCENDING, "_id": DESCENDING}},
+        {"$limit": limit + 1},
+        {"$project": projection}
+    ]))
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(datetime.fromisoformat(last["timestamp"]), ObjectId(last["_id"]))
+    return {"items": items, "next_cursor": next_cursor}
@@ -32,7 +32,7 @@
 
 import os
 import traceback # ADDED: To see real errors
-from flask import Flask, jsonify, render_template, request, session, redirect, send_file
+from flask import Flask, jsonify, render_template, request, session, redirect, send_file, Response, stream_with_context
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -41,19 +41,23 @@ from typing import List, Dict, Any
 from datetime import datetime
 from io import StringIO, BytesIO
 import csv
+import json
+import time
 from dotenv import load_dotenv
+from analytics import (clean_label, empty_insights, ensure_engagement_indexes, ensure_rollup_indexes, export_engagements,
+                       get_insights, list_engagements, parse_filters, record_engagements)
+from write_buffer import WriteBuffer
+from catalogue_cache import CATALOGUE_LANGUAGES, ServiceCatalogueCache
+from service_search import ServiceSearchIndex
+from catalogue_router import CATALOGUE_ROUTER, CatalogueRouter
 
 # --- Import AI System ---
-GeminiComplete = None
+GeminiRAGSystem = None
 try:
-    from ai.gemini_complete import GeminiComplete  # type: ignore
-    print("✅ Imported GeminiComplete from ai/")
-except ImportError:
-    try:
-        from gemini_complete import GeminiComplete  # type: ignore
-        print("✅ Imported GeminiComplete from root")
-    except ImportError:
-        print("❌ ERROR: Could not find gemini_complete.py")
+    from ai.gemini_rag import GeminiRAGSystem  # type: ignore
+    print("✅ Imported GeminiRAGSystem from ai/")
+except ImportError as e:
+    print(f"❌ ERROR: Could not import ai.gemini_rag: {e}")
 
 load_dotenv()
 app = Flask(__name__, static_folder="static", template_folder="templates")
@@ -72,16 +76,35 @@ MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 db = None
 services_col = None
 eng_col = None
+rollup_col = None
 admins_col = None
+catalogue = None
+service_search = ServiceSearchIndex()
+engagement_buffer = None
+search_log_buffer = None
 try:
     client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
     db = client["citizen_portal"]
     services_col = db["services"]
     eng_col = db["engagements"]
+    rollup_col = db["engagement_rollups"]
     admins_col = db["admins"]
     # Test connection
     client.server_info()
     print("✅ Connected to MongoDB")
+    catalogue = ServiceCatalogueCache(services_col, db["catalogue_meta"])
+
+    # A failed index build (e.g. a conflicting index) must not take the catalogue or buffers down
+    try:
+        ensure_engagement_indexes(eng_col)
+        ensure_rollup_indexes(rollup_col)
+    except Exception as e:
+        print(f"⚠️ MongoDB index setup failed: {e}")
+
+    # Engagements and AI search logs are written behind the request, in batches
+    engagement_buffer = WriteBuffer(eng_col, "engagements",
+                                    on_flush=lambda docs: record_engagements(rollup_col, docs))
+    search_log_buffer = WriteBuffer(db["ai_searches"], "ai_searches")
 
     # FORCE UPDATE the admin user
     username = "admin"
@@ -95,11 +118,12 @@ try:
 except Exception as e:
     print(f"⚠️ MongoDB Warning: {e}")
 
-# Initialize AI System
+# Initialize AI System (built once per process: Gemini client, embedding model and Chroma collection)
 print("🚀 Initializing AI System...")
 try:
-    if GeminiComplete:
-        rag_system = GeminiComplete()
+    if GeminiRAGSystem:
+        rag_system = GeminiRAGSystem()
+        rag_system.warmup()
         print("✓ AI System ready!")
     else:
         rag_system = None
@@ -108,6 +132,15 @@ except Exception as e:
     print(f"❌ AI Init Failed: {e}")
     rag_system = None
 
+# Catalogue questions are answered from their stored answers before RAG is tried
+catalogue_router = None
+if CATALOGUE_ROUTER:
+    catalogue_router = CatalogueRouter(rag_system.gemini.embedding_service if rag_system else None)
+
+# Retrieval depth for /api/ai/search (callers may override with "top_k", capped at AI_MAX_TOP_K)
+AI_TOP_K = int(os.getenv("AI_TOP_K", "5"))
+AI_MAX_TOP_K = int(os.getenv("AI_MAX_TOP_K", "20"))
+
 # --- Helpers ---
 def admin_required(fn):
     from functools import wraps
@@ -118,12 +151,48 @@ def admin_required(fn):
         return fn(*a, **kw)
     return wrapper
 
-# Simple fallback knowledge base (since we aren't doing full Vector Search in app.py yet)
-knowledge_base_text = """
-To apply for a passport in Sri Lanka, you need: Birth certificate, National ID card, and two passport photos. Visit the Department of Immigration.
-Tax filing deadline in Sri Lanka is November 30 for individuals. You can file online at ird.gov.lk
-To get a National ID card, visit your Divisional Secretariat with birth certificate and proof of residence.
-"""
+def wants_stream(data: Dict) -> bool:
+    """Client asked for Server-Sent Events (JSON "stream": true or Accept: text/event-stream)"""
+    return bool(data.get("stream")) or request.accept_mimetypes.best == "text/event-stream"
+
+def sse_response(events):
+    """Wrap an iterator of event dicts ({"type": ..., ...}) as a text/event-stream response"""
+    def generate():
+        def frame(event):
+            return f"event: {event.get('type', 'message')}\ndata: {json.dumps(event, default=str)}\n\n"
+        try:
+            for event in events:
+                yield frame(event)
+        except Exception as e:
+            # The client waits for 'done'; never end the stream without one
+            print(f"❌ Stream error: {e}")
+            yield frame({'type': 'error', 'error': str(e)})
+            yield frame({'type': 'done', 'success': False, 'error': str(e)})
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def route_catalogue(query: str, data: Dict):
+    """Stored catalogue answer when the query matches a catalogue question, else None"""
+    if catalogue_router is None or catalogue is None:
+        return None
+    try:
+        snapshot = catalogue.snapshot()
+        catalogue_router.sync(snapshot.version, snapshot.docs)
+        return catalogue_router.answer(query, data.get("lang"))
+    except Exception as e:
+        print(f"⚠️ Catalogue routing failed: {e}")
+        return None
+
+def log_ai_search(query: str, success: bool):
+    if search_log_buffer is not None:
+        search_log_buffer.add({
+            "query": query,
+            "timestamp": datetime.utcnow(),
+            "success": success
+        })
 
 # Initialize knowledge base as list for indexing documents
 knowledge_base = []
@@ -133,22 +202,66 @@ knowledge_base = []
 def home():
     return render_template("index.html")
 
+def cached_json(body: bytes, etag: str):
+    """Precomputed JSON with an ETag; answers If-None-Match with 304"""
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+def catalogue_lang():
+    """?lang=en|si|ta for a single-language projection; None keeps every translation"""
+    lang = request.args.get("lang") or None
+    if lang is not None and lang not in CATALOGUE_LANGUAGES:
+        raise ValueError(f"lang must be one of {', '.join(CATALOGUE_LANGUAGES)}")
+    return lang
+
 @app.route("/api/services")
 def get_services():
-    if db is None or services_col is None: return jsonify([])
-    docs = list(services_col.find({}, {"_id":0}))
-    return jsonify(docs)
+    """Service catalogue. ?lang=<code> for one language, ?view=index for ministries only
+    (fetch each ministry's subservices from /api/service/<id>)"""
+    if catalogue is None: return jsonify([])
+    try:
+        lang = catalogue_lang()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    view = "index" if request.args.get("view") == "index" else "full"
+    return cached_json(*catalogue.snapshot().services(lang, view))
 
 @app.route("/api/service/<service_id>")
 def get_service(service_id):
-    if db is None or services_col is None: return jsonify({})
-    doc = services_col.find_one({"id": service_id}, {"_id":0})
-    return jsonify(doc or {})
+    if catalogue is None: return jsonify({})
+    try:
+        lang = catalogue_lang()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    cached = catalogue.snapshot().service(service_id, lang)
+    if cached is None: return jsonify({})
+    return cached_json(*cached)
+
+@app.route("/api/services/search")
+def search_services():
+    """BM25 search over every question in the catalogue.
+    ?q=<text>&lang=<code>&limit=10 (typo- and prefix-tolerant, any language)"""
+    query = (request.args.get("q") or "").strip()
+    try:
+        lang = catalogue_lang()
+        limit = max(1, min(int(request.args.get("limit", 10)), 50))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if catalogue is None or not query:
+        return jsonify({"query": query, "results": []})
+
+    start = time.perf_counter()
+    snapshot = catalogue.snapshot()
+    service_search.sync(snapshot.version, snapshot.docs)
+    results = service_search.search(query, lang, limit)
+    return jsonify({"query": query, "results": results, "took_ms": round((time.perf_counter() - start) * 1000, 2)})
 
 @app.route("/api/engagement", methods=["POST"])
 def log_engagement():
-    """Log user engagement to MongoDB"""
-    if db is None or eng_col is None: return jsonify({"status": "skipped (no db)"})
+    """Queue a user engagement for the background writer"""
+    if engagement_buffer is None: return jsonify({"status": "skipped (no db)"})
     try:
         payload = request.json or {}
         
@@ -166,14 +279,16 @@ def log_engagement():
             "age": age,
             "job": payload.get("job"),
             "desires": payload.get("desires") or [],
-            "question_clicked": payload.get("question_clicked"),
-            "service": payload.get("service"),
-            "source": payload.get("source", "web"),
+            # Free text from the client: stored as capped strings (they become rollup keys)
+            "question_clicked": clean_label(payload.get("question_clicked")),
+            "service": clean_label(payload.get("service")),
+            "source": clean_label(payload.get("source")) or "web",
             "timestamp": datetime.utcnow()
         }
         
-        eng_col.insert_one(doc)
-        print(f"📝 Engagement logged")
+        if not engagement_buffer.add(doc):
+            # Mongo is falling behind; let the client retry instead of queueing without bound
+            return jsonify({"error": "busy, try again shortly"}), 503, {"Retry-After": "1"}
         return jsonify({"status": "ok", "success": True})
     
     except Exception as e:
@@ -234,35 +349,21 @@ def admin_logout():
 @app.route("/api/admin/insights")
 @admin_required
 def admin_insights():
-    # 1. Age Groups
-    age_groups = {"<18":0,"18-25":0,"26-40":0,"41-60":0,"60+":0}
+    """Age groups, services and questions from the hourly/daily rollups
+    (raw events when the range isn't on hour boundaries).
+    Optional filters: ?from=YYYY-MM-DD&to=YYYY-MM-DD&service=<name>"""
     try:
-        if eng_col is not None:
-            for e in eng_col.find({}, {"age":1}):
-                age = e.get("age")
-                if not age: continue
-                if age < 18: age_groups["<18"] += 1
-                elif age <= 25: age_groups["18-25"] += 1
-                elif age <= 40: age_groups["26-40"] += 1
-                elif age <= 60: age_groups["41-60"] += 1
-                else: age_groups["60+"] += 1
-    except Exception: pass
-
-    # 2. Services & Questions
-    services = {}
-    questions = {}
-    if eng_col is not None:
-        for e in eng_col.find({}, {"service":1, "question_clicked":1}):
-            s = e.get("service") or "Unknown"
-            q = e.get("question_clicked") or "Direct Chat"
-            services[s] = services.get(s,0) + 1
-            questions[q] = questions.get(q,0) + 1
+        filters = parse_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"invalid date: {e}"}), 400
 
-    return jsonify({
-        "age_groups": age_groups,
-        "services": services,
-        "questions": questions
-    })
+    if eng_col is None:
+        return jsonify(empty_insights())
+    try:
+        return jsonify(get_insights(eng_col, rollup_col, filters))
+    except Exception as e:
+        print(f"❌ Insights error: {e}")
+        return jsonify({"error": str(e)}), 500
 
 @app.route('/api/admin/index-documents', methods=['POST'])
 def index_documents():
@@ -286,13 +387,40 @@ def index_documents():
 @app.route("/api/admin/engagements")
 @admin_required
 def admin_engagements():
-    items = []
-    if eng_col is not None:
-        for e in eng_col.find().sort("timestamp",-1).limit(100):
-            e["_id"] = str(e["_id"])
-            e["timestamp"] = e.get("timestamp").isoformat() if e.get("timestamp") else ""
-            items.append(e)
-    return jsonify(items)
+    """Newest engagements first, one page at a time.
+    ?limit=100&cursor=<next_cursor>&from=&to=&service=&source=&fields=age,service,..."""
+    if eng_col is None:
+        return jsonify({"items": [], "next_cursor": None})
+    try:
+        filters = parse_filters(request.args)
+        filters["source"] = request.args.get("source") or None
+        limit = int(request.args.get("limit", 100))
+        fields = [f for f in request.args.get("fields", "").split(",") if f] or None
+        return jsonify(list_engagements(eng_col, filters, request.args.get("cursor"), limit, fields))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/admin/export_csv")
+@admin_required
+def admin_export():
+    """Stream engagements as CSV (default) or NDJSON (?format=ndjson).
+    Optional filters: ?from=YYYY-MM-DD&to=YYYY-MM-DD&service=<name>"""
+    fmt = request.args.get("format", "csv").lower()
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    try:
+        filters = parse_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"invalid date: {e}"}), 400
+    if eng_col is None:
+        return jsonify({"error": "Database offline"}), 500
+
+    filename = f"engagements-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"
+    return Response(
+        stream_with_context(export_engagements(eng_col, filters, fmt)),
+        mimetype="text/csv" if fmt == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename={filename}", "X-Accel-Buffering": "no"}
+    )
 
 # ============================================
 # ADMIN SERVICES MANAGEMENT
@@ -333,6 +461,8 @@ def admin_services():
             {"$set": service_doc},
             upsert=True
         )
+        if catalogue is not None:
+            catalogue.invalidate()
         return jsonify({"status": "ok", "message": "Service saved successfully"})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -347,6 +477,8 @@ def delete_service(service_id):
     try:
         result = services_col.delete_one({"id": service_id})
         if result.deleted_count > 0:
+            if catalogue is not None:
+                catalogue.invalidate()
             return jsonify({"status": "deleted", "message": "Service deleted successfully"})
         else:
             return jsonify({"error": "Service not found"}), 404
@@ -360,7 +492,7 @@ def delete_service(service_id):
 @app.route('/api/ai/search', methods=['POST'])
 # @limiter.limit("20 per minute") # Commented out for debugging to avoid 429 errors
 def ai_search():
-    """AI-powered search using Gemini"""
+    """AI-powered search: retrieve top-k chunks from ChromaDB, then answer with Gemini"""
     query = None
     try:
         data = request.get_json()
@@ -378,25 +510,40 @@ def ai_search():
         
         print(f"🔍 Received query: {query}")
 
+        routed = route_catalogue(query, data)
+        if routed is not None:
+            print(f"📚 Answered from catalogue ({routed['route']})")
+            log_ai_search(query, True)
+            if wants_stream(data):
+                done = {k: v for k, v in routed.items() if k != 'answer'}
+                return sse_response(iter([{'type': 'token', 'text': routed['answer']}, dict(done, type='done')]))
+            return jsonify(routed)
+
         if not rag_system:
             return jsonify({"answer": "AI System is offline.", "success": False})
 
-        # --- FIX 2: Use the class we actually have (GeminiComplete) ---
-        # Note: GeminiComplete.generate_answer takes (query, context)
-        # Since we don't have the Vector DB search here, we pass the static KB for now.
-        result = rag_system.generate_answer(query, knowledge_base_text)
+        try:
+            top_k = int(data.get('top_k') or AI_TOP_K)
+        except (ValueError, TypeError):
+            top_k = AI_TOP_K
+        top_k = max(1, min(top_k, AI_MAX_TOP_K))
+
+        if wants_stream(data):
+            def events():
+                for event in rag_system.answer_query_stream(query, n_results=top_k):
+                    if event['type'] == 'done':
+                        print(f"📊 Result: {event.get('success')}")
+                        log_ai_search(query, event.get('success', False))
+                    yield event
+            return sse_response(events())
+
+        # Retrieve-then-generate against the shared Chroma index
+        result = rag_system.answer_query(query, n_results=top_k)
 
         print(f"📊 Result: {result.get('success')}")
         
         # Log to MongoDB if available
-        if db is not None:
-            try:
-                db.ai_searches.insert_one({
-                    "query": query,
-                    "timestamp": datetime.utcnow(),
-                    "success": result.get('success', False)
-                })
-            except Exception: pass
+        log_ai_search(query, result.get('success', False))
         
         return jsonify(result)
     
@@ -421,6 +568,9 @@ def ai_chat():
         if not message: return jsonify({"error": "Message required"}), 400
         if not rag_system: return jsonify({"error": "AI offline"}), 500
 
+        if wants_stream(data):
+            return sse_response(rag_system.chat_stream(message, history))
+
         # Call GeminiComplete chat
         result = rag_system.chat(message, history)
         return jsonify(result)
@@ -436,6 +586,14 @@ def health_check():
         "status": "healthy",
         "ai_system": "online" if rag_system else "offline",
         "database": "connected" if db is not None else "offline",
+        "answer_cache": rag_system.get_cache_stats() if rag_system else None,
+        "embeddings": rag_system.gemini.embedding_service.stats() if rag_system else None,
+        "catalogue": catalogue.stats() if catalogue else None,
+        "service_search": service_search.stats(),
+        "catalogue_router": catalogue_router.stats() if catalogue_router else None,
+        "write_buffers": {
+            buffer.name: buffer.stats() for buffer in (engagement_buffer, search_log_buffer) if buffer is not None
+        },
         "timestamp": datetime.utcnow().isoformat()
     })
 
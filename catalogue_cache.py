@@ -0,0 +1,160 @@
+# catalogue_cache.py
+# Versioned in-memory cache of the service catalogue, served as precomputed JSON bytes.
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+# How often each worker re-reads the version document (seconds of possible staleness)
+CATALOGUE_CHECK_INTERVAL = float(os.getenv("CATALOGUE_CHECK_INTERVAL", "2"))
+CATALOGUE_VERSION_ID = "services"
+# Languages the catalogue is translated into (seed_data.py: name / q / answer)
+CATALOGUE_LANGUAGES = ("en", "si", "ta")
+
+
+def bump_catalogue_version(meta_col) -> int:
+    """Record that the catalogue changed; every worker rebuilds on its next version check"""
+    doc = meta_col.find_one_and_update(
+        {"_id": CATALOGUE_VERSION_ID}, {"$inc": {"version": 1}},
+        upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return doc["version"]
+
+
+def _encode(value) -> Tuple[bytes, str]:
+    body = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return body, hashlib.sha1(body).hexdigest()
+
+
+def localize(value, lang: str):
+    """Collapse every {"en": ..., "si": ..., "ta": ...} in the tree to one language (English fallback)"""
+    if isinstance(value, dict):
+        if value and "en" in value and set(value) <= set(CATALOGUE_LANGUAGES):
+            return value.get(lang) or value["en"]
+        return {key: localize(item, lang) for key, item in value.items()}
+    if isinstance(value, list):
+        return [localize(item, lang) for item in value]
+    return value
+
+
+def ministry_index(doc: Dict) -> Dict:
+    """Ministry entry for the index view; subservices are fetched per ministry"""
+    return {
+        "id": doc.get("id"),
+        "name": doc.get("name"),
+        "subservice_count": len(doc.get("subservices") or [])
+    }
+
+
+class CatalogueSnapshot:
+    """
+    Serialized catalogue at one version. For the original trilingual tree
+    (lang None) and each language in CATALOGUE_LANGUAGES it holds the full
+    list, the ministry index and one body per service id.
+    """
+
+    def __init__(self, version: int, services: List[Dict]):
+        self.version = version
+        self.docs = services
+        start = time.perf_counter()
+        self.lists: Dict[Optional[str], Tuple[bytes, str]] = {}
+        self.indexes: Dict[Optional[str], Tuple[bytes, str]] = {}
+        self.by_id: Dict[Tuple[str, Optional[str]], Tuple[bytes, str]] = {}
+        for lang in (None, *CATALOGUE_LANGUAGES):
+            docs = services if lang is None else [localize(doc, lang) for doc in services]
+            self.lists[lang] = _encode(docs)
+            self.indexes[lang] = _encode([ministry_index(doc) for doc in docs])
+            for doc in docs:
+                if doc.get("id") is not None:
+                    self.by_id[(str(doc["id"]), lang)] = _encode(doc)
+        self.service_count = len(services)
+        self.build_ms = (time.perf_counter() - start) * 1000
+
+    def services(self, lang: Optional[str] = None, view: str = "full") -> Tuple[bytes, str]:
+        return (self.indexes if view == "index" else self.lists)[lang]
+
+    def service(self, service_id: str, lang: Optional[str] = None) -> Optional[Tuple[bytes, str]]:
+        return self.by_id.get((service_id, lang))
+
+
+class ServiceCatalogueCache:
+    """
+    Read-through cache for /api/services and /api/service/<id>.
+
+    The catalogue is loaded once per version and serialized up front, so
+    requests only return cached bytes and their ETags. Admin edits call
+    invalidate(), which bumps a version document in `meta_col`. Other
+    workers notice the new version within CATALOGUE_CHECK_INTERVAL seconds
+    (a version document works on standalone MongoDB; change streams need a
+    replica set). If Mongo is unreachable, the last snapshot keeps being served.
+    """
+
+    def __init__(self, services_col, meta_col, check_interval: float = CATALOGUE_CHECK_INTERVAL):
+        self.services_col = services_col
+        self.meta_col = meta_col
+        self.check_interval = check_interval
+        self._snapshot: Optional[CatalogueSnapshot] = None
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._version = 0
+
+        self.hits = 0
+        self.rebuilds = 0
+
+    def _latest_version(self) -> int:
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            try:
+                doc = self.meta_col.find_one({"_id": CATALOGUE_VERSION_ID}, {"version": 1})
+                self._version = doc.get("version", 0) if doc else 0
+            except Exception as e:
+                print(f"⚠️ Catalogue version check failed: {e}")
+            self._checked_at = now
+        return self._version
+
+    def snapshot(self) -> CatalogueSnapshot:
+        version = self._latest_version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            self.hits += 1
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                try:
+                    services = list(self.services_col.find({}, {"_id": 0}))
+                except Exception as e:
+                    if snapshot is None:
+                        raise
+                    print(f"⚠️ Catalogue reload failed, serving version {snapshot.version}: {e}")
+                    return snapshot
+                snapshot = self._snapshot = CatalogueSnapshot(version, services)
+                self.rebuilds += 1
+            return snapshot
+
+    def invalidate(self):
+        """Call after any write to the services collection"""
+        self._version = bump_catalogue_version(self.meta_col)
+        self._checked_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        snapshot = self._snapshot
+        stats = {
+            'version': snapshot.version if snapshot else None,
+            'services': snapshot.service_count if snapshot else 0,
+            'build_ms': round(snapshot.build_ms, 2) if snapshot else 0.0,
+            'hits': self.hits,
+            'rebuilds': self.rebuilds
+        }
+        if snapshot:
+            stats['bytes'] = {
+                lang or 'all': {'full': len(snapshot.lists[lang][0]), 'index': len(snapshot.indexes[lang][0])}
+                for lang in snapshot.lists
+            }
+        return stats
@@ -0,0 +1,162 @@
+# catalogue_router.py
+# Answer AI queries that are really catalogue questions straight from the stored answers.
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ai.bm25 import tokenize
+from catalogue_cache import CATALOGUE_LANGUAGES, localize
+
+CATALOGUE_ROUTER = os.getenv("CATALOGUE_ROUTER", "1") != "0"
+# Minimum cosine similarity for an embedding match to skip RAG
+CATALOGUE_MATCH_THRESHOLD = float(os.getenv("CATALOGUE_MATCH_THRESHOLD", "0.92"))
+# all-MiniLM-L6-v2 is English-only; Sinhala/Tamil text embeds to near-identical
+# vectors, so only English questions are matched by embedding
+EMBEDDING_LANGUAGES = ("en",)
+
+
+def normalize(text: str) -> str:
+    return " ".join(tokenize(text))
+
+
+def _add(table: Dict[str, Optional[Tuple[Dict, str]]], key: str, entry: Dict, lang: str):
+    """Map key -> (entry, lang); a key shared by questions with different answers maps to None"""
+    if key not in table:
+        table[key] = (entry, lang)
+    elif table[key] is not None and table[key][0]["question"].get("answer") != entry["question"].get("answer"):
+        table[key] = None
+
+
+class CatalogueRouter:
+    """
+    Fast path in front of RAG for queries that match a catalogue question.
+
+    The router tries three matches in order: the exact question text, the
+    normalized text (case, punctuation and joiners ignored, any language),
+    and embedding similarity against the English questions. The stored
+    answer is returned only when one of them matches; otherwise the query
+    goes on to RAG. The question table is rebuilt when the catalogue version
+    changes. Question embeddings come from the shared EmbeddingService and
+    its disk cache, so a rebuild only encodes questions that changed.
+    """
+
+    def __init__(self, embedding_service=None, threshold: float = CATALOGUE_MATCH_THRESHOLD):
+        self.embedding_service = embedding_service
+        self.threshold = threshold
+        # None marks a question text that several ministries answer differently
+        self._exact: Dict[str, Optional[Tuple[Dict, str]]] = {}
+        self._normalized: Dict[str, Optional[Tuple[Dict, str]]] = {}
+        # (entries, unit-normalized question vectors), swapped as one object
+        self._embedded: Tuple[List[Tuple[Dict, str]], Optional[np.ndarray]] = ([], None)
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+
+        self.routed = {'exact': 0, 'normalized': 0, 'embedding': 0}
+        self.misses = 0
+
+    def sync(self, version: int, services: List[Dict]):
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            exact, normalized, embedded = {}, {}, []
+            for ministry in services:
+                for sub in ministry.get("subservices") or []:
+                    for question in sub.get("questions") or []:
+                        if not question.get("answer"):
+                            continue
+                        entry = {"ministry": ministry, "subservice": sub, "question": question}
+                        texts = question.get("q")
+                        texts = texts if isinstance(texts, dict) else {"en": texts}
+                        for lang, text in texts.items():
+                            if not isinstance(text, str) or not text.strip():
+                                continue
+                            _add(exact, text.strip(), entry, lang)
+                            if normalize(text):
+                                _add(normalized, normalize(text), entry, lang)
+                            if lang in EMBEDDING_LANGUAGES:
+                                embedded.append((entry, lang, text))
+
+            matrix = None
+            if self.embedding_service is not None and embedded:
+                try:
+                    vectors = np.asarray(self.embedding_service.encode([text for _, _, text in embedded]),
+                                         dtype=np.float32)
+                    matrix = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                except Exception as e:
+                    print(f"⚠️ Catalogue router: embedding match disabled: {e}")
+
+            self._exact, self._normalized = exact, normalized
+            self._embedded = ([(entry, lang) for entry, lang, _ in embedded], matrix)
+            self._version = version
+
+    def match(self, query: str) -> Optional[Dict]:
+        """{'entry', 'lang', 'method', 'score'} for a confident match, else None"""
+        for method, table, key in (('exact', self._exact, query.strip()),
+                                   ('normalized', self._normalized, normalize(query))):
+            if key in table:
+                hit = table[key]
+                # An ambiguous question needs RAG (or the user) to pick the ministry
+                return None if hit is None else {'entry': hit[0], 'lang': hit[1], 'method': method, 'score': 1.0}
+
+        entries, matrix = self._embedded
+        if matrix is not None:
+            try:
+                vector = np.asarray(self.embedding_service.encode_one(query), dtype=np.float32)
+            except Exception as e:
+                print(f"⚠️ Catalogue router: {e}")
+                return None
+            scores = matrix @ (vector / max(float(np.linalg.norm(vector)), 1e-12))
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                entry, lang = entries[best]
+                answers = {str(entries[i][0]['question'].get('answer')) for i in np.flatnonzero(scores >= self.threshold)}
+                if len(answers) == 1:
+                    return {'entry': entry, 'lang': lang, 'method': 'embedding', 'score': float(scores[best])}
+        return None
+
+    def answer(self, query: str, lang: Optional[str] = None) -> Optional[Dict]:
+        """A RAG-shaped response built from the catalogue, or None to fall back to RAG"""
+        start = time.perf_counter()
+        found = self.match(query)
+        if found is None:
+            self.misses += 1
+            return None
+        self.routed[found['method']] += 1
+
+        entry = found['entry']
+        lang = lang if lang in CATALOGUE_LANGUAGES else found['lang']
+        question = localize(entry['question'], lang)
+        answers = entry['question'].get('answer')
+        title = f"{localize(entry['ministry'].get('name'), lang)} › {localize(entry['subservice'].get('name'), lang)}"
+        return {
+            'query': query,
+            'answer': question.get('answer'),
+            'answers': answers if isinstance(answers, dict) else {lang: answers},
+            'language': lang,
+            'question': question,
+            'sources': [{'url': None, 'title': title, 'page': None, 'relevance_score': round(found['score'], 4)}],
+            'chunks': [],
+            'confidence': 'high',
+            'retrieved_docs': 0,
+            'success': True,
+            'timings': {'route_ms': round((time.perf_counter() - start) * 1000, 2)},
+            'cached': False,
+            'route': f"catalogue:{found['method']}",
+            'model': 'catalogue'
+        }
+
+    def stats(self) -> Dict:
+        return {
+            'version': self._version,
+            'questions': len(self._normalized),
+            'embedded': len(self._embedded[0]) if self._embedded[1] is not None else 0,
+            'threshold': self.threshold,
+            'routed': dict(self.routed),
+            'misses': self.misses
+        }
@@ -1,8 +1,5 @@
 # scripts/add_documents.py
-from ai.gemini_rag import GeminiRAGSystem
-
-# Initialize RAG system
-rag = GeminiRAGSystem()
+from ai.chunker import StructuredChunker
 
 # Sri Lankan Government Services Documents
 documents = [
@@ -323,29 +320,47 @@ Contact:
     }
 ]
 
-# Add documents to RAG system
-print(f"\n📚 Adding {len(documents)} government service documents...")
-count = rag.add_documents(documents)
-print(f"✅ Successfully added {count} documents to knowledge base!")
-
-# Test the system
-print("\n🧪 Testing system with sample queries...\n")
-
-test_queries = [
-    "How do I apply for a passport?",
-    "What is the tax filing deadline?",
-    "How do I get a National ID card?",
-    "What documents do I need for a driving license?",
-    "How do I register a birth certificate?"
-]
-
-for query in test_queries:
-    print(f"❓ {query}")
-    result = rag.answer_query(query)
-    print(f"💡 {result['answer'][:150]}...")
-    print(f"📊 Confidence: {result['confidence']}, Sources: {len(result['sources'])}\n")
-
-print("="*60)
-stats = rag.get_stats()
-print(f"✅ Total documents in system: {stats['total_documents']}")
-print("="*60)
\ No newline at end of file
+def build_chunks(chunker=None):
+    """Split each guide into sections that fit the embedding model's 256-token window"""
+    chunker = chunker or StructuredChunker.for_embedding_model()
+    chunks = []
+    for doc in documents:
+        for i, chunk in enumerate(chunker.chunk(doc['text'], doc['title'])):
+            chunks.append({'text': chunk['text'], 'source': doc['source'], 'title': doc['title'], 'chunk_id': i})
+    return chunks
+
+
+if __name__ == "__main__":
+    from ai.gemini_rag import GeminiRAGSystem
+
+    # Initialize RAG system
+    rag = GeminiRAGSystem()
+    chunks = build_chunks()
+
+    # Sync chunks into the RAG system: unchanged chunks are skipped,
+    # edited ones re-embedded and documents removed from this list are deleted
+    print(f"\n📚 Syncing {len(documents)} government service documents ({len(chunks)} chunks)...")
+    summary = rag.sync_documents(chunks, group="add_documents", prune=True)
+    print(f"✅ Knowledge base updated: {summary['added']} added, {summary['unchanged']} unchanged, {summary['deleted']} removed")
+
+    # Test the system
+    print("\n🧪 Testing system with sample queries...\n")
+
+    test_queries = [
+        "How do I apply for a passport?",
+        "What is the tax filing deadline?",
+        "How do I get a National ID card?",
+        "What documents do I need for a driving license?",
+        "How do I register a birth certificate?"
+    ]
+
+    for query in test_queries:
+        print(f"❓ {query}")
+        result = rag.answer_query(query)
+        print(f"💡 {result['answer'][:150]}...")
+        print(f"📊 Confidence: {result['confidence']}, Sources: {len(result['sources'])}\n")
+
+    print("="*60)
+    stats = rag.get_stats()
+    print(f"✅ Total documents in system: {stats['total_documents']}")
+    print("="*60)
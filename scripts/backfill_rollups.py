@@ -0,0 +1,101 @@
+# scripts/backfill_rollups.py
+# Rebuild the hourly/daily engagement rollups from the raw engagements, one day at a time.
+# Each day's rollups are replaced, so the command can be re-run safely. Increments that land
+# on a day while it is being rewritten are lost - run it at a quiet time, or pass --to.
+#
+#   python -m scripts.backfill_rollups                       # all history
+#   python -m scripts.backfill_rollups --from 2025-01-01 --to 2025-02-01
+import argparse
+import os
+import time
+from datetime import timedelta
+from typing import Dict, Tuple
+
+from pymongo import MongoClient
+
+from analytics import (cap_question_counts, ensure_engagement_indexes, ensure_rollup_indexes,
+                       mark_rollups_ready, parse_date, period_start, rollup_increments)
+
+
+def _apply(doc: Dict, inc: Dict[str, int]):
+    """Apply a dotted $inc document to a rollup document in memory"""
+    for field, n in inc.items():
+        target = doc
+        *parents, leaf = field.split(".", 1)
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[leaf] = target.get(leaf, 0) + n
+
+
+def rebuild_day(eng_col, rollup_col, day) -> int:
+    """Replace the rollups for one UTC day; returns the number of engagements counted"""
+    next_day = day + timedelta(days=1)
+    pipeline = [
+        {"$match": {"timestamp": {"$gte": day, "$lt": next_day}}},
+        {"$group": {
+            "_id": {
+                "hour": {"$hour": "$timestamp"},
+                "service": "$service",
+                "age": "$age",
+                "question": "$question_clicked"
+            },
+            "count": {"$sum": 1}
+        }}
+    ]
+
+    docs: Dict[Tuple[str, object, object], Dict] = {}
+    total = 0
+    for row in eng_col.aggregate(pipeline, allowDiskUse=True):
+        key = row["_id"]
+        inc = rollup_increments(key.get("age"), key.get("question"), row["count"])
+        for granularity, period in (("hour", day + timedelta(hours=key["hour"])), ("day", day)):
+            doc = docs.setdefault((granularity, period, key.get("service")), {
+                "granularity": granularity, "period": period, "service": key.get("service"),
+                "count": 0, "ages": {}, "questions": {}
+            })
+            _apply(doc, inc)
+        total += row["count"]
+
+    for doc in docs.values():
+        doc["questions"] = cap_question_counts(doc["questions"])
+
+    rollup_col.delete_many({"granularity": "hour", "period": {"$gte": day, "$lt": next_day}})
+    rollup_col.delete_many({"granularity": "day", "period": day})
+    if docs:
+        rollup_col.insert_many(list(docs.values()), ordered=False)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild engagement rollups from raw engagements")
+    parser.add_argument("--from", dest="start", help="first day (YYYY-MM-DD), default: oldest engagement")
+    parser.add_argument("--to", dest="end", help="day to stop before (YYYY-MM-DD), default: after the newest")
+    parser.add_argument("--db", default="citizen_portal")
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    db = client[args.db]
+    eng_col, rollup_col = db["engagements"], db["engagement_rollups"]
+    ensure_engagement_indexes(eng_col)
+    ensure_rollup_indexes(rollup_col)
+
+    oldest = eng_col.find_one({"timestamp": {"$type": "date"}}, sort=[("timestamp", 1)])
+    newest = eng_col.find_one({"timestamp": {"$type": "date"}}, sort=[("timestamp", -1)])
+    if oldest is None:
+        print("No engagements to roll up")
+    else:
+        day = parse_date(args.start) if args.start else period_start(oldest["timestamp"], "day")
+        end = parse_date(args.end) if args.end else period_start(newest["timestamp"], "day") + timedelta(days=1)
+
+        started, total = time.perf_counter(), 0
+        while day < end:
+            counted = rebuild_day(eng_col, rollup_col, day)
+            total += counted
+            if counted:
+                print(f"📊 {day.date()}: {counted:,} engagements")
+            day += timedelta(days=1)
+        print(f"✅ Rolled up {total:,} engagements in {time.perf_counter() - started:.1f}s")
+
+    if not args.start and not args.end:
+        mark_rollups_ready(rollup_col)
+        print("✅ Insights will now be served from the rollups")
@@ -0,0 +1,78 @@
+# scripts/bench_chunker.py
+# Throughput of StructuredChunker vs. the old 800-word window chunk_text on a large document,
+# plus how many chunks exceed the embedding model's 256-token window (and get truncated).
+#
+#   python -m scripts.bench_chunker --mb 5            # token counts estimated
+#   python -m scripts.bench_chunker --mb 5 --tokenizer  # exact counts with the MiniLM tokenizer
+import argparse
+import random
+import time
+
+from ai.chunker import StructuredChunker
+
+SECTION = """{title}:
+
+To apply, citizens must visit the relevant Divisional Secretariat with the original documents
+and certified copies. Officers verify the application and issue a receipt with a reference number.
+Processing usually takes between seven and ten working days depending on the district.
+
+Required Documents:
+- Original Birth Certificate with certified copy
+- National Identity Card (NIC) - original and photocopy
+- Two recent passport-size photographs (white background)
+
+Fees:
+- Normal processing: Rs. {fee:,}
+- Express processing: Additional Rs. 3,000
+
+Contact:
+- Hotline: {hotline}
+- Website: www.gov.lk
+"""
+
+
+def build_document(target_bytes: int) -> str:
+    rng = random.Random(0)
+    parts, size = [], 0
+    while size < target_bytes:
+        part = SECTION.format(
+            title=f"Service {len(parts)} Application Process",
+            fee=rng.choice([500, 1000, 2000, 3000]),
+            hotline=rng.choice([1962, 1969, 1919])
+        )
+        parts.append(part)
+        size += len(part)
+    return "\n".join(parts)
+
+
+def word_window(text: str, chunk_size: int = 800, overlap: int = 150):
+    """The previous DocumentScraper.chunk_text"""
+    words = text.split()
+    return [' '.join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size - overlap)]
+
+
+def report(name, chunks, elapsed, size, count):
+    over = sum(1 for c in chunks if count(c) > 254)
+    print(f"{name:>12}: {size / elapsed / 1e6:7.2f} MB/s  {len(chunks):7d} chunks  "
+          f"{over:7d} over 254 tokens ({100 * over / max(len(chunks), 1):.1f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunker throughput benchmark")
+    parser.add_argument("--mb", type=float, default=5.0)
+    parser.add_argument("--tokenizer", action="store_true", help="measure tokens with the embedding tokenizer")
+    args = parser.parse_args()
+
+    text = build_document(int(args.mb * 1e6))
+    chunker = StructuredChunker.for_embedding_model() if args.tokenizer else StructuredChunker()
+    count = chunker._count
+    print(f"document: {len(text) / 1e6:.1f} MB, tokens measured with "
+          f"{'MiniLM tokenizer' if args.tokenizer else 'estimate'}")
+
+    start = time.perf_counter()
+    old = word_window(text)
+    report("word-window", old, time.perf_counter() - start, len(text), count)
+
+    start = time.perf_counter()
+    new = [c['text'] for c in chunker.chunk(text)]
+    report("structured", new, time.perf_counter() - start, len(text), count)
@@ -0,0 +1,68 @@
+# scripts/bench_embeddings.py
+# Compare per-request encode() against the micro-batching queue under concurrent load.
+#
+#   python -m scripts.bench_embeddings --threads 16 --requests 2000 --wait-ms 2 --max-batch 32
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ai.embeddings import EmbeddingService
+
+QUERIES = [
+    "How do I apply for a passport?",
+    "What is the tax filing deadline?",
+    "How do I get a National ID card?",
+    "What documents do I need for a driving license?",
+    "How do I register a birth certificate?",
+    "How much does an express passport cost?",
+    "Where is the immigration office in Kandy?",
+    "How do I replace a lost NIC?",
+]
+
+
+def run(service: EmbeddingService, threads: int, requests: int):
+    texts = [f"{QUERIES[i % len(QUERIES)]} #{i}" for i in range(requests)]
+    latencies = []
+
+    def one(text):
+        start = time.perf_counter()
+        service.encode_one(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, texts))
+    elapsed = time.perf_counter() - start
+
+    lat = np.array(latencies)
+    return {
+        'qps': requests / elapsed,
+        'p50_ms': float(np.percentile(lat, 50)),
+        'p99_ms': float(np.percentile(lat, 99)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding micro-batching benchmark")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--wait-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch", type=int, default=32)
+    args = parser.parse_args()
+
+    direct = EmbeddingService(microbatch=False, cache=False)
+    batched = EmbeddingService(microbatch=True, cache=False)
+    batched.batcher.max_wait_ms = args.wait_ms
+    batched.batcher.max_batch_size = args.max_batch
+    batched._model = direct.model  # same weights, loaded once
+
+    direct.encode_one("warmup")
+    batched.encode_one("warmup")
+
+    print(f"threads={args.threads} requests={args.requests} wait_ms={args.wait_ms} max_batch={args.max_batch}")
+    for name, service in (("direct", direct), ("microbatch", batched)):
+        r = run(service, args.threads, args.requests)
+        print(f"{name:>10}: {r['qps']:8.1f} QPS   p50 {r['p50_ms']:7.2f} ms   p99 {r['p99_ms']:7.2f} ms")
+    print(f"batcher stats: {batched.batcher.stats()}")
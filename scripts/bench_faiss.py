@@ -0,0 +1,107 @@
+# scripts/bench_faiss.py
+# Recall-vs-latency sweep of the FAISS index types used by ai/vector_store.py, to pick
+# FAISS_INDEX_TYPE / FAISS_EF_SEARCH / FAISS_NPROBE for a corpus size. Ground truth is the
+# exact flat index. Vectors are synthetic (clustered unit vectors like sentence embeddings)
+# unless --vectors points to a saved (N, dim) float32 .npy of real embeddings.
+#
+#   python -m scripts.bench_faiss
+#   python -m scripts.bench_faiss --n 1000000 --types hnsw ivfpq --target-recall 0.9
+#   python -m scripts.bench_faiss --vectors data/embeddings.npy
+import argparse
+import statistics
+import time
+
+import faiss  # type: ignore
+import numpy as np
+
+from ai.vector_store import INDEX_TYPES, build_faiss_index, normalized, set_search_params
+
+SWEEP = {
+    'flat': [None],
+    'hnsw': [16, 32, 64, 128, 256],
+    'ivf': [1, 4, 8, 16, 32, 64],
+    'ivfpq': [1, 4, 8, 16, 32, 64],
+}
+
+
+def synthetic(n: int, dimension: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dimension)).astype(np.float32)
+    return normalized(vectors)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f[f >= 0]) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def measure(index, queries: np.ndarray, k: int, single: int):
+    start = time.perf_counter()
+    _, found = index.search(queries, k)
+    batch_qps = len(queries) / (time.perf_counter() - start)
+
+    latencies = []
+    for query in queries[:single]:
+        start = time.perf_counter()
+        index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return found, statistics.median(latencies), latencies[max(int(len(latencies) * 0.95) - 1, 0)], batch_qps
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FAISS index type recall/latency benchmark")
+    parser.add_argument("--n", type=int, default=200000, help="synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--vectors", help=".npy file of real embeddings (overrides --n/--dim)")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--single", type=int, default=200, help="queries timed one at a time")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument("--threads", type=int, default=0, help="FAISS OpenMP threads (0 = default)")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    args = parser.parse_args()
+
+    if args.threads:
+        faiss.omp_set_num_threads(args.threads)
+    if args.vectors:
+        corpus = normalized(np.load(args.vectors))
+    else:
+        corpus = synthetic(args.n, args.dim, clusters=max(args.n // 500, 10))
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(corpus), args.queries, replace=False)
+    queries = normalized(corpus[picks] + 0.3 * rng.standard_normal((args.queries, corpus.shape[1])).astype(np.float32))
+    keys = np.arange(len(corpus), dtype=np.int64)
+
+    exact = build_faiss_index("flat", corpus, keys)
+    _, truth = exact.search(queries, args.k)
+    print(f"{len(corpus)} vectors x {corpus.shape[1]} dims, {args.queries} queries, k={args.k}\n")
+    print(f"{'type':>6}  {'param':>10}  {'build s':>7}  {'MB':>7}  {'recall':>6}  {'p50 ms':>7}  {'p95 ms':>7}  {'batch q/s':>9}")
+
+    best = None
+    for index_type in args.types:
+        start = time.perf_counter()
+        index = build_faiss_index(index_type, corpus, keys)
+        build_s = time.perf_counter() - start
+        size_mb = len(faiss.serialize_index(index)) / 1e6
+        for value in SWEEP[index_type]:
+            param = ""
+            if index_type == "hnsw":
+                set_search_params(index, ef_search=value)
+                param = f"efSearch={value}"
+            elif value is not None:
+                set_search_params(index, nprobe=value)
+                param = f"nprobe={value}"
+            found, p50, p95, qps = measure(index, queries, args.k, args.single)
+            recall = recall_at_k(found, truth)
+            print(f"{index_type:>6}  {param:>10}  {build_s:7.1f}  {size_mb:7.1f}  {recall:6.3f}  "
+                  f"{p50:7.3f}  {p95:7.3f}  {qps:9.0f}")
+            if recall >= args.target_recall and (best is None or p50 < best[3]):
+                best = (index_type, param, recall, p50)
+
+    if best:
+        print(f"\nFastest setting with recall@{args.k} >= {args.target_recall}: "
+              f"FAISS_INDEX_TYPE={best[0]} {best[1]} (recall {best[2]:.3f}, p50 {best[3]:.3f} ms)")
+    else:
+        print(f"\nNo setting reached recall@{args.k} >= {args.target_recall}")
@@ -0,0 +1,112 @@
+# scripts/bench_insights.py
+# Seed a throwaway database with synthetic engagements and compare the old
+# Python scan of /api/admin/insights with the aggregation pipeline and the rollups.
+#
+#   python -m scripts.bench_insights --n 2000000          # seeds citizen_portal_bench
+#   python -m scripts.bench_insights --n 2000000 --reuse  # skip seeding
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+
+from analytics import (compute_insights, ensure_engagement_indexes, ensure_rollup_indexes, mark_rollups_ready,
+                       match_filters, parse_filters, period_start, rollup_insights)
+from scripts.backfill_rollups import rebuild_day
+
+SERVICES = [f"Ministry {i}" for i in range(20)]
+QUESTIONS = [f"Question {i}" for i in range(200)]
+
+
+def seed(col, n: int, batch: int = 10000):
+    col.drop()
+    rng = random.Random(42)
+    start = datetime.utcnow() - timedelta(days=365)
+    for offset in range(0, n, batch):
+        col.insert_many([
+            {
+                "user_id": None,
+                "age": rng.choice([None, rng.randint(10, 85)]),
+                "job": rng.choice(["student", "teacher", "engineer", None]),
+                "desires": [],
+                "question_clicked": rng.choice(QUESTIONS),
+                "service": rng.choice(SERVICES),
+                "source": "web",
+                "timestamp": start + timedelta(seconds=rng.randint(0, 365 * 86400))
+            }
+            for _ in range(min(batch, n - offset))
+        ], ordered=False)
+        print(f"\rseeded {offset + batch:,}/{n:,}", end="")
+    print()
+    ensure_engagement_indexes(col)
+
+
+def backfill(col, rollup_col):
+    rollup_col.drop()
+    ensure_rollup_indexes(rollup_col)
+    oldest = col.find_one(sort=[("timestamp", 1)])["timestamp"]
+    day, end = period_start(oldest, "day"), datetime.utcnow() + timedelta(days=1)
+    while day < end:
+        rebuild_day(col, rollup_col, day)
+        day += timedelta(days=1)
+    mark_rollups_ready(rollup_col)
+
+
+def python_scan(col, match):
+    """The previous implementation: two full scans in Python"""
+    age_groups = {"<18": 0, "18-25": 0, "26-40": 0, "41-60": 0, "60+": 0}
+    for e in col.find(match, {"age": 1}):
+        age = e.get("age")
+        if not age: continue
+        if age < 18: age_groups["<18"] += 1
+        elif age <= 25: age_groups["18-25"] += 1
+        elif age <= 40: age_groups["26-40"] += 1
+        elif age <= 60: age_groups["41-60"] += 1
+        else: age_groups["60+"] += 1
+    services, questions = {}, {}
+    for e in col.find(match, {"service": 1, "question_clicked": 1}):
+        s = e.get("service") or "Unknown"
+        q = e.get("question_clicked") or "Direct Chat"
+        services[s] = services.get(s, 0) + 1
+        questions[q] = questions.get(q, 0) + 1
+    return {"age_groups": age_groups, "services": services, "questions": questions}
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Engagement insights benchmark")
+    parser.add_argument("--n", type=int, default=1_000_000)
+    parser.add_argument("--reuse", action="store_true")
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    col = client["citizen_portal_bench"]["engagements"]
+    rollup_col = client["citizen_portal_bench"]["engagement_rollups"]
+    if not args.reuse:
+        seed(col, args.n)
+        _, backfill_s = timed(backfill, col, rollup_col)
+        print(f"backfilled rollups in {backfill_s:.1f}s")
+    print(f"{col.estimated_document_count():,} engagements, {rollup_col.estimated_document_count():,} rollup documents")
+
+    last_month = (datetime.utcnow() - timedelta(days=30)).date().isoformat()
+    cases = [
+        ("all time", {}),
+        ("last 30 days", {"from": last_month}),
+        ("one service, last 30 days", {"from": last_month, "service": SERVICES[0]}),
+    ]
+    for name, params in cases:
+        filters = parse_filters(params)
+        match = match_filters(filters)
+        old, old_s = timed(python_scan, col, match)
+        new, new_s = timed(compute_insights, col, match)
+        rolled, rolled_s = timed(rollup_insights, rollup_col, filters)
+        same = old["age_groups"] == new["age_groups"] and old["services"] == new["services"] == rolled["services"]
+        print(f"{name:>28}: python scan {old_s:7.2f}s   pipeline {new_s:7.2f}s   rollups {rolled_s:7.3f}s   "
+              f"results match: {same}")
@@ -0,0 +1,78 @@
+# scripts/bench_retrieval.py
+# recall@k / MRR and latency of dense, sparse (BM25) and hybrid (RRF) retrieval over the
+# scripts/add_documents.py guides, indexed into a throwaway Chroma directory.
+#
+#   python -m scripts.bench_retrieval
+#   python -m scripts.bench_retrieval --k 1 3 5 --repeat 5
+import argparse
+import statistics
+import tempfile
+import time
+
+from ai.chroma_store import ChromaVectorStore
+from ai.hybrid_retriever import HybridRetriever
+from scripts.add_documents import build_chunks
+
+# (query, source of the relevant guide, text the relevant chunk must contain)
+LABELED_QUERIES = [
+    ("What is the Inland Revenue hotline 1962 for?", "https://ird.gov.lk/tax-filing", "1962"),
+    ("motor traffic 1969", "https://motortraffic.gov.lk/driving-license", "1969"),
+    ("Where do I get Form A?", "https://rgd.gov.lk/nic-application", "Form A"),
+    ("B1 licence category", "https://motortraffic.gov.lk/driving-license", "B1"),
+    ("C1 light goods vehicles", "https://motortraffic.gov.lk/driving-license", "C1"),
+    ("Form 1 registration of birth", "https://rgd.gov.lk/birth-certificate", "Form 1"),
+    ("VAT registration turnover Rs. 12 million", "https://ird.gov.lk/tax-filing", "12 million"),
+    ("passport with 64 pages fee", "https://immigration.gov.lk/passport-application", "64 pages"),
+    ("tax rate above Rs. 4,000,000", "https://ird.gov.lk/tax-filing", "18%"),
+    ("How do I apply for a passport?", "https://immigration.gov.lk/passport-application", ""),
+    ("What is the tax filing deadline?", "https://ird.gov.lk/tax-filing", ""),
+    ("How do I get a National ID card?", "https://rgd.gov.lk/nic-application", ""),
+    ("What documents do I need for a driving license?", "https://motortraffic.gov.lk/driving-license", ""),
+    ("How do I register a birth certificate?", "https://rgd.gov.lk/birth-certificate", ""),
+    ("How can we register our marriage?", "https://rgd.gov.lk/marriage-registration", ""),
+    ("booking a driving test", "https://motortraffic.gov.lk/driving-license", "driving test"),
+]
+
+
+def first_relevant_rank(docs, source: str, must_contain: str):
+    for rank, doc in enumerate(docs, start=1):
+        if doc['source'] == source and must_contain in doc['text']:
+            return rank
+    return None
+
+
+def evaluate(retriever: HybridRetriever, mode: str, ks, repeat: int):
+    ranks, latencies = [], []
+    for query, source, must_contain in LABELED_QUERIES:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            docs = retriever.search(query, n_results=max(ks), mode=mode)
+            latencies.append((time.perf_counter() - start) * 1000)
+        ranks.append(first_relevant_rank(docs, source, must_contain))
+
+    recall = {k: sum(1 for r in ranks if r is not None and r <= k) / len(ranks) for k in ks}
+    mrr = sum(1 / r for r in ranks if r) / len(ranks)
+    latencies.sort()
+    return recall, mrr, statistics.mean(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dense vs BM25 vs hybrid retrieval benchmark")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = ChromaVectorStore(persist_directory=directory)
+        store.add_documents(build_chunks())
+        retriever = HybridRetriever(store)
+        retriever.sync()
+        retriever.search("warmup", n_results=1)
+
+        print(f"{len(LABELED_QUERIES)} labeled queries, {len(retriever.bm25)} chunks\n")
+        header = "  ".join(f"R@{k:<3}" for k in args.k)
+        print(f"{'mode':>8}  {header}  MRR    mean ms  p95 ms")
+        for mode in ("dense", "sparse", "hybrid"):
+            recall, mrr, mean_ms, p95_ms = evaluate(retriever, mode, args.k, args.repeat)
+            cells = "  ".join(f"{recall[k]:.2f} " for k in args.k)
+            print(f"{mode:>8}  {cells}  {mrr:.3f}  {mean_ms:7.2f}  {p95_ms:6.2f}")
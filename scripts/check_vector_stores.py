@@ -0,0 +1,264 @@
+# scripts/check_vector_stores.py
+# Conformance checks and a small benchmark for every vector store backend behind
+# BaseVectorStore. Runs offline: stores are created in temp directories, Pinecone
+# is replaced by LocalPineconeIndex, and by default texts are embedded with a
+# deterministic hashing embedder instead of the sentence-transformers model.
+#
+#   python -m scripts.check_vector_stores
+#   python -m scripts.check_vector_stores --backends faiss pinecone-local --docs 5000
+#   python -m scripts.check_vector_stores --embeddings model
+import argparse
+import asyncio
+import hashlib
+import os
+import statistics
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from ai.bm25 import tokenize
+from ai.store_base import AsyncVectorStore, BaseVectorStore
+
+BACKENDS = ("chroma", "faiss", "pinecone-local")
+RESULT_KEYS = {'id', 'text', 'source', 'title', 'page', 'score', 'distance'}
+
+
+class HashingEmbeddings:
+    """Offline stand-in for EmbeddingService: unit vectors from hashed tokens"""
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False, persist: bool = True) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                digest = hashlib.md5(token.encode("utf-8")).digest()
+                vectors[row, int.from_bytes(digest[:4], "little") % self.dimension] += 1.0 if digest[4] & 1 else -1.0
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def encode_one(self, text: str) -> np.ndarray:
+        return self.encode([text])[0]
+
+
+def make_store(backend: str, directory: str, embeddings, local_index=None) -> BaseVectorStore:
+    """`local_index` shares one LocalPineconeIndex between pinecone-local stores"""
+    if backend == "chroma":
+        from ai.chroma_store import ChromaVectorStore
+        return ChromaVectorStore(persist_directory=os.path.join(directory, "chroma"), embedding_service=embeddings)
+    if backend == "faiss":
+        from ai.vector_store import VectorStore
+        return VectorStore(embedding_service=embeddings,
+                           index_path=os.path.join(directory, "faiss.bin"),
+                           docs_path=os.path.join(directory, "faiss_docs.sqlite"))
+    from ai.pinecone_store import LocalPineconeIndex, PineconeStore
+    return PineconeStore(index=local_index or LocalPineconeIndex(), embedding_service=embeddings,
+                         manifest_dir=os.path.join(directory, "manifests"))
+
+
+def corpus(n: int) -> List[Dict]:
+    topics = ["passport", "tax return", "driving licence", "birth certificate", "national id", "marriage"]
+    offices = ["Colombo", "Kandy", "Galle", "Jaffna", "Matara", "Kurunegala"]
+    return [
+        {
+            'text': f"Guide {i}: how to renew a {topics[i % 6]} at the {offices[(i // 6) % 6]} office, "
+                    f"fee Rs. {100 + i}, counter {i % 17}, reference code R{i:05d}.",
+            'source': f"https://example.gov.lk/{topics[i % 6].replace(' ', '-')}",
+            'title': topics[i % 6].title(),
+            'page': i % 5 if i % 3 == 0 else None,
+            'chunk_id': i
+        }
+        for i in range(n)
+    ]
+
+
+# -------------------------------------------------------------
+# Conformance
+# -------------------------------------------------------------
+def check(store: BaseVectorStore, n_docs: int) -> List[str]:
+    """Run the contract against an empty store; returns the failures"""
+    failures = []
+
+    def expect(condition: bool, message: str):
+        if not condition:
+            failures.append(message)
+
+    docs = corpus(n_docs)
+    expect(store.count() == 0, "new store is not empty")
+    fingerprint = store.fingerprint()
+    expect(store.add(docs) == n_docs, "add() did not report every new document")
+    expect(store.add(docs[:10]) == 0, "add() re-added existing documents")
+    expect(store.count() == n_docs, "count() after add")
+    expect(store.fingerprint() != fingerprint, "fingerprint unchanged after a write")
+
+    hits = store.search(docs[7]['text'], n_results=3)
+    expect(len(hits) == 3, "search() returned the wrong number of results")
+    expect(all(set(hit) == RESULT_KEYS for hit in hits), f"result keys differ: {sorted(hits[0]) if hits else []}")
+    expect(bool(hits) and hits[0]['id'] == store.document_id(docs[7]), "exact text is not the top hit")
+    expect(bool(hits) and hits[0]['source'] == docs[7]['source'] and hits[0]['title'] == docs[7]['title'],
+           "metadata not returned")
+    expect(all(hits[i]['score'] >= hits[i + 1]['score'] - 1e-6 for i in range(len(hits) - 1)),
+           "results not ordered by score")
+    expect(bool(hits) and abs(hits[0]['score'] - 1.0) < 1e-3, "score of an identical text is not ~1.0")
+    page_hit = store.search(docs[3]['text'], n_results=1)
+    expect(bool(page_hit) and page_hit[0]['page'] == 3, "page metadata lost")
+
+    queries = [docs[i]['text'] for i in (1, 5, 9)]
+    many = store.search_many(queries, n_results=4)
+    single = [store.search(q, n_results=4) for q in queries]
+    expect([[h['id'] for h in r] for r in many] == [[h['id'] for h in r] for r in single],
+           "search_many() differs from search()")
+
+    expect(set(store.all_ids()) == {store.document_id(d) for d in docs}, "all_ids() mismatch")
+    some = [store.document_id(d) for d in docs[:5]]
+    listed = {doc_id: (text, meta) for doc_id, text, meta in store.iter_documents(some)}
+    expect(set(listed) == set(some) and listed[some[0]][0] == docs[0]['text'], "iter_documents() mismatch")
+
+    changed = dict(docs[2], title="Renamed")
+    expect(store.upsert([changed]) == 1, "upsert() count")
+    expect(store.count() == n_docs, "upsert() of an existing chunk changed the count")
+    expect(store.search(docs[2]['text'], n_results=1)[0]['title'] == "Renamed", "upsert() did not replace metadata")
+
+    expect(store.delete(some + ["missing"]) == 5, "delete() count")
+    expect(store.count() == n_docs - 5, "count() after delete")
+    expect(all(h['id'] not in some for h in store.search(docs[0]['text'], n_results=10)), "deleted chunk returned")
+
+    source = docs[0]['source']
+    kept = [d for d in docs if d['source'] == source][:3]
+    summary = store.sync_documents(kept + [{'text': "A brand new passport note.", 'source': source}], group="check")
+    expect(summary['added'] >= 1 and summary['deleted'] > 0, f"sync_documents() summary {summary}")
+    expect(set(store._ids_for_source(source)) == {store.document_id(d) for d in kept} |
+           {store.document_id({'text': "A brand new passport note.", 'source': source})},
+           "sync_documents() left the wrong chunks for a source")
+
+    async def run_async():
+        async_store = AsyncVectorStore(store)
+        results = await asyncio.gather(*(async_store.search(q, 4) for q in queries))
+        batched = await async_store.search_many(queries, 4)
+        added = await async_store.add([{'text': "Async added note.", 'source': "async"}])
+        removed = await async_store.delete([store.document_id({'text': "Async added note.", 'source': "async"})])
+        return results, batched, added, removed
+
+    results, batched, added, removed = asyncio.run(run_async())
+    expect([[h['id'] for h in r] for r in results] == [[h['id'] for h in r] for r in batched],
+           "async search differs from async search_many")
+    expect(added == 1 and removed == 1, "async add/delete")
+
+    store.delete_all()
+    expect(store.count() == 0 and store.all_ids() == [], "delete_all() left documents")
+    return failures
+
+
+def check_shared(backend: str, directory: str, embeddings) -> List[str]:
+    """
+    Two stores opened on one directory, like the app and an ingestion script
+    in separate processes: the reader's fingerprint must change on every
+    write by the other, including a sync that keeps the chunk count.
+    """
+    failures = []
+    local_index = None
+    if backend == "pinecone-local":
+        from ai.pinecone_store import LocalPineconeIndex
+        local_index = LocalPineconeIndex()
+    writer = make_store(backend, directory, embeddings, local_index)
+    reader = make_store(backend, directory, embeddings, local_index)
+
+    docs = corpus(8)
+    before = reader.fingerprint()
+    writer.add(docs[:6])
+    if reader.fingerprint() == before:
+        failures.append("fingerprint unchanged after another instance added chunks")
+
+    before = reader.fingerprint()
+    source = docs[0]['source']
+    kept = [d for d in docs[:6] if d['source'] == source][:-1] + [dict(docs[0], text="Replacement passport note.")]
+    summary = writer.sync_documents(kept, group="shared")
+    if summary['added'] != 1 or summary['deleted'] != 1:
+        failures.append(f"shared sync summary {summary}")
+    if reader.fingerprint() == before:
+        failures.append("fingerprint unchanged after another instance replaced a chunk (same count)")
+    return failures
+
+
+# -------------------------------------------------------------
+# Benchmark
+# -------------------------------------------------------------
+def bench(store: BaseVectorStore, n_docs: int, n_queries: int, k: int) -> Dict:
+    docs = corpus(n_docs)
+    start = time.perf_counter()
+    store.add(docs)
+    add_s = time.perf_counter() - start
+    queries = [f"renew {docs[i]['title'].lower()} office {i}" for i in range(n_queries)]
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        store.search(query, n_results=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    start = time.perf_counter()
+    store.search_many(queries, n_results=k)
+    many_s = time.perf_counter() - start
+
+    async def run_async():
+        async_store = AsyncVectorStore(store)
+        start = time.perf_counter()
+        await asyncio.gather(*(async_store.search(q, k) for q in queries))
+        return time.perf_counter() - start
+
+    async_s = asyncio.run(run_async())
+    return {
+        'add_docs_per_s': n_docs / add_s,
+        'p50_ms': statistics.median(latencies),
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1],
+        'search_many_qps': n_queries / many_s,
+        'async_qps': n_queries / async_s
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vector store conformance checks and benchmark")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--embeddings", choices=("hash", "model"), default="hash",
+                        help="hash: offline deterministic vectors; model: the shared sentence-transformers model")
+    parser.add_argument("--docs", type=int, default=2000, help="documents for the benchmark")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--skip-bench", action="store_true")
+    args = parser.parse_args()
+
+    if args.embeddings == "model":
+        from ai.embeddings import get_embedding_service
+        embeddings = get_embedding_service()
+    else:
+        embeddings = HashingEmbeddings()
+
+    failed = False
+    rows = []
+    for backend in args.backends:
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                store = make_store(backend, directory, embeddings)
+            except ImportError as e:
+                print(f"⚠️ {backend}: skipped ({e})")
+                continue
+            failures = check(store, 40) + check_shared(backend, os.path.join(directory, "shared"), embeddings)
+            failed = failed or bool(failures)
+            print(f"{'✅' if not failures else '❌'} {backend}: "
+                  f"{'all checks passed' if not failures else f'{len(failures)} failed'}")
+            for failure in failures:
+                print(f"   - {failure}")
+            if not args.skip_bench:
+                rows.append((backend, bench(make_store(backend, os.path.join(directory, "bench"), embeddings),
+                                            args.docs, args.queries, args.k)))
+
+    if rows:
+        print(f"\n{args.docs} docs, {args.queries} queries, k={args.k}, {args.embeddings} embeddings\n")
+        print(f"{'backend':>15}  {'add docs/s':>10}  {'p50 ms':>7}  {'p95 ms':>7}  {'many q/s':>9}  {'async q/s':>9}")
+        for backend, r in rows:
+            print(f"{backend:>15}  {r['add_docs_per_s']:10.0f}  {r['p50_ms']:7.2f}  {r['p95_ms']:7.2f}  "
+                  f"{r['search_many_qps']:9.0f}  {r['async_qps']:9.0f}")
+    raise SystemExit(1 if failed else 0)
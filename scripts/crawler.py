@@ -0,0 +1,287 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urldefrag, urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int
+    content: bytes = b""
+    content_type: str = ""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    not_modified: bool = False
+    error: Optional[str] = None
+    elapsed_ms: float = 0.0
+    # Same-host links found on an HTML page (only collected when the crawler follows links)
+    links: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and (self.not_modified or 200 <= self.status < 300)
+
+
+class _LinkParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.hrefs: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self.hrefs.append(href)
+
+
+def normalize_url(url: str) -> str:
+    """URL without its #fragment, used to fetch each page once"""
+    return urldefrag(url)[0]
+
+
+class Crawler:
+    """
+    Concurrent, polite HTTP fetcher for the document scraper.
+
+    - bounded worker pool (max_workers) with at most `max_in_flight` queued fetches
+    - per-host politeness: at most `per_host` concurrent requests and
+      `min_delay` seconds between request starts to the same host
+    - keep-alive connection pooling (one requests.Session per worker thread)
+    - retries with exponential backoff on connection errors and 429/5xx
+    - conditional GETs: ETag / Last-Modified validators are kept in `state_path`
+      and a 304 is reported as not_modified. Call commit() once a page has been
+      indexed, so a failed indexing run is retried next time.
+    - robots.txt is honoured per host (Disallow rules, and a Crawl-delay longer
+      than `min_delay`); blocked URLs are reported with an error, not fetched
+    - every URL is fetched at most once per crawl (fragments ignored)
+    - with max_depth > 0, same-host links on HTML pages are followed up to
+      that many hops from the given URLs
+    """
+
+    def __init__(self, max_workers: int = 8, per_host: int = 2, min_delay: float = 1.0,
+                 timeout: float = 30, retries: int = 3, backoff: float = 0.5,
+                 state_path: Optional[str] = "crawl_state.json",
+                 user_agent: str = "CitizenPortalBot/1.0",
+                 max_depth: int = 0, respect_robots: bool = True):
+        self.max_workers = max_workers
+        self.max_in_flight = max_workers * 2
+        self.per_host = per_host
+        self.min_delay = min_delay
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.state_path = state_path
+        self.user_agent = user_agent
+        self.max_depth = max_depth
+        self.respect_robots = respect_robots
+
+        self._local = threading.local()
+        self._robots: Dict[str, RobotFileParser] = {}
+        self._robots_lock = threading.Lock()
+        self._hosts: Dict[str, Tuple[threading.Semaphore, threading.Lock, list]] = {}
+        self._hosts_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self.state: Dict[str, Dict] = self._load_state()
+
+    # -------------------------------------------------------------
+    # Validators for conditional GETs
+    # -------------------------------------------------------------
+    def _load_state(self) -> Dict[str, Dict]:
+        if self.state_path and os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def save_state(self):
+        if not self.state_path:
+            return
+        with self._state_lock:
+            tmp = self.state_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.state, f, indent=2)
+            os.replace(tmp, self.state_path)
+
+    def commit(self, result: FetchResult):
+        """Remember a page's validators (and links, so a 304 can still be followed) once it is processed"""
+        if result.not_modified or not (result.etag or result.last_modified):
+            return
+        with self._state_lock:
+            self.state[result.url] = {'etag': result.etag, 'last_modified': result.last_modified}
+            if result.links:
+                self.state[result.url]['links'] = result.links
+
+    # -------------------------------------------------------------
+    # HTTP
+    # -------------------------------------------------------------
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            retry = Retry(
+                total=self.retries,
+                backoff_factor=self.backoff,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=["GET", "HEAD"],
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(max_retries=retry, pool_connections=self.per_host * 4,
+                                  pool_maxsize=self.per_host)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = self.user_agent
+            self._local.session = session
+        return session
+
+    def _host_slot(self, url: str):
+        host = urlsplit(url).netloc
+        with self._hosts_lock:
+            if host not in self._hosts:
+                self._hosts[host] = (threading.Semaphore(self.per_host), threading.Lock(), [0.0])
+            return self._hosts[host]
+
+    def _robots_for(self, url: str) -> RobotFileParser:
+        """Parsed robots.txt for the URL's host, fetched once per crawler"""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        with self._robots_lock:
+            robots = self._robots.get(origin)
+            if robots is not None:
+                return robots
+            robots = RobotFileParser(f"{origin}/robots.txt")
+            try:
+                response = self._session().get(robots.url, timeout=self.timeout)
+                if response.status_code in (401, 403):
+                    robots.disallow_all = True
+                elif response.status_code < 400:
+                    robots.parse(response.text.splitlines())
+                else:
+                    # No robots.txt (or a server error): everything is allowed
+                    robots.allow_all = True
+            except requests.RequestException as e:
+                print(f"⚠️ robots.txt unavailable for {origin}: {e}")
+                robots.allow_all = True
+            self._robots[origin] = robots
+            return robots
+
+    def allowed(self, url: str) -> bool:
+        return not self.respect_robots or self._robots_for(url).can_fetch(self.user_agent, url)
+
+    def _links(self, url: str, content: bytes) -> List[str]:
+        parser = _LinkParser()
+        try:
+            parser.feed(content.decode("utf-8", errors="replace"))
+        except Exception:
+            return []
+        host = urlsplit(url).netloc
+        links = []
+        for href in parser.hrefs:
+            link = normalize_url(urljoin(url, href))
+            parts = urlsplit(link)
+            if parts.scheme in ("http", "https") and parts.netloc == host and link not in links:
+                links.append(link)
+        return links
+
+    def fetch(self, url: str) -> FetchResult:
+        if not self.allowed(url):
+            return FetchResult(url=url, status=0, error="disallowed by robots.txt")
+        semaphore, pace_lock, next_start = self._host_slot(url)
+        if self.respect_robots:
+            delay = self._robots_for(url).crawl_delay(self.user_agent)
+        else:
+            delay = None
+        min_delay = max(self.min_delay, float(delay or 0))
+        headers = {}
+        known = self.state.get(url) or {}
+        if known.get('etag'):
+            headers['If-None-Match'] = known['etag']
+        if known.get('last_modified'):
+            headers['If-Modified-Since'] = known['last_modified']
+
+        with semaphore:
+            # Space out request starts to the same host
+            with pace_lock:
+                delay = next_start[0] - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_start[0] = time.monotonic() + min_delay
+
+            start = time.perf_counter()
+            try:
+                response = self._session().get(url, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                return FetchResult(url=url, status=0, error=str(e),
+                                   elapsed_ms=(time.perf_counter() - start) * 1000)
+            elapsed = (time.perf_counter() - start) * 1000
+
+        if response.status_code == 304:
+            return FetchResult(url=url, status=304, not_modified=True, elapsed_ms=elapsed,
+                               links=list(known.get('links', [])))
+
+        result = FetchResult(
+            url=url,
+            status=response.status_code,
+            content=response.content,
+            content_type=response.headers.get('Content-Type', ''),
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+            elapsed_ms=elapsed
+        )
+        if not 200 <= response.status_code < 300:
+            result.error = f"HTTP {response.status_code}"
+        elif self.max_depth > 0 and 'html' in result.content_type:
+            result.links = self._links(url, result.content)
+        return result
+
+    def crawl(self, items: Iterable[Dict]) -> Iterator[Tuple[Dict, FetchResult]]:
+        """
+        Fetch every item's 'url' concurrently and yield (item, result) as soon
+        as each download finishes, so callers can process pages while the rest
+        are still downloading. Repeated URLs are fetched once. Links followed
+        from a page (max_depth > 0) come back as items with 'url', 'type',
+        'title', 'depth' and 'parent'.
+        """
+        pending = {}
+        queue: List[Dict] = []
+        seen = set()
+        items = iter(items)
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="crawler") as pool:
+            exhausted = False
+            while True:
+                while len(pending) < self.max_in_flight and (queue or not exhausted):
+                    if queue:
+                        item = queue.pop(0)
+                    else:
+                        try:
+                            item = next(items)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                    url = normalize_url(item['url'])
+                    if url in seen:
+                        continue
+                    seen.add(url)
+                    pending[pool.submit(self.fetch, url)] = item
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    result = future.result()
+                    depth = item.get('depth', 0)
+                    if depth < self.max_depth:
+                        queue.extend({'url': link, 'type': 'html', 'title': link, 'depth': depth + 1,
+                                      'parent': result.url} for link in result.links if link not in seen)
+                    yield item, result
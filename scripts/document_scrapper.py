@@ -1,29 +1,54 @@
+import warnings
 import requests
 from bs4 import BeautifulSoup
-from PyPDF2 import PdfReader
-import io
-from typing import List, Dict
+from typing import List, Dict, Optional, Iterator
 from ai.gemini_rag import GeminiRAGSystem
-import time
+from ai.chunker import StructuredChunker
+from scripts.crawler import Crawler
+from scripts.pdf_extract import extract_pdf_pages, join_pages
 
 class DocumentScraper:
     """Scrape and index government documents"""
     
-    def __init__(self):
-        self.rag = GeminiRAGSystem()
+    # Manifest group for everything indexed by the scraper (see ChromaVectorStore.sync_documents)
+    MANIFEST_GROUP = "document_scraper"
+    
+    def __init__(self, rag: Optional[GeminiRAGSystem] = None, crawler: Optional[Crawler] = None,
+                 chunker: Optional[StructuredChunker] = None):
+        self.rag = rag or GeminiRAGSystem()
+        self.crawler = crawler or Crawler()
+        self.chunker = chunker
+    
+    def extract_pdf_text(self, content: bytes) -> str:
+        """Extract text from PDF bytes"""
+        return join_pages(extract_pdf_pages(content))
+    
+    def extract_html_text(self, content: bytes) -> str:
+        """Extract readable text from HTML bytes"""
+        soup = BeautifulSoup(content, 'html.parser')
+        
+        # Remove unwanted elements
+        for element in soup(['script', 'style', 'nav', 'footer', 'header']):
+            element.decompose()
+        
+        # Keep headings and list items recognisable for the chunker
+        for level in range(1, 7):
+            for heading in soup.find_all(f'h{level}'):
+                heading.insert(0, '#' * level + ' ')
+        for item in soup.find_all('li'):
+            item.insert(0, '- ')
+        
+        text = soup.get_text(separator='\n')
+        
+        # Clean up
+        lines = [line.strip() for line in text.split('\n')]
+        return '\n'.join([line for line in lines if line])
     
     def scrape_pdf_from_url(self, url: str) -> str:
         """Download and extract text from PDF URL"""
         try:
             response = requests.get(url, timeout=30)
-            pdf_file = io.BytesIO(response.content)
-            
-            reader = PdfReader(pdf_file)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text()
-            
-            return text
+            return self.extract_pdf_text(response.content)
         except Exception as e:
             print(f"Error scraping PDF {url}: {e}")
             return ""
@@ -32,88 +57,117 @@ class DocumentScraper:
         """Scrape text from HTML page"""
         try:
             response = requests.get(url, timeout=30)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Remove unwanted elements
-            for element in soup(['script', 'style', 'nav', 'footer', 'header']):
-                element.decompose()
-            
-            text = soup.get_text(separator='\n')
-            
-            # Clean up
-            lines = [line.strip() for line in text.split('\n')]
-            text = '\n'.join([line for line in lines if line])
-            
-            return text
+            return self.extract_html_text(response.content)
         except Exception as e:
             print(f"Error scraping HTML {url}: {e}")
             return ""
     
-    def chunk_text(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
-        """Split text into overlapping chunks"""
-        words = text.split()
-        chunks = []
-        
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = ' '.join(words[i:i + chunk_size])
-            if chunk:
-                chunks.append(chunk)
-        
-        return chunks
+    def chunk_sections(self, text: str, title: Optional[str] = None) -> Iterator[Dict]:
+        """Split text into heading-aware {'text', 'heading', 'tokens'} chunks that fit the embedding model"""
+        if self.chunker is None:
+            self.chunker = StructuredChunker.for_embedding_model()
+        return self.chunker.chunk(text, title)
+    
+    def chunk_text(self, text: str, chunk_size: Optional[int] = None, overlap: Optional[int] = None,
+                   title: Optional[str] = None) -> List[str]:
+        """
+        Split text into chunks (list of strings), kept for existing callers.
+        chunk_size/overlap were word-window sizes; they are ignored, since
+        chunks are now sized to the embedding model's token window.
+        """
+        if chunk_size is not None or overlap is not None:
+            warnings.warn("chunk_text(chunk_size, overlap) is ignored; configure StructuredChunker instead",
+                          DeprecationWarning, stacklevel=2)
+        return [chunk['text'] for chunk in self.chunk_sections(text, title)]
     
-    def scrape_and_index(self, url_list: List[Dict]):
+    def scrape_and_index(self, url_list: List[Dict], prune: bool = False):
         """
-        Scrape documents and add to RAG system
+        Scrape documents and sync them into the RAG system
         
         url_list format:
         [
             {"url": "https://example.com/doc.pdf", "type": "pdf", "title": "Document Title"},
             {"url": "https://example.com/page.html", "type": "html", "title": "Page Title"}
         ]
+        
+        Pages are downloaded concurrently by self.crawler; each page is chunked
+        and indexed as soon as it arrives, while the others are still
+        downloading. Unmodified pages (HTTP 304) and unchanged chunks are
+        skipped. With prune=True, previously scraped URLs that were not
+        crawled this time (listed or linked) are removed from the index.
         """
-        all_documents = []
+        total_chunks = 0
+        totals = {'added': 0, 'unchanged': 0, 'deleted': 0, 'not_modified': 0, 'failed': 0}
+        # Given URLs plus pages reached by following links (Crawler max_depth)
+        crawled = {item['url'] for item in url_list}
         
-        for item in url_list:
+        for item, result in self.crawler.crawl(url_list):
             url = item['url']
-            doc_type = item['type']
             title = item.get('title', url)
+            crawled.add(url)
             
-            print(f"\n📄 Scraping: {title}")
-            print(f"   URL: {url}")
-            
-            # Scrape content
-            if doc_type == 'pdf':
-                text = self.scrape_pdf_from_url(url)
-            else:
-                text = self.scrape_html(url)
+            if result.not_modified:
+                print(f"📄 {title}: not modified, skipped")
+                totals['not_modified'] += 1
+                continue
+            if not result.ok:
+                print(f"📄 {title}: ⚠️  fetch failed ({result.error})")
+                totals['failed'] += 1
+                continue
             
-            if not text:
-                print(f"   ⚠️  No content extracted")
+            # Extract content as (page number, text); HTML is a single page without a number
+            try:
+                if item.get('type') == 'pdf' or 'application/pdf' in result.content_type:
+                    pages = extract_pdf_pages(result.content)
+                else:
+                    pages = [(None, self.extract_html_text(result.content))]
+            except Exception as e:
+                print(f"📄 {title}: ⚠️  extraction failed ({e})")
+                totals['failed'] += 1
                 continue
             
-            # Chunk the text
-            chunks = self.chunk_text(text, chunk_size=800, overlap=150)
-            print(f"   ✓ Extracted {len(chunks)} chunks")
+            # Chunk page by page so every chunk can cite its page
+            documents = []
+            for page, text in pages:
+                for chunk in self.chunk_sections(text, title):
+                    doc = {'text': chunk['text'], 'source': url, 'title': title, 'chunk_id': len(documents)}
+                    if page is not None:
+                        doc['page'] = page
+                    documents.append(doc)
             
-            # Create documents
-            for i, chunk in enumerate(chunks):
-                all_documents.append({
-                    'text': chunk,
-                    'source': url,
-                    'title': title,
-                    'chunk_id': i
-                })
+            if not documents:
+                print(f"📄 {title}: ⚠️  No content extracted")
+                continue
             
-            # Be nice to servers
-            time.sleep(1)
+            # Index this page now; other downloads keep running in the crawler pool
+            summary = self.rag.sync_documents(documents, group=self.MANIFEST_GROUP)
+            self.crawler.commit(result)
+            total_chunks += len(documents)
+            for key in ('added', 'unchanged', 'deleted'):
+                totals[key] += summary[key]
+            print(f"📄 {title}: {len(documents)} chunks in {result.elapsed_ms:.0f} ms fetch "
+                  f"(+{summary['added']} / ={summary['unchanged']} / -{summary['deleted']})")
+        
+        self.crawler.save_state()
+        print(f"\n📚 Crawl finished: {totals}")
         
-        # Index all documents
-        if all_documents:
-            print(f"\n📚 Indexing {len(all_documents)} document chunks...")
-            count = self.rag.add_documents(all_documents)
-            print(f"✓ Successfully indexed {count} documents!")
+        if prune:
+            self.prune_sources(crawled)
         
-        return len(all_documents)
+        return total_chunks
+    
+    def prune_sources(self, active_urls: set) -> int:
+        """Remove indexed pages that are no longer part of the crawl list"""
+        removed = 0
+        store = self.rag.vector_store
+        with store.batch_writes():
+            for manifest in store.list_manifests(self.MANIFEST_GROUP):
+                if manifest['source'] not in active_urls:
+                    removed += store.remove_source(manifest['source'])
+                    print(f"   🗑️  Removed vanished source {manifest['source']}")
+        if removed:
+            self.rag.answer_cache.clear()
+        return removed
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,94 @@
+import atexit
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from PyPDF2 import PdfReader
+
+# PDFs with fewer pages than this are extracted in-process (pool start-up isn't worth it)
+MIN_PAGES_FOR_POOL = int(os.getenv("PDF_MIN_PAGES_FOR_POOL", "16"))
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or os.cpu_count() or 1
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned workers: forking the multi-threaded app/crawler can copy locks held mid-update
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+# Worker side: the PDF most recently parsed by this process, as (key, reader)
+_worker_reader: Optional[Tuple[str, PdfReader]] = None
+
+
+def _read_pages(reader: PdfReader, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract pages [start, end) as (1-based page number, text)"""
+    pages = []
+    for index in range(start, end):
+        try:
+            text = reader.pages[index].extract_text() or ""
+        except Exception as e:
+            print(f"   ⚠️  Page {index + 1}: {e}")
+            text = ""
+        pages.append((index + 1, text))
+    return pages
+
+
+def _extract_range(path: str, key: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Worker: extract a page range of the PDF at `path`, parsing each PDF once per worker"""
+    global _worker_reader
+    if _worker_reader is None or _worker_reader[0] != key:
+        _worker_reader = (key, PdfReader(path))
+    return _read_pages(_worker_reader[1], start, end)
+
+
+def extract_pdf_pages(content: bytes, parallel: bool = True) -> List[Tuple[int, str]]:
+    """
+    Extract every page of a PDF as (page number, text), in page order.
+
+    Large PDFs are split into contiguous page ranges and fanned out across a
+    shared process pool (PDF_WORKERS, default: all cores), so extraction
+    scales with the available cores instead of running on one. The PDF is
+    written to a temporary file once and each worker parses it once.
+    """
+    reader = PdfReader(io.BytesIO(content))
+    page_count = len(reader.pages)
+    if not parallel or page_count < MIN_PAGES_FOR_POOL:
+        return _read_pages(reader, 0, page_count)
+
+    # Workers get a file path, not the bytes: the PDF crosses the process boundary once
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(content)
+    try:
+        pool = _get_pool()
+        key = uuid.uuid4().hex
+        # A few ranges per worker keeps cores busy when some pages are much slower
+        tasks = max(1, min(page_count, PDF_WORKERS * 4))
+        step = -(-page_count // tasks)
+        futures = [
+            pool.submit(_extract_range, f.name, key, start, min(start + step, page_count))
+            for start in range(0, page_count, step)
+        ]
+
+        pages: List[Tuple[int, str]] = []
+        for future in futures:
+            pages.extend(future.result())
+        return pages
+    finally:
+        os.remove(f.name)
+
+
+def join_pages(pages: List[Tuple[int, str]]) -> str:
+    return "\n".join(text for _, text in pages)
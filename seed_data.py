@@ -16,6 +16,7 @@
 from pymongo import MongoClient
 import os
 import json
+from catalogue_cache import bump_catalogue_version
 
 # ---------------------------------------------
 # Database Connection
@@ -195,4 +196,7 @@ for mid, title in remaining_ministries:
 # Insert to MongoDB
 services_col.insert_many(docs)
 
+# Tell running app workers to reload their cached catalogue
+bump_catalogue_version(db["catalogue_meta"])
+
 print("Seeded services:", services_col.count_documents({}))
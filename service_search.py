@@ -0,0 +1,111 @@
+# service_search.py
+# Local BM25 search over every question in the service catalogue (en/si/ta).
+
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from ai.bm25 import BM25Index, tokenize
+from catalogue_cache import localize
+
+# Question text is repeated so it outweighs the (longer) answer text
+QUESTION_BOOST = 2
+
+QuestionKey = Tuple[str, str, int]
+
+
+def _texts(value) -> List[str]:
+    """Every translation of a {"en", "si", "ta"} value (or the value itself)"""
+    if isinstance(value, dict):
+        return [v for v in value.values() if isinstance(v, str)]
+    return [value] if isinstance(value, str) else []
+
+
+class ServiceSearchIndex:
+    """
+    One BM25 document per question: its text in every language (boosted),
+    plus the answer, instructions and the subservice and ministry names.
+
+    sync() is called with the current catalogue snapshot. It only re-indexes
+    ministries whose content hash changed, so an admin edit touches only the
+    questions of the edited ministry.
+    """
+
+    def __init__(self):
+        self.index = BM25Index()
+        self.entries: Dict[QuestionKey, Dict] = {}
+        self._ministries: Dict[str, Tuple[str, List[QuestionKey]]] = {}
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+        self.last_sync_ms = 0.0
+
+    def _index_ministry(self, ministry: Dict) -> List[QuestionKey]:
+        keys = []
+        ministry_id = str(ministry.get("id"))
+        for sub in ministry.get("subservices") or []:
+            for i, question in enumerate(sub.get("questions") or []):
+                key = (ministry_id, str(sub.get("id")), i)
+                tokens = []
+                for text in _texts(question.get("q")):
+                    tokens += tokenize(text) * QUESTION_BOOST
+                for value in (question.get("answer"), question.get("instructions"),
+                              sub.get("name"), ministry.get("name")):
+                    for text in _texts(value):
+                        tokens += tokenize(text)
+                self.index.add(key, tokens)
+                self.entries[key] = {"ministry": ministry, "subservice": sub, "question": question}
+                keys.append(key)
+        return keys
+
+    def _drop_ministry(self, ministry_id: str):
+        _, keys = self._ministries.pop(ministry_id)
+        for key in keys:
+            self.index.remove(key)
+            self.entries.pop(key, None)
+
+    def sync(self, version: int, services: List[Dict]):
+        """Bring the index up to date with a catalogue version (no-op if already there)"""
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            start = time.perf_counter()
+            current = {}
+            for ministry in services:
+                ministry_id = str(ministry.get("id"))
+                digest = hashlib.sha1(json.dumps(ministry, sort_keys=True, default=str).encode()).hexdigest()
+                current[ministry_id] = (digest, ministry)
+
+            for ministry_id in list(self._ministries):
+                if ministry_id not in current or self._ministries[ministry_id][0] != current[ministry_id][0]:
+                    self._drop_ministry(ministry_id)
+            for ministry_id, (digest, ministry) in current.items():
+                if ministry_id not in self._ministries:
+                    self._ministries[ministry_id] = (digest, self._index_ministry(ministry))
+
+            self._version = version
+            self.last_sync_ms = (time.perf_counter() - start) * 1000
+
+    def search(self, query: str, lang: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        with self._lock:
+            hits = self.index.search(query, k=limit)
+            results = []
+            for key, score in hits:
+                entry = self.entries[key]
+                ministry, sub = entry["ministry"], entry["subservice"]
+                result = {
+                    "ministry_id": ministry.get("id"),
+                    "ministry": ministry.get("name"),
+                    "subservice_id": sub.get("id"),
+                    "subservice": sub.get("name"),
+                    "question": entry["question"],
+                    "score": round(score, 4)
+                }
+                results.append(localize(result, lang) if lang else result)
+            return results
+
+    def stats(self) -> Dict:
+        return {**self.index.stats(), 'version': self._version, 'last_sync_ms': round(self.last_sync_ms, 2)}
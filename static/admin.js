@@ -102,7 +102,7 @@ async function loadDashboard() {
         // =============================================================
         const pl = document.getElementById("premiumList");
 
-        pl.innerHTML = data.premium_suggestions.length
+        if (pl) pl.innerHTML = data.premium_suggestions.length
             ? data.premium_suggestions
                 .map(p => `
                     <div>
@@ -119,26 +119,12 @@ async function loadDashboard() {
         // =============================================================
         // ENGAGEMENT TABLE
         // =============================================================
-        const resEng = await fetch('/api/admin/engagements');
-        const items  = await resEng.json();
-
         const tbody = document.querySelector("#engTable tbody");
-        tbody.innerHTML = "";
-
-        items.forEach(it => {
-            const row = `
-                <tr>
-                    <td>${it.age || ""}</td>
-                    <td>${it.job || ""}</td>
-                    <td>${(it.desires || []).join(", ")}</td>
-                    <td>${it.question_clicked || ""}</td>
-                    <td>${it.service || ""}</td>
-                    <td>${it.timestamp || ""}</td>
-                </tr>
-            `;
-
-            tbody.insertAdjacentHTML('beforeend', row);
-        });
+        if (tbody) {
+            tbody.innerHTML = "";
+            engCursor = null;
+            await loadEngagements();
+        }
 
     } catch (err) {
         console.error(err);
@@ -147,6 +133,43 @@ async function loadDashboard() {
 
 
 
+// =============================================================
+// ENGAGEMENT PAGES (keyset cursor from /api/admin/engagements)
+// =============================================================
+let engCursor = null;
+
+async function loadEngagements() {
+    const params = new URLSearchParams({ limit: 100 });
+    if (engCursor) params.set("cursor", engCursor);
+
+    const resEng = await fetch(`/api/admin/engagements?${params}`);
+    const page   = await resEng.json();
+
+    const tbody = document.querySelector("#engTable tbody");
+    (page.items || []).forEach(it => {
+        const row = `
+            <tr>
+                <td>${it.age || ""}</td>
+                <td>${it.job || ""}</td>
+                <td>${(it.desires || []).join(", ")}</td>
+                <td>${it.question_clicked || ""}</td>
+                <td>${it.service || ""}</td>
+                <td>${it.timestamp || ""}</td>
+            </tr>
+        `;
+
+        tbody.insertAdjacentHTML('beforeend', row);
+    });
+
+    engCursor = page.next_cursor;
+    const more = document.getElementById("loadMoreEng");
+    if (more) more.style.display = engCursor ? "inline-block" : "none";
+}
+
+document.getElementById("loadMoreEng")?.addEventListener("click", loadEngagements);
+
+
+
 // =============================================================
 // LOGOUT BUTTON
 // =============================================================
@@ -17,12 +17,19 @@
 let lang = "en";
 let services = [];
 let currentServiceName = "";
+const serviceDetails = new Map();   // "<lang>:<ministry id>" -> ministry with subservices
+
+// Catalogue text is already in the chosen language when fetched with ?lang=
+function text(value) {
+    return typeof value === "string" ? value : (value[lang] || value.en);
+}
 
 // -------------------------------------------------------------
 // Load Services from Backend
 // -------------------------------------------------------------
 async function loadServices() {
-    const res = await fetch("/api/services");
+    // Ministry names only; subservices are fetched when a ministry is opened
+    const res = await fetch(`/api/services?view=index&lang=${lang}`);
     services = await res.json();
 
     const list = document.getElementById("service-list");
@@ -30,7 +37,7 @@ async function loadServices() {
 
     services.forEach(service => {
         const li = document.createElement("li");
-        li.textContent = service.name[lang] || service.name.en;
+        li.textContent = text(service.name);
         li.onclick = () => loadSubservices(service);
         list.appendChild(li);
     });
@@ -52,17 +59,24 @@ function setLang(l) {
 // -------------------------------------------------------------
 // Load Subservices
 // -------------------------------------------------------------
-function loadSubservices(service) {
-    currentServiceName = service.name[lang] || service.name.en;
+async function loadSubservices(service) {
+    currentServiceName = text(service.name);
+
+    const key = `${lang}:${service.id}`;
+    if (!serviceDetails.has(key)) {
+        const res = await fetch(`/api/service/${encodeURIComponent(service.id)}?lang=${lang}`);
+        serviceDetails.set(key, await res.json());
+    }
+    const details = serviceDetails.get(key);
 
     const subList = document.getElementById("sub-list");
     subList.innerHTML = "";
 
     document.getElementById("sub-title").innerText = currentServiceName;
 
-    (service.subservices || []).forEach(sub => {
+    (details.subservices || []).forEach(sub => {
         const li = document.createElement("li");
-        li.textContent = sub.name[lang] || sub.name.en;
+        li.textContent = text(sub.name);
         li.onclick = () => loadQuestions(sub);
         subList.appendChild(li);
     });
@@ -75,12 +89,11 @@ function loadQuestions(sub) {
     const qList = document.getElementById("question-list");
     qList.innerHTML = "";
 
-    document.getElementById("q-title").innerText =
-        sub.name[lang] || sub.name.en;
+    document.getElementById("q-title").innerText = text(sub.name);
 
     (sub.questions || []).forEach(q => {
         const li = document.createElement("li");
-        li.textContent = q.q[lang] || q.q.en;
+        li.textContent = text(q.q);
         li.onclick = () => showAnswer(q);
         qList.appendChild(li);
     });
@@ -91,8 +104,8 @@ function loadQuestions(sub) {
 // -------------------------------------------------------------
 function showAnswer(q) {
     let html = `
-        <h3>${q.q[lang] || q.q.en}</h3>
-        <p>${q.answer[lang] || q.answer.en}</p>
+        <h3>${text(q.q)}</h3>
+        <p>${text(q.answer)}</p>
     `;
 
     // Downloads
@@ -134,13 +147,104 @@ function showAnswer(q) {
                 age,
                 job,
                 desires: desire ? [desire] : [],
-                question_clicked: q.q[lang] || q.q.en,
+                question_clicked: text(q.q),
                 service: currentServiceName
             })
         });
     }, 200);
 }
 
+// -------------------------------------------------------------
+// Question Search (local BM25 index, all languages)
+// -------------------------------------------------------------
+let searchTimer = null;
+let searchSeq = 0;
+
+async function searchQuestions(query) {
+    const list = document.getElementById("search-results");
+    const seq = ++searchSeq;
+    if (!query) {
+        list.innerHTML = "";
+        return;
+    }
+
+    const params = new URLSearchParams({ q: query, lang, limit: 8 });
+    const res = await fetch(`/api/services/search?${params}`);
+    const data = await res.json();
+    if (seq !== searchSeq) return;   // a newer query is already on its way
+
+    list.innerHTML = "";
+    (data.results || []).forEach(r => {
+        const li = document.createElement("li");
+        li.textContent = text(r.question.q);
+        const where = document.createElement("small");
+        where.textContent = `${text(r.ministry)} › ${text(r.subservice)}`;
+        li.appendChild(where);
+        li.onclick = () => {
+            currentServiceName = text(r.ministry);
+            showAnswer(r.question);
+        };
+        list.appendChild(li);
+    });
+}
+
+document.getElementById("service-search")?.addEventListener("input", e => {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => searchQuestions(e.target.value.trim()), 120);
+});
+
+// -------------------------------------------------------------
+// Streaming AI Answers (Server-Sent Events over fetch POST)
+// -------------------------------------------------------------
+// Calls /api/ai/search or /api/ai/chat with stream=true and invokes
+// onToken(text) for every partial piece of the answer as it arrives.
+// Resolves with the final "done" event (sources, timings, history...).
+async function streamAi(url, body, onToken) {
+    const res = await fetch(url, {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream"
+        },
+        body: JSON.stringify({ ...body, stream: true })
+    });
+
+    // Server answered with plain JSON (validation error, AI offline...)
+    const type = res.headers.get("Content-Type") || "";
+    if (!type.includes("text/event-stream")) {
+        const data = await res.json();
+        onToken(data.answer || data.response || data.error || "");
+        return { ...data, type: "done" };
+    }
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let done = null;
+
+    while (true) {
+        const { value, done: finished } = await reader.read();
+        if (finished) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let sep;
+        while ((sep = buffer.indexOf("\n\n")) !== -1) {
+            const raw = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+
+            const dataLine = raw.split("\n").find(line => line.startsWith("data: "));
+            if (!dataLine) continue;
+
+            const event = JSON.parse(dataLine.slice(6));
+            if (event.type === "token") onToken(event.text);
+            else if (event.type === "error") console.error("AI stream error:", event.error);
+            else if (event.type === "done") done = event;
+        }
+    }
+    return done || { type: "done", success: false };
+}
+
 // -------------------------------------------------------------
 // Initialize Page
 // -------------------------------------------------------------
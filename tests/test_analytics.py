@@ -0,0 +1,58 @@
+from datetime import datetime
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+import analytics  # noqa: E402
+from analytics import clean_label, mark_rollups_ready, record_engagements, rollup_insights  # noqa: E402
+
+HOUR = datetime(2025, 3, 1, 10, 15)
+
+
+def engagement(question, service="Passports"):
+    return {"age": 30, "question_clicked": question, "service": service, "timestamp": HOUR}
+
+
+class RollupCollection:
+    """mongomock collection whose bulk_write applies UpdateOne upserts one by one
+    (mongomock's bulk API lags behind the installed pymongo)"""
+
+    def __init__(self):
+        self.col = mongomock.MongoClient().db.rollups
+        mark_rollups_ready(self.col)
+
+    def bulk_write(self, updates, ordered=True):
+        for update in updates:
+            self.col.update_one(update._filter, update._doc, upsert=update._upsert)
+
+    def __getattr__(self, name):
+        return getattr(self.col, name)
+
+
+def day_rollup(col):
+    return col.find_one({"granularity": "day", "service": "Passports"})
+
+
+def test_non_string_labels_are_coerced():
+    assert clean_label(42) == "42"
+    assert clean_label(["a", "b"]) == "['a', 'b']"
+    assert clean_label("  ") is None and clean_label(None) is None
+    assert len(clean_label("x" * 1000)) == analytics.MAX_LABEL_CHARS
+
+
+def test_rollups_survive_non_string_questions():
+    col = RollupCollection()
+    record_engagements(col, [engagement(7), engagement({"$gt": 1}), engagement("How do I renew?")])
+    assert day_rollup(col)["count"] == 3
+    assert set(rollup_insights(col, {})["questions"]) == {"7", "{'$gt': 1}", "How do I renew?"}
+
+
+def test_distinct_questions_per_rollup_are_capped(monkeypatch):
+    monkeypatch.setattr(analytics, "ROLLUP_MAX_QUESTIONS", 3)
+    col = RollupCollection()
+    record_engagements(col, [engagement(f"q{i}") for i in range(2)])
+    record_engagements(col, [engagement(f"q{i}") for i in range(5)])
+    questions = rollup_insights(col, {})["questions"]
+    assert questions == {"q0": 2, "q1": 2, "q2": 1, analytics.ROLLUP_OTHER_QUESTIONS: 2}
+    assert len(day_rollup(col)["questions"]) == 4
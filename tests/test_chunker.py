@@ -0,0 +1,42 @@
+import warnings
+
+from ai.chunker import StructuredChunker
+
+LONG_TITLE = "Department of Motor Traffic driving licence renewal and replacement service " * 3
+TEXT = "## Required documents\n" + " ".join(f"Sentence number {i} has several words in it." for i in range(60))
+
+
+def test_chunks_fit_the_budget_including_the_prefix():
+    chunker = StructuredChunker(max_tokens=60, overlap_tokens=10)
+    chunks = list(chunker.chunk(TEXT, "Driving licence renewal for citizens living abroad today"))
+    assert len(chunks) > 1
+    assert all(chunker.estimate_tokens(chunk['text']) <= 60 for chunk in chunks)
+    assert all(chunk['tokens'] <= 60 for chunk in chunks)
+    assert chunks[0]['text'].startswith("Driving licence renewal for citizens living abroad today / Required documents:")
+
+
+def test_long_prefix_is_shortened_instead_of_overflowing():
+    chunker = StructuredChunker(max_tokens=60, overlap_tokens=10)
+    chunks = list(chunker.chunk(TEXT, LONG_TITLE))
+    assert all(chunker.estimate_tokens(chunk['text']) <= 60 for chunk in chunks)
+    assert chunks[0]['text'].startswith("Required documents:")
+
+    untitled = list(chunker.chunk("# " + LONG_TITLE + "\n" + TEXT.split("\n", 1)[1]))
+    assert all(chunker.estimate_tokens(chunk['text']) <= 60 for chunk in untitled)
+    assert untitled[0]['text'].split(":\n")[0].endswith("…")
+
+
+def test_document_scraper_chunk_text_keeps_the_old_call_form():
+    import pytest
+    pytest.importorskip("bs4")
+    pytest.importorskip("google.generativeai")
+    from scripts.document_scrapper import DocumentScraper
+
+    scraper = DocumentScraper.__new__(DocumentScraper)
+    scraper.chunker = StructuredChunker(max_tokens=60)
+    assert scraper.chunk_text(TEXT) == [c['text'] for c in scraper.chunk_sections(TEXT)]
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        chunks = scraper.chunk_text(TEXT, 1000, 200)
+    assert chunks and isinstance(chunks[0], str)
+    assert caught and issubclass(caught[0].category, DeprecationWarning)
@@ -0,0 +1,32 @@
+from ai.context_packer import ContextPacker
+
+
+def header(i, doc):
+    return f"[Source {i}]"
+
+
+def ids(docs):
+    return [doc['id'] for doc in docs]
+
+
+def test_relative_floor_applies_to_cosine_scores():
+    docs = [{'id': 'a', 'text': "passport renewal fees", 'score': 0.9},
+            {'id': 'b', 'text': "unrelated bus timetable", 'score': 0.3}]
+    used, _ = ContextPacker().pack(docs, header)
+    assert ids(used) == ['a']
+
+
+def test_fused_hits_from_one_retriever_are_kept():
+    # a doc ranked first by BM25 only scores ~0.5 of a doc ranked first on both sides
+    docs = [{'id': 'a', 'text': "passport renewal fees", 'score': 1.0, 'rrf_score': 0.0328},
+            {'id': 'b', 'text': "Form A for licence class B1", 'score': 0.49, 'rrf_score': 0.0161,
+             'bm25_score': 7.2}]
+    used, _ = ContextPacker().pack(docs, header)
+    assert ids(used) == ['a', 'b']
+
+
+def test_rerank_scores_drive_the_relative_floor():
+    docs = [{'id': 'a', 'text': "passport renewal fees", 'score': 0.5, 'rrf_score': 0.02, 'rerank_score': 8.0},
+            {'id': 'b', 'text': "unrelated bus timetable", 'score': 1.0, 'rrf_score': 0.03, 'rerank_score': 1.0}]
+    used, _ = ContextPacker().pack(docs, header)
+    assert ids(used) == ['a']
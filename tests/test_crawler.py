@@ -0,0 +1,130 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from scripts.crawler import Crawler  # noqa: E402
+
+ROBOTS = b"User-agent: *\nDisallow: /private\n"
+
+PAGES = {
+    "/": '<a href="/a">a</a> <a href="/a#top">a again</a> <a href="/private/x">private</a> '
+         '<a href="http://elsewhere.invalid/">offsite</a>',
+    "/a": '<a href="/b">b</a> <a href="/">home</a>',
+    "/b": '<a href="/c">c</a>',
+    "/c": "deepest page",
+    "/private/x": "not for crawlers",
+}
+
+
+class FixtureSite:
+    """Small site served from http.server in a thread; records hits and peak concurrency"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.hits = {}
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with site.lock:
+                    site.hits[self.path] = site.hits.get(self.path, 0) + 1
+                    site.active += 1
+                    site.peak = max(site.peak, site.active)
+                try:
+                    if self.path == "/robots.txt":
+                        body, content_type = ROBOTS, "text/plain"
+                    elif self.path in PAGES or self.path.startswith("/slow/"):
+                        time.sleep(site.delay)
+                        body, content_type = PAGES.get(self.path, "slow page").encode(), "text/html"
+                    else:
+                        self.send_error(404)
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with site.lock:
+                        site.active -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def crawler(**kwargs) -> Crawler:
+    return Crawler(min_delay=0, retries=0, state_path=None, **kwargs)
+
+
+def fetched(results):
+    return sorted(result.url for _, result in results if result.ok)
+
+
+def test_urls_are_fetched_once():
+    with FixtureSite() as site:
+        seeds = [{'url': site.base + path} for path in ("/a", "/a", "/a#section", "/b")]
+        results = list(crawler().crawl(seeds))
+    assert fetched(results) == [site.base + "/a", site.base + "/b"]
+    assert site.hits["/a"] == 1
+
+
+def test_links_are_followed_up_to_max_depth():
+    with FixtureSite() as site:
+        results = list(crawler(max_depth=2).crawl([{'url': site.base + "/"}]))
+    assert fetched(results) == [site.base + path for path in ("/", "/a", "/b")]
+    assert "/c" not in site.hits
+    depths = {result.url: item.get('depth', 0) for item, result in results}
+    assert depths[site.base + "/b"] == 2
+    # "/" links back from "/a": still one fetch
+    assert site.hits["/"] == 1
+
+
+def test_no_links_are_followed_by_default():
+    with FixtureSite() as site:
+        results = list(crawler().crawl([{'url': site.base + "/"}]))
+    assert fetched(results) == [site.base + "/"]
+
+
+def test_robots_txt_is_honoured():
+    with FixtureSite() as site:
+        seeds = [{'url': site.base + "/private/x"}, {'url': site.base + "/"}]
+        results = {result.url: result for _, result in crawler(max_depth=1).crawl(seeds)}
+    blocked = results[site.base + "/private/x"]
+    assert not blocked.ok and "robots.txt" in blocked.error
+    assert "/private/x" not in site.hits
+    assert site.hits["/robots.txt"] == 1
+
+
+def test_robots_txt_can_be_ignored():
+    with FixtureSite() as site:
+        results = list(crawler(respect_robots=False).crawl([{'url': site.base + "/private/x"}]))
+    assert fetched(results) == [site.base + "/private/x"]
+    assert "/robots.txt" not in site.hits
+
+
+def test_per_host_concurrency_is_capped():
+    with FixtureSite(delay=0.05) as site:
+        seeds = [{'url': f"{site.base}/slow/{i}"} for i in range(12)]
+        results = list(crawler(max_workers=8, per_host=3).crawl(seeds))
+    assert len(fetched(results)) == 12
+    # robots.txt is fetched before any page, so the peak counts page requests only
+    assert site.peak == 3
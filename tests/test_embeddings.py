@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ai.embeddings import EmbeddingService  # noqa: E402
+
+
+class CountingModel:
+    """Deterministic stand-in for the SentenceTransformer model"""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=64, show_progress_bar=False):
+        self.calls.append(list(texts))
+        return np.array([[len(t), t.count("a"), 1.0] for t in texts], dtype="float32")
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = EmbeddingService(microbatch=False, cache=True, cache_dir=str(tmp_path))
+    service._model = CountingModel()
+    return service
+
+
+def test_queries_are_not_written_to_disk(service):
+    service.encode_one("how do I renew a passport")
+    service.encode(["another query"], persist=False)
+    assert not os.path.exists(service.cache.keys_path)
+    assert service.stats()['query_cache']['size'] == 2
+
+
+def test_ingestion_is_written_to_disk_and_reused_by_queries(service):
+    service.encode(["a chunk of guide text"])
+    assert os.path.getsize(service.cache.keys_path) == service.cache.KEY_BYTES
+    service.encode_one("a chunk of guide text")
+    assert len(service._model.calls) == 1
+
+
+def test_repeated_queries_hit_the_lru(service):
+    first = service.encode_one("passport fee")
+    again = service.encode_one("passport fee")
+    assert np.array_equal(first, again)
+    assert len(service._model.calls) == 1
+
+
+def test_query_lru_is_bounded(service):
+    service.query_cache_size = 3
+    for i in range(10):
+        service.encode_one(f"query {i}")
+    assert list(service._queries) == ["query 7", "query 8", "query 9"]
+    service.encode_one("query 1")
+    assert len(service._model.calls) == 11
+
+
+def test_reader_sees_vectors_appended_by_another_process(tmp_path):
+    from ai.embedding_cache import EmbeddingCache
+
+    reader = EmbeddingCache(str(tmp_path), "model")
+    assert reader.get_many(["passport fees"]) == [None]
+
+    writer = EmbeddingCache(str(tmp_path), "model")
+    writer.put_many(["passport fees", "tax return"], np.eye(2, 4, dtype=np.float32))
+    hits = reader.get_many(["passport fees", "tax return"])
+    assert [h.tolist() for h in hits] == [[1, 0, 0, 0], [0, 1, 0, 0]]
+
+    writer.put_many(["bus timetable"], np.full((1, 4), 0.5, dtype=np.float32))
+    assert reader.get_many(["bus timetable"])[0].tolist() == [0.5] * 4
@@ -0,0 +1,78 @@
+import time
+
+from ai.hybrid_retriever import HybridRetriever
+
+
+class FakeStore:
+    """Chunks in a dict; counts how often texts are read"""
+
+    def __init__(self, docs, fingerprint="v1"):
+        self.docs = dict(docs)
+        self.version = fingerprint
+        self.reads = 0
+
+    def fingerprint(self):
+        return self.version
+
+    def all_ids(self):
+        return list(self.docs)
+
+    def iter_documents(self, ids=None):
+        for doc_id in ids if ids is not None else list(self.docs):
+            if doc_id in self.docs:
+                self.reads += 1
+                yield doc_id, self.docs[doc_id], {'source': 'https://example.gov.lk', 'title': ''}
+
+
+def ids(docs):
+    return [doc['id'] for doc in docs]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_hit_texts_are_read_from_the_store():
+    store = FakeStore({'a': "driving licence renewal", 'b': "passport fees"})
+    retriever = HybridRetriever(store)
+    retriever.sync()
+    store.reads = 0
+    hits = retriever.sparse_search("passport", 5)
+    assert ids(hits) == ['b'] and hits[0]['text'] == "passport fees" and hits[0]['bm25_score'] > 0
+    assert store.reads == 1
+    assert not hasattr(retriever, 'docs')
+
+
+def test_chunks_deleted_since_the_last_sync_are_skipped():
+    store = FakeStore({'a': "passport renewal", 'b': "passport fees"})
+    retriever = HybridRetriever(store)
+    retriever.sync()
+    del store.docs['b']
+    assert ids(retriever.sparse_search("passport", 5)) == ['a']
+
+
+def test_fingerprint_change_wakes_the_background_sync():
+    store = FakeStore({'a': "driving licence renewal"})
+    retriever = HybridRetriever(store, recheck_s=60)
+    retriever.refresh()
+    assert wait_for(lambda: retriever.stats()['synced'])
+
+    store.docs['c'] = "passport application form"
+    store.version = "v2"
+    retriever.refresh()
+    assert wait_for(lambda: ids(retriever.sparse_search("passport", 5)) == ['c'])
+
+
+def test_id_set_is_rechecked_when_the_fingerprint_is_stale():
+    store = FakeStore({'a': "driving licence renewal", 'b': "passport fees"})
+    retriever = HybridRetriever(store, recheck_s=0.05)
+    retriever.refresh()
+    assert wait_for(lambda: ids(retriever.sparse_search("passport", 5)) == ['b'])
+
+    # Written by another process: the fingerprint does not change
+    store.docs = {'a': "driving licence renewal", 'c': "passport application form"}
+    assert wait_for(lambda: ids(retriever.sparse_search("passport", 5)) == ['c'])
+    assert len(retriever.bm25) == 2
@@ -0,0 +1,50 @@
+import pytest
+
+pytest.importorskip("PyPDF2")
+
+from scripts import pdf_extract  # noqa: E402
+
+
+def make_pdf(page_count: int) -> bytes:
+    """Minimal PDF whose page i (1-based) shows the text "Page i" """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in below
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for i in range(1, page_count + 1):
+        stream = f"BT /F1 12 Tf 72 720 Td (Page {i}) Tj ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref)
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), page_count)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def test_small_pdf_is_extracted_in_process():
+    pages = pdf_extract.extract_pdf_pages(make_pdf(3))
+    assert [(n, text.strip()) for n, text in pages] == [(1, "Page 1"), (2, "Page 2"), (3, "Page 3")]
+
+
+def test_parallel_extraction_matches_sequential(monkeypatch):
+    monkeypatch.setattr(pdf_extract, "MIN_PAGES_FOR_POOL", 4)
+    monkeypatch.setattr(pdf_extract, "PDF_WORKERS", 2)
+    content = make_pdf(20)
+    parallel = pdf_extract.extract_pdf_pages(content)
+    assert parallel == pdf_extract.extract_pdf_pages(content, parallel=False)
+    assert [n for n, _ in parallel] == list(range(1, 21))
+    assert parallel[12][1].strip() == "Page 13"
+    assert pdf_extract._get_pool()._mp_context.get_start_method() == "spawn"
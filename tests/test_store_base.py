@@ -0,0 +1,97 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from ai.pinecone_store import LocalPineconeIndex, PineconeStore  # noqa: E402
+from scripts.check_vector_stores import HashingEmbeddings, check_shared, corpus  # noqa: E402
+
+
+@pytest.fixture
+def embeddings():
+    return HashingEmbeddings()
+
+
+def test_fingerprint_sees_writes_from_another_instance(tmp_path, embeddings):
+    assert check_shared("pinecone-local", str(tmp_path), embeddings) == []
+
+
+def test_fingerprint_changes_when_count_is_unchanged(tmp_path, embeddings):
+    index = LocalPineconeIndex()
+    writer = PineconeStore(index=index, embedding_service=embeddings, manifest_dir=str(tmp_path))
+    reader = PineconeStore(index=index, embedding_service=embeddings, manifest_dir=str(tmp_path))
+    docs = corpus(4)
+    writer.add(docs[:3])
+
+    before = reader.fingerprint()
+    writer.delete([writer.document_id(docs[0])])
+    writer.add([docs[3]])
+    assert reader.count() == 3
+    assert reader.fingerprint() != before
+
+
+class CountingStore(PineconeStore):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.persists = 0
+
+    def persist(self):
+        self.persists += 1
+
+
+def test_sync_documents_persists_once(tmp_path, embeddings):
+    store = CountingStore(index=LocalPineconeIndex(), embedding_service=embeddings, manifest_dir=str(tmp_path))
+    docs = corpus(12)  # six sources
+    store.sync_documents(docs, group="g")
+    assert store.persists == 1
+
+    store.sync_documents([doc for doc in docs if doc['source'].endswith("/passport")], group="g", prune=True)
+    assert store.persists == 2
+    assert store.count() == 2
+
+    reader = CountingStore(index=store.index, embedding_service=embeddings, manifest_dir=str(tmp_path))
+    fingerprint = reader.fingerprint()
+    store.remove_source("https://example.gov.lk/passport")
+    assert store.persists == 3 and reader.fingerprint() != fingerprint
+
+
+def test_prune_without_manifests_warns(capsys, embeddings):
+    store = PineconeStore(index=LocalPineconeIndex(), embedding_service=embeddings)
+    store.sync_documents(corpus(2), prune=True)
+    assert "prune=True ignored" in capsys.readouterr().out
+
+
+def test_local_pinecone_index_upsert_query_delete():
+    index = LocalPineconeIndex()
+    index.upsert([("a", [1.0, 0.0], {'source': "x"}), ("b", [0.0, 2.0], {'source': "y"})])
+    index.upsert([("a", [0.0, 1.0], {'source': "z"})])  # overwrite in place
+    assert index.describe_index_stats().total_vector_count == 2
+
+    matches = index.query([0.0, 1.0], top_k=2, include_metadata=True).matches
+    assert [(m.id, round(m.score, 4)) for m in matches] == [("a", 1.0), ("b", 1.0)]
+    assert matches[0].metadata == {'source': "z"}
+    assert index.fetch(["b", "missing"]).vectors["b"].values == [0.0, 1.0]
+
+    index.delete(["a"])
+    assert list(index.list(limit=1)) == [["b"]]
+    assert index.query([1.0, 0.0], top_k=5).matches[0].id == "b"
+    with pytest.raises(ValueError):
+        index.upsert([("c", [1.0, 0.0, 0.0], {})])
+
+
+@pytest.mark.parametrize("with_manifests", [True, False])
+def test_sync_source_adds_keeps_and_deletes(tmp_path, embeddings, with_manifests):
+    store = PineconeStore(index=LocalPineconeIndex(), embedding_service=embeddings,
+                          manifest_dir=str(tmp_path) if with_manifests else None)
+    source = "https://example.gov.lk/passport"
+    docs = [dict(doc, source=source) for doc in corpus(4)]
+    assert store.sync_source(source, docs[:3]) == {'added': 3, 'unchanged': 0, 'deleted': 0}
+    assert store.sync_source(source, docs[1:]) == {'added': 1, 'unchanged': 2, 'deleted': 1}
+    assert sorted(store.all_ids()) == sorted(store.document_id(doc) for doc in docs[1:])
+    assert [m['source'] for m in store.list_manifests()] == ([source] if with_manifests else [])
+
+    other = "https://example.gov.lk/other"
+    store.sync_source(other, [dict(corpus(1)[0], source=other)])
+    assert store.remove_source(source) == 3
+    assert store.count() == 1
+    assert store.remove_source(source) == 0
+    assert len(store.list_manifests()) == (1 if with_manifests else 0)
@@ -0,0 +1,217 @@
+import threading
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+
+from ai.vector_store import VectorStore  # noqa: E402
+from scripts.check_vector_stores import HashingEmbeddings, corpus  # noqa: E402
+
+
+class BlockingEmbeddings(HashingEmbeddings):
+    """Blocks batches larger than `threshold` (the rebuild's) until released"""
+
+    def __init__(self, threshold: int):
+        super().__init__()
+        self.threshold = threshold
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def encode(self, texts, show_progress_bar=False, persist=True):
+        if len(texts) > self.threshold:
+            self.entered.set()
+            assert self.release.wait(10)
+        return super().encode(texts, show_progress_bar, persist)
+
+
+def test_rebuild_does_not_block_search_and_keeps_concurrent_writes(tmp_path):
+    embeddings = BlockingEmbeddings(threshold=1000)
+    docs = corpus(40)
+    store = VectorStore(embedding_service=embeddings, index_path=str(tmp_path / "index.bin"),
+                        docs_path=str(tmp_path / "docs.sqlite"), index_type="hnsw")
+    store.add(docs[:30])
+
+    embeddings.threshold = 20
+    rebuild = threading.Thread(target=store.rebuild)
+    rebuild.start()
+    assert embeddings.entered.wait(10)
+
+    # The rebuild is embedding its snapshot: searches and writes still go through
+    assert store.search(docs[3]['text'], 1)[0]['id'] == store.document_id(docs[3])
+    store.add(docs[30:40])
+    store.delete([store.document_id(docs[0])])
+
+    embeddings.release.set()
+    rebuild.join(10)
+    assert not rebuild.is_alive()
+    assert store.count() == 39
+    assert store.search(docs[35]['text'], 1)[0]['id'] == store.document_id(docs[35])
+    assert store.document_id(docs[0]) not in [hit['id'] for hit in store.search(docs[0]['text'], 39)]
+
+
+def test_second_instance_sees_chunks_written_by_the_first(tmp_path):
+    embeddings = HashingEmbeddings()
+    paths = dict(index_path=str(tmp_path / "index.bin"), docs_path=str(tmp_path / "docs.sqlite"))
+    docs = corpus(20)
+    writer = VectorStore(embedding_service=embeddings, **paths)
+    writer.add(docs[:10])
+    reader = VectorStore(embedding_service=embeddings, **paths)
+    fingerprint = reader.fingerprint()
+
+    writer.add(docs[10:20])
+    writer.delete([writer.document_id(docs[0])])
+    assert reader.count() == 19
+    assert reader.fingerprint() != fingerprint
+    assert reader.search(docs[15]['text'], 1)[0]['id'] == writer.document_id(docs[15])
+    assert len(reader.search(docs[1]['text'], 19)) == 19
+
+
+def test_hnsw_search_skips_past_tombstones():
+    store = VectorStore(embedding_service=HashingEmbeddings(), index_type="hnsw")
+    docs = corpus(25)
+    store.add(docs)
+    query = docs[0]['text']
+    nearest = [hit['id'] for hit in store.search(query, 6)]
+
+    # Four deletions stay below the compaction threshold, so they are hidden rather than removed
+    assert store.delete(nearest[:4]) == 4
+    assert len(store._tombstones) == 4
+
+    hits = store.search(query, 2)
+    assert [hit['id'] for hit in hits] == nearest[4:6]
+    assert len(store.search(query, 21)) == 21
+
+
+def test_chunk_table_round_trip(tmp_path):
+    from ai.vector_store import ChunkTable
+
+    table = ChunkTable(str(tmp_path / "docs.sqlite"))
+    table.put([(3, "c", "third", {'source': "s1", 'title': "T", 'page': 2, 'chunk_id': "0"}),
+               (1, "a", "first", {'source': "s1"}),
+               (2, "b", "second", {'source': "s2"})])
+    table.put([(1, "a", "first again", {'source': "s1"})])
+    assert table.count() == 3
+    assert table.get([3])[3] == {'id': "c", 'text': "third", 'source': "s1", 'title': "T", 'page': 2,
+                                 'chunk_id': "0"}
+    assert sorted(table.ids("s1")) == ["a", "c"]
+    assert [key for key, _ in table.scan(after=1, limit=5)] == [2, 3]
+    assert table.delete([2, 9]) == [2]
+    assert table.existing([1, 2, 3]) == {1, 3}
+
+    table.set_tombstones([7])
+    table.bump_version()
+    # A second connection sees the rows, tombstones and version
+    other = ChunkTable(table.path)
+    other.put([(4, "d", "fourth", {})])
+    assert table.count() == 3 and other.tombstones() == {7} and other.version() == 1
+
+    table.clear()
+    assert other.count() == 0 and other.tombstones() == set()
+
+
+def test_pickled_documents_are_migrated(tmp_path):
+    import pickle
+
+    import faiss
+    import numpy as np
+
+    embeddings = HashingEmbeddings()
+    docs = corpus(12)
+    # Old save: an L2 flat index whose row numbers are the IDs, and a pickled list of documents
+    old = faiss.IndexFlatL2(embeddings.dimension)
+    old.add(np.asarray(embeddings.encode([doc['text'] for doc in docs]) * 3, dtype=np.float32))
+    faiss.write_index(old, str(tmp_path / "index.bin"))
+    with open(tmp_path / "documents.pkl", "wb") as f:
+        pickle.dump(docs, f)
+
+    store = VectorStore(embedding_service=embeddings, index_path=str(tmp_path / "index.bin"),
+                        docs_path=str(tmp_path / "documents.sqlite"))
+    assert store.count() == 12
+    assert (tmp_path / "documents.sqlite").exists()
+    hit = store.search(docs[5]['text'], 1)[0]
+    assert hit['id'] == store.document_id(docs[5]) and hit['score'] == pytest.approx(1.0, abs=1e-4)
+    assert hit['page'] == docs[5]['page'] and hit['title'] == docs[5]['title']
+
+    # The migrated table and re-saved index open directly next time
+    reopened = VectorStore(embedding_service=embeddings, index_path=str(tmp_path / "index.bin"),
+                           docs_path=str(tmp_path / "documents.sqlite"))
+    assert reopened.count() == 12 and reopened.search(docs[7]['text'], 1)[0]['id'] == store.document_id(docs[7])
+
+
+def test_pickled_id_map_is_migrated_without_deleted_chunks(tmp_path):
+    import pickle
+
+    import faiss
+    import numpy as np
+
+    embeddings = HashingEmbeddings()
+    docs = corpus(6)
+    keys = [VectorStore._faiss_id(VectorStore.document_id(doc)) for doc in docs]
+    old = faiss.IndexIDMap(faiss.IndexFlatIP(embeddings.dimension))
+    old.add_with_ids(embeddings.encode([doc['text'] for doc in docs]), np.array(keys, dtype=np.int64))
+    faiss.write_index(old, str(tmp_path / "index.bin"))
+    # A dict keyed by FAISS ID; docs[0] was deleted from it but not from the index
+    pickled = {key: dict(doc, id=VectorStore.document_id(doc)) for key, doc in zip(keys[1:], docs[1:])}
+    with open(tmp_path / "documents.pkl", "wb") as f:
+        pickle.dump(pickled, f)
+
+    store = VectorStore(embedding_service=embeddings, index_path=str(tmp_path / "index.bin"),
+                        docs_path=str(tmp_path / "documents.pkl"))
+    assert store.docs_path == str(tmp_path / "documents.sqlite")
+    assert store.count() == 5 and store.index.ntotal == 5
+    assert store.document_id(docs[0]) not in [hit['id'] for hit in store.search(docs[0]['text'], 5)]
+
+
+def test_pickled_ivf_save_is_migrated(tmp_path):
+    import pickle
+
+    import faiss
+    import numpy as np
+
+    from ai.vector_store import index_kind, new_faiss_index
+
+    embeddings = HashingEmbeddings()
+    docs = corpus(300)
+    keys = np.array([VectorStore._faiss_id(VectorStore.document_id(doc)) for doc in docs], dtype=np.int64)
+    vectors = embeddings.encode([doc['text'] for doc in docs])
+    # IVF saves hold their IDs in the inverted lists, with no IndexIDMap around them
+    old = new_faiss_index("ivf", vectors, len(docs))
+    old.add_with_ids(vectors, keys)
+    faiss.write_index(old, str(tmp_path / "index.bin"))
+    pickled = {int(key): dict(doc, id=VectorStore.document_id(doc)) for key, doc in zip(keys[1:], docs[1:])}
+    with open(tmp_path / "documents.pkl", "wb") as f:
+        pickle.dump(pickled, f)
+
+    store = VectorStore(embedding_service=embeddings, index_path=str(tmp_path / "index.bin"),
+                        docs_path=str(tmp_path / "documents.sqlite"), index_type="ivf", train_min=100, nprobe=64)
+    assert store.count() == 299 and store.index.ntotal == 299
+    assert index_kind(store.index) == "ivf"
+    assert store.search(docs[42]['text'], 1)[0]['id'] == store.document_id(docs[42])
+    assert store.document_id(docs[0]) not in [hit['id'] for hit in store.search(docs[0]['text'], 10)]
+
+
+def test_chunk_table_counts_existing_rows_and_keeps_count_in_step(tmp_path):
+    import sqlite3
+
+    from ai.vector_store import ChunkTable
+
+    path = str(tmp_path / "docs.sqlite")
+    # A table written before the row count was kept in meta
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE chunks (key INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, text TEXT NOT NULL,
+                             source TEXT, title TEXT, page INTEGER, chunk_id TEXT);
+        INSERT INTO chunks VALUES (1, 'a', 'first', '', '', NULL, '0'), (2, 'b', 'second', '', '', NULL, '1');
+    """)
+    conn.commit()
+    conn.close()
+
+    table = ChunkTable(path)
+    assert table.count() == 2
+    table.put([(2, "b", "second, replaced", {}), (3, "c", "third", {})])
+    assert table.count() == 3 and table.get([2])[2]['text'] == "second, replaced"
+    table.delete([1, 9])
+    assert ChunkTable(path).count() == 2
+    table.clear()
+    assert table.count() == 0
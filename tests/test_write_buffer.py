@@ -0,0 +1,66 @@
+import pytest
+
+pytest.importorskip("pymongo")
+
+from pymongo.errors import AutoReconnect, BulkWriteError  # noqa: E402
+
+from write_buffer import WriteBuffer  # noqa: E402
+
+
+class FlakyCollection:
+    """Fails each insert_many call with the next scripted error, then writes normally"""
+
+    def __init__(self, *failures):
+        self.failures = list(failures)
+        self.calls = []
+        self.docs = []
+
+    def insert_many(self, docs, ordered=True):
+        self.calls.append([doc["n"] for doc in docs])
+        failure = self.failures.pop(0) if self.failures else None
+        if failure is None:
+            self.docs += docs
+            return
+        if isinstance(failure, Exception):
+            raise failure
+        # {index: code}: write the rest, report these
+        self.docs += [doc for i, doc in enumerate(docs) if i not in failure]
+        raise BulkWriteError({"writeErrors": [{"index": i, "code": code, "errmsg": "rejected"}
+                                              for i, code in failure.items()]})
+
+
+def flush(collection, retries=3):
+    flushed = []
+    buffer = WriteBuffer(collection, "test", retries=retries, backoff=0, on_flush=flushed.extend)
+    try:
+        # the worker is idle on an empty queue, so the flush runs here
+        buffer._flush([{"n": i} for i in range(5)])
+    finally:
+        buffer.close()
+    return buffer, flushed
+
+
+def test_only_rejected_documents_are_retried():
+    collection = FlakyCollection({1: 91, 3: 91})
+    buffer, flushed = flush(collection)
+    assert collection.calls == [[0, 1, 2, 3, 4], [1, 3]]
+    assert sorted(doc["n"] for doc in collection.docs) == [0, 1, 2, 3, 4]
+    assert buffer.inserted == 5 and buffer.failed == 0
+    assert sorted(doc["n"] for doc in flushed) == [0, 1, 2, 3, 4]
+
+
+def test_duplicate_keys_count_as_written():
+    # the first attempt wrote everything but the reply was lost
+    collection = FlakyCollection(AutoReconnect("lost"), {i: 11000 for i in range(5)})
+    buffer, flushed = flush(collection)
+    assert len(collection.calls) == 2
+    assert buffer.inserted == 5 and buffer.failed == 0
+    assert len(flushed) == 5
+
+
+def test_documents_still_rejected_after_retries_are_dropped():
+    collection = FlakyCollection({2: 121}, {0: 121}, {0: 121})
+    buffer, flushed = flush(collection, retries=2)
+    assert collection.calls == [[0, 1, 2, 3, 4], [2], [2]]
+    assert buffer.inserted == 4 and buffer.failed == 1
+    assert 2 not in [doc["n"] for doc in flushed]
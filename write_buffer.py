@@ -0,0 +1,158 @@
+# write_buffer.py
+# Write-behind buffer for high-volume, fire-and-forget inserts (engagements, AI search logs).
+
+import atexit
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+WRITE_BUFFER_BATCH = int(os.getenv("WRITE_BUFFER_BATCH", "500"))
+WRITE_BUFFER_INTERVAL_MS = float(os.getenv("WRITE_BUFFER_INTERVAL_MS", "1000"))
+WRITE_BUFFER_MAX_QUEUE = int(os.getenv("WRITE_BUFFER_MAX_QUEUE", "20000"))
+# How long a request may wait for room in a full queue before it is refused
+WRITE_BUFFER_ENQUEUE_TIMEOUT_MS = float(os.getenv("WRITE_BUFFER_ENQUEUE_TIMEOUT_MS", "50"))
+DUPLICATE_KEY = 11000
+
+
+class WriteBuffer:
+    """
+    Queue documents in memory and insert them in the background.
+
+    A worker thread flushes with insert_many(ordered=False) once `max_batch`
+    documents are queued or `flush_interval_ms` after the oldest one arrived.
+    Failed flushes are retried with backoff; after a partial bulk failure
+    only the rejected documents are retried, and duplicate-key rejections
+    count as written. While Mongo is slow the queue fills up, and add() then
+    waits at most `enqueue_timeout_ms` before returning False so the caller
+    can shed load. `on_flush` gets every batch
+    of inserted documents (used to update the engagement rollups). Pending
+    documents are drained at interpreter exit.
+    """
+
+    def __init__(self, collection, name: str, max_batch: int = WRITE_BUFFER_BATCH,
+                 flush_interval_ms: float = WRITE_BUFFER_INTERVAL_MS,
+                 max_queue: int = WRITE_BUFFER_MAX_QUEUE,
+                 enqueue_timeout_ms: float = WRITE_BUFFER_ENQUEUE_TIMEOUT_MS,
+                 on_flush: Optional[Callable[[List[Dict]], None]] = None,
+                 retries: int = 3, backoff: float = 0.5):
+        self.collection = collection
+        self.name = name
+        self.max_batch = max_batch
+        self.flush_interval_ms = flush_interval_ms
+        self.enqueue_timeout_ms = enqueue_timeout_ms
+        self.on_flush = on_flush
+        self.retries = retries
+        self.backoff = backoff
+
+        self.enqueued = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"write-buffer-{name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, doc: Dict) -> bool:
+        """Enqueue one document; False when the buffer is full (back off and retry later)"""
+        if self._stopping.is_set():
+            return False
+        try:
+            self._queue.put(doc, timeout=self.enqueue_timeout_ms / 1000.0)
+        except queue.Full:
+            self.rejected += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    # -------------------------------------------------------------
+    # Worker
+    # -------------------------------------------------------------
+    def _next_batch(self) -> List[Dict]:
+        wait = self.flush_interval_ms / 1000.0
+        try:
+            batch = [self._queue.get(timeout=wait)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + wait
+        while len(batch) < self.max_batch:
+            remaining = 0 if self._stopping.is_set() else deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[Dict]):
+        start = time.perf_counter()
+        inserted, pending, error = [], batch, None
+        for attempt in range(self.retries + 1):
+            try:
+                self.collection.insert_many(pending, ordered=False)
+                inserted += pending
+                pending = []
+                break
+            except BulkWriteError as e:
+                # ordered=False: everything except the reported documents was written. A duplicate
+                # key means an earlier attempt already wrote the document, so only the rest is retried.
+                bad = {err["index"] for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY}
+                inserted += [doc for i, doc in enumerate(pending) if i not in bad]
+                pending = [doc for i, doc in enumerate(pending) if i in bad]
+                error = e
+                if not pending:
+                    break
+            except PyMongoError as e:
+                error = e
+            if attempt == self.retries or (self._stopping.is_set() and attempt > 0):
+                break
+            time.sleep(self.backoff * 2 ** attempt)
+
+        if pending:
+            self.failed += len(pending)
+            print(f"❌ {self.name}: dropped {len(pending)} documents after {attempt + 1} attempts: {error}")
+
+        self.inserted += len(inserted)
+        self.flushes += 1
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+        if self.on_flush and inserted:
+            try:
+                self.on_flush(inserted)
+            except Exception as e:
+                print(f"⚠️ {self.name}: post-flush hook failed: {e}")
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+
+    def close(self, timeout: float = 10.0):
+        """Stop accepting documents and wait for the queue to drain"""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        if not self._queue.empty():
+            print(f"⚠️ {self.name}: {self._queue.qsize()} documents not written at shutdown")
+
+    def stats(self) -> Dict:
+        return {
+            'queued': self._queue.qsize(),
+            'max_queue': self._queue.maxsize,
+            'enqueued': self.enqueued,
+            'inserted': self.inserted,
+            'rejected': self.rejected,
+            'failed': self.failed,
+            'flushes': self.flushes,
+            'avg_batch_size': round(self.inserted / self.flushes, 2) if self.flushes else 0.0,
+            'last_flush_ms': round(self.last_flush_ms, 2)
+        }